@@ -1,42 +1,109 @@
-from gettext import find
-from operator import index
-import numpy as np
-import threading
 import random
-import time
+from typing import NamedTuple
+
+from bitboard import Bitboard, Features, GameState, SPACE_NAMES, SPACE_INDEX, ADJACENCY, NUM_SPACES
+import bitboard
 
 class Player():
+    __slots__ = ("piece_type", "game")
+
     def __init__(self, piece_type, game):
-        self.pieces_in_deck = 9
-        self.pieces_on_board = 0
-        
         self.piece_type = piece_type
         self.game = game
+
+    # piece counts live in the game's bitboard engine
+    @property
+    def pieces_in_deck(self) -> int:
+        return self.game.engine.pieces_in_deck[self.piece_type]
+
+    @pieces_in_deck.setter
+    def pieces_in_deck(self, value: int):
+        self.game.engine.pieces_in_deck[self.piece_type] = value
+
+    @property
+    def pieces_on_board(self) -> int:
+        return self.game.engine.pieces_on_board[self.piece_type]
+
+    @pieces_on_board.setter
+    def pieces_on_board(self, value: int):
+        self.game.engine.pieces_on_board[self.piece_type] = value
+
     def take_turn(self):
         pass
 
 class ComputerPlayer(Player):
+    __slots__ = ()
+
     def __init__(self, piece_type, game):
         super().__init__(piece_type, game)
 
+    # cancel is an optional threading.Event; setting it, even before the call
+    # has started, asks choose_move to return as soon as it can
+    def choose_move(self, cancel=None):
+        return random.choice(self.game.legal_moves())
+
+    # sets the cancel event of a choose_move running on another thread
+    def stop(self):
+        pass
+
+    # players that think on the opponent's time override these, see search.AlphaBetaPlayer
+    def start_pondering(self):
+        pass
+
+    def stop_pondering(self):
+        pass
+
+    # releases whatever the player holds beyond the game, such as worker processes
+    def close(self):
+        pass
+
     def take_turn(self):
-        spaces = list(self.game.board.spaces.keys())
-        while self.game.current_player == self:
-            # this is where the computer will take its turn
-            if self.game.game_state == Game.PLACE_PIECE:
-                self.game.place_piece(random.choice(spaces))
-            elif self.game.game_state == Game.REMOVE_PIECE:
-                self.game.remove_piece(random.choice(spaces))
-            elif self.game.game_state == Game.MOVE_PIECE:
-                self.game.move_piece(random.choice(spaces), random.choice(spaces))
+        # keep playing while it is our turn, a mill is followed by a removal
+        while self.game.current_player == self and self.game.has_legal_move():
+            self.game.play_move(self.choose_move())
         
             
+# names of the points next to each point, in SPACE_NAMES order
+NEIGHBOR_NAMES : tuple = tuple(tuple(SPACE_NAMES[neighbor] for neighbor in neighbors) for neighbors in ADJACENCY)
+
+class BoardDelta(NamedTuple):
+    # masks over the bitboard point indexes: points whose stone changed, points
+    # whose mill status changed, and every point in a mill after the move
+    stones: int
+    mills: int
+    milled: int
+
+    @staticmethod
+    def between(before: tuple, after: tuple) -> 'BoardDelta':
+        # before and after are (white, black, milled) masks, see Game.board_masks
+        return BoardDelta((before[0] ^ after[0]) | (before[1] ^ after[1]), before[2] ^ after[2], after[2])
+
+    @property
+    def changed(self) -> int:
+        return self.stones | self.mills
+
+    # a single int, so a logged move does not keep a tuple and three mask objects alive
+    def pack(self) -> int:
+        return self.stones | self.mills << NUM_SPACES | self.milled << 2 * NUM_SPACES
+
+    @staticmethod
+    def unpack(packed: int) -> 'BoardDelta':
+        mask = (1 << NUM_SPACES) - 1
+        return BoardDelta(packed & mask, packed >> NUM_SPACES & mask, packed >> 2 * NUM_SPACES)
+
 class MoveRecord():
-    def __init__(self, move_type, player : Player, start_space: str, end_space : str = ""):
+    __slots__ = ("move_type", "player", "start_space", "end_space", "_delta")
+
+    def __init__(self, move_type, player : Player, start_space: str, end_space : str = "", delta : BoardDelta = None):
         self.move_type = move_type
         self.player = player
         self.start_space = start_space
         self.end_space = end_space
+        self._delta = delta.pack() if delta is not None else None
+
+    @property
+    def delta(self) -> BoardDelta:
+        return BoardDelta.unpack(self._delta) if self._delta is not None else None
     
     def __str__(self) -> str:
         player_name : str = "BLACK" if self.player.piece_type == BoardSpace.BLACK_SPACE else "WHITE"
@@ -48,98 +115,105 @@ class BoardSpace:
     WHITE_SPACE: int = 1
     BLACK_SPACE: int = 2
 
-    def __init__(self, space_name: str) -> None:
-        self.state = BoardSpace.EMPTY_SPACE
+    __slots__ = ("space_name", "index", "board")
 
+    def __init__(self, space_name: str, board: 'Game.Board') -> None:
         self.space_name :str = space_name
-        self.neighbors : dict = {}
-    
-    def add_neighbor(self, space):
-        self.neighbors[space.space_name] = space
-    
-    def add_neighbors(self, spaces):
-        for space in spaces:
-            self.add_neighbor(space)
-        
-
-
+        self.index : int = SPACE_INDEX[space_name]
+        self.board : Game.Board = board
 
-class Game():
-    class Board:
-        def __init__(self):
-            self.COLUMN_ARRAY = ["A", "B", "C", "D", "E", "F", "G"]
-            self.ROW_ARRAY = [1, 2, 3, 4, 5, 6, 7]
+    @property
+    def engine(self) -> Bitboard:
+        return self.board.engine
 
-            invalid_spaces = ["A2", "A3", "A5", "A6", "G2", "G3", "G5", "G6",
-            "B1", "B3", "B5", "B7", "F1", "F3", "F5", "F7", "C1", "C2",
-            "C6","C7", "E1", "E2", "E6", "E7", "D4", "C6"]
+    @property
+    def state(self) -> int:
+        return self.board.engine.get(self.index)
 
-            self.spaces = {}
+    @state.setter
+    def state(self, value: int):
+        self.board.engine.set(self.index, value)
 
-            for row in self.ROW_ARRAY:
-                for col in self.COLUMN_ARRAY:
-                    space_name = col + str(row)
+    # the adjacency is shared by every board, see NEIGHBOR_NAMES
+    @property
+    def neighbors(self) -> dict:
+        spaces = self.board.spaces
+        return {name: spaces[name] for name in NEIGHBOR_NAMES[self.index]}
 
-                    if space_name not in invalid_spaces:
-                        self.spaces[space_name] = BoardSpace(space_name)
-            
-            self.spaces["A1"].add_neighbors([self.spaces["A4"], self.spaces["D1"]])
-            self.spaces["A4"].add_neighbors([self.spaces["A1"], self.spaces["A7"], self.spaces["B4"]])
-            self.spaces["A7"].add_neighbors([self.spaces["A4"], self.spaces["D7"]])
-
-            self.spaces["B2"].add_neighbors([self.spaces["B4"], self.spaces["D2"]])
-            self.spaces["B4"].add_neighbors([self.spaces["A4"], self.spaces["B2"], self.spaces["B6"], self.spaces["C4"]])
-            self.spaces["B6"].add_neighbors([self.spaces["B4"], self.spaces["D6"]])
 
+class Game():
+    class Board:
+        COLUMN_ARRAY = ["A", "B", "C", "D", "E", "F", "G"]
+        ROW_ARRAY = [1, 2, 3, 4, 5, 6, 7]
 
-            self.spaces["C3"].add_neighbors([self.spaces["C4"], self.spaces["D3"]])
-            self.spaces["C4"].add_neighbors([self.spaces["B4"], self.spaces["C3"], self.spaces["C5"]])
-            self.spaces["C5"].add_neighbors([self.spaces["C4"], self.spaces["D5"]])
-            
-            self.spaces["D5"].add_neighbors([self.spaces["C5"], self.spaces["E5"], self.spaces["D6"]])
-            self.spaces["D6"].add_neighbors([self.spaces["B6"], self.spaces["D5"], self.spaces["F6"], self.spaces["D7"]])
-            self.spaces["D7"].add_neighbors([self.spaces["A7"], self.spaces["D6"], self.spaces["G7"]])
+        __slots__ = ("engine", "_spaces")
 
-            self.spaces["E5"].add_neighbors([self.spaces["E4"], self.spaces["D5"]])
-            self.spaces["E4"].add_neighbors([self.spaces["E3"], self.spaces["E5"], self.spaces["F4"]])
-            self.spaces["E3"].add_neighbors([self.spaces["E4"], self.spaces["D3"]])
+        def __init__(self, engine : Bitboard = None):
+            # the board is a view over the bitboard, which holds the actual position
+            self.engine : Bitboard = engine if engine is not None else Bitboard()
+            self._spaces : dict = None
 
-            self.spaces["D3"].add_neighbors([self.spaces["C3"], self.spaces["D2"], self.spaces["E3"]])
-            self.spaces["D2"].add_neighbors([self.spaces["D3"], self.spaces["B2"], self.spaces["D1"], self.spaces["F2"]])
-            self.spaces["D1"].add_neighbors([self.spaces["A1"], self.spaces["D2"], self.spaces["G1"]])
+        # the BoardSpace views are only built for callers that ask for them, such as
+        # the GUI; they read through the board, so they stay valid across a reset
+        @property
+        def spaces(self) -> dict:
+            if self._spaces is None:
+                self._spaces = {space_name: BoardSpace(space_name, self) for space_name in SPACE_NAMES}
+            return self._spaces
 
-            self.spaces["F2"].add_neighbors([self.spaces["F4"], self.spaces["D2"]])
-            self.spaces["F4"].add_neighbors([self.spaces["F2"], self.spaces["E4"], self.spaces["F6"], self.spaces["G4"]])
-            self.spaces["F6"].add_neighbors([self.spaces["F4"], self.spaces["D6"]])
+        def reset(self):
+            self.engine = Bitboard()
 
-            self.spaces["G4"].add_neighbors([self.spaces["G1"], self.spaces["G7"], self.spaces["F4"]])
-            self.spaces["G1"].add_neighbors([self.spaces["G4"], self.spaces["D1"]])
-            self.spaces["G7"].add_neighbors([self.spaces["G4"], self.spaces["D7"]])
-            
         def set_space_value(self, space, value):
-            if space in self.spaces:
-                self.spaces[space].state = value
+            if space in SPACE_INDEX:
+                self.engine.set(SPACE_INDEX[space], value)
 
 
         def get_space(self, space_name):
-            if space_name in self.spaces:
-                return self.spaces[space_name].state
+            if space_name in SPACE_INDEX:
+                return self.engine.get(SPACE_INDEX[space_name])
             else:
                 return BoardSpace.INVALID_SPACE
     
+    # Memory footprint, measured with tracemalloc on CPython 3: a new Game with
+    # human or ComputerPlayer sides takes about 0.9 KB and every logged move adds
+    # about 120 bytes (a slotted MoveRecord holding a packed BoardDelta), so a
+    # typical finished game of 150 plies is under 20 KB. The board's BoardSpace
+    # views cost another 1.5 KB once something asks for board.spaces. Search
+    # players are extra: an AlphaBetaPlayer keeps a transposition table of up to
+    # its table_bytes.
+    __slots__ = ("unplayed_pieces", "board", "engine", "starting_player", "staring_plauer", "white_player",
+                 "black_player", "winner", "current_player", "next_player", "move_history", "subscribers",
+                 "counters")
+
     GAME_OVER : int = -1
     PLACE_PIECE: int = 0
     MOVE_PIECE: int = 1
     REMOVE_PIECE: int = 2
 
-    def __init__(self, white_player_human : bool = True, black_player_human : bool = True):
+    # events published to subscribers, with what is passed along with them
+    PLACE_EVENT: str = "place"  # the MoveRecord
+    MOVE_EVENT: str = "move"  # the MoveRecord
+    REMOVE_EVENT: str = "remove"  # the MoveRecord
+    PLAYER_CHANGE_EVENT: str = "player_change"  # the new current player
+    GAME_OVER_EVENT: str = "game_over"  # the winner
+
+    # white_computer and black_computer are the player classes (or factories taking
+    # piece_type and game) used for a side whose human switch is off. With autostart
+    # off the first player does not take its turn here and the caller drives the game.
+    # A GameState starts the game from that position instead of an empty board and
+    # a coin toss, see from_state.
+    def __init__(self, white_player_human : bool = True, black_player_human : bool = True,
+                 white_computer : type = ComputerPlayer, black_computer : type = ComputerPlayer,
+                 autostart : bool = True, state : GameState = None):
         self.unplayed_pieces = 9
-        self.board = Game.Board()
+        self.board = Game.Board(Bitboard.from_state(state) if state is not None else None)
+        self.engine : Bitboard = self.board.engine
 
         self.starting_player : Player = None
 
-        self.white_player = Player(BoardSpace.WHITE_SPACE, self) if white_player_human else ComputerPlayer(BoardSpace.WHITE_SPACE, self)
-        self.black_player = Player(BoardSpace.BLACK_SPACE, self) if black_player_human else ComputerPlayer(BoardSpace.BLACK_SPACE, self)
+        self.white_player = Player(BoardSpace.WHITE_SPACE, self) if white_player_human else white_computer(BoardSpace.WHITE_SPACE, self)
+        self.black_player = Player(BoardSpace.BLACK_SPACE, self) if black_player_human else black_computer(BoardSpace.BLACK_SPACE, self)
 
         self.winner : Player = None
 
@@ -147,13 +221,45 @@ class Game():
         self.next_player : Player = None
 
         self.move_history : list[MoveRecord] = []
+        self.subscribers : list = []
+        # filled in while instrument.enable() is in effect
+        self.counters = None
+
+        if state is None:
+            self.coin_toss()
+            self.game_state = Game.PLACE_PIECE
+        else:
+            self.current_player, self.next_player = self.white_player, self.black_player
+            self._sync_players()
+            self.staring_plauer = self.current_player
 
-        self.coin_toss()
+        if autostart and self.game_state != Game.GAME_OVER:
+            self.current_player.take_turn()
 
-        self.game_state = Game.PLACE_PIECE
+    # a Game at a snapshot position, without a move history; options are passed to Game()
+    @classmethod
+    def from_state(cls, state : GameState, **options) -> 'Game':
+        return cls(state=state, **options)
+
+    def snapshot(self) -> GameState:
+        return self.engine.snapshot()
+
+    # stone counts, mills, open twos, blocked stones, mobility and double mills of
+    # one colour; the engine keeps them current on every move, so this never scans the board
+    def features(self, piece_type) -> Features:
+        return self.engine.color_features(piece_type)
 
-        self.current_player.take_turn()
+    # calls and seconds per instrumented method, empty unless instrumentation is enabled
+    def stats(self) -> dict:
+        return self.counters.snapshot() if self.counters is not None else {}
 
+    @property
+    def game_state(self) -> int:
+        return self.engine.state
+
+    @game_state.setter
+    def game_state(self, value: int):
+        self.engine.state = value
     
     def coin_toss(self) -> Player:
         if random.randint(0, 1) == 0:
@@ -164,172 +270,150 @@ class Game():
             self.next_player = self.white_player
         
         self.staring_plauer = self.current_player
+        self.engine.side = self.current_player.piece_type
+
+    # callbacks are called as callback(event, value) after every logged change;
+    # make_move and unmake_move are silent so search does not flood them
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _publish(self, event: str, value):
+        for callback in list(self.subscribers):
+            callback(event, value)
+
+    def _publish_move(self, event: str, player: Player):
+        self._publish(event, self.move_history[-1])
+        if self.game_state == Game.GAME_OVER:
+            self._publish(Game.GAME_OVER_EVENT, self.winner)
+        elif self.current_player != player:
+            self._publish(Game.PLAYER_CHANGE_EVENT, self.current_player)
+
+    def board_masks(self) -> tuple:
+        engine = self.engine
+        return engine.white, engine.black, engine.milled[BoardSpace.WHITE_SPACE] | engine.milled[BoardSpace.BLACK_SPACE]
+
+    def _sync_players(self):
+        # the engine tracks whose turn it is, keep the Player references in step with it
+        if self.current_player.piece_type != self.engine.side:
+            self.current_player, self.next_player = self.next_player, self.current_player
+
+        if self.engine.state == Game.GAME_OVER:
+            self.winner = self.white_player if self.engine.winner == BoardSpace.WHITE_SPACE else self.black_player
+        else:
+            self.winner = None
 
     def place_piece(self, space_name):
-        if self.game_state != Game.PLACE_PIECE:
+        if space_name not in SPACE_INDEX:
             return
-        
-        #make_mill = False
-        if self.board.get_space(space_name) != BoardSpace.EMPTY_SPACE:
+
+        player = self.current_player
+        before = self.board_masks()
+        if not self.engine.place_piece(SPACE_INDEX[space_name]):
             return
 
         # log piece placement
-        self.move_history.append(MoveRecord("PLACE", self.current_player, space_name))
-        
-        if self.current_player.pieces_in_deck > 0:
-            self.current_player.pieces_in_deck -= 1
-            self.current_player.pieces_on_board += 1
-
-            self.board.set_space_value(space_name, self.current_player.piece_type)
-
-            if self.check_for_mill(space_name):
-                self.game_state = Game.REMOVE_PIECE
-            else:
-                self.change_player()
+        self.move_history.append(MoveRecord("PLACE", player, space_name, delta=BoardDelta.between(before, self.board_masks())))
+        self._sync_players()
+        self._publish_move(Game.PLACE_EVENT, player)
     
     
     def remove_piece(self, space_name):
-        if self.game_state != Game.REMOVE_PIECE:
-            return
-        
-        state = self.board.get_space(space_name)
-        if (self.board.get_space(space_name) == self.current_player.piece_type or 
-            self.board.get_space(space_name) == BoardSpace.EMPTY_SPACE):
+        if space_name not in SPACE_INDEX:
             return
-        
-        if (self.check_for_mill(space_name)):
-            opponent_has_piece_not_in_mill = False
 
-            for space in self.board.spaces:
-                if self.board.spaces[space].state == self.next_player.piece_type and not self.check_for_mill(space):
-                    opponent_has_piece_not_in_mill = True
-                    break
-            
-            if opponent_has_piece_not_in_mill:
-                return
+        player = self.current_player
+        before = self.board_masks()
+        if not self.engine.remove_piece(SPACE_INDEX[space_name]):
+            return
         
         # log piece removal
-        self.move_history.append(MoveRecord("REMOVE", self.current_player, space_name))
-        
-        self.board.set_space_value(space_name, BoardSpace.EMPTY_SPACE)
-        self.current_player.formed_mill_this_turn = False
-
-        
-        self.next_player.pieces_on_board -= 1
-        self.change_player()
+        self.move_history.append(MoveRecord("REMOVE", player, space_name, delta=BoardDelta.between(before, self.board_masks())))
+        self._sync_players()
+        self._publish_move(Game.REMOVE_EVENT, player)
 
     
     def check_for_mill(self, space_name):
-        if self.board.get_space(space_name) == BoardSpace.EMPTY_SPACE:
+        if space_name not in SPACE_INDEX:
             return False
 
-        space = self.board.spaces[space_name]
-
-        visited_horizontal = set([space])
-        visited_vertical = set([space])
-
-        for neighbor in space.neighbors.values():
-            if neighbor.state == space.state:
-                # First letter of name changes on vertical movement, second number part on horizontal
-
-                if neighbor.space_name[0] != space_name[0]:
-                    direction = "horizontal"
-                    visited_horizontal.add(neighbor)
-                else:
-                    direction = "vertical"
-                    visited_vertical.add(neighbor)
-                
-                for neighbors_neighbor in neighbor.neighbors.values():
-                    if neighbors_neighbor.state != space.state:
-                        continue
-
-                    # if we've already visited this neighbor skip it
-                    if neighbors_neighbor in visited_vertical or neighbors_neighbor in visited_horizontal:
-                        continue
-
-                    if direction == "vertical":
-                        # if the direction of movment changed skip this neighbor
-                        if neighbors_neighbor.space_name[0] != space_name[0]:
-                            continue
-
-                        visited_vertical.add(neighbors_neighbor)
-                    else:
-                        # if the direction of movment changed skip this neighbor
-                        if neighbors_neighbor.space_name[1] != space_name[1]:
-                            continue
-
-                        visited_horizontal.add(neighbors_neighbor)
-        
-        if len(visited_vertical) == 3:
-            return True
-        
-        if len(visited_horizontal) == 3:
-            return True
-        
-        return False
+        return self.engine.check_for_mill(SPACE_INDEX[space_name])
     
     def move_piece(self, start_space_name, end_space_name):
-        if self.game_state != Game.MOVE_PIECE:
+        if start_space_name not in SPACE_INDEX or end_space_name not in SPACE_INDEX:
             return
 
-        if self.current_player.pieces_in_deck > 0:
+        player = self.current_player
+        before = self.board_masks()
+        if not self.engine.move_piece(SPACE_INDEX[start_space_name], SPACE_INDEX[end_space_name]):
             return
+        
+        # log piece movement
+        self.move_history.append(MoveRecord("MOVE", player, start_space_name, end_space_name, delta=BoardDelta.between(before, self.board_masks())))
+        self._sync_players()
+        self._publish_move(Game.MOVE_EVENT, player)
 
-        start_space = self.board.get_space(start_space_name)
-        end_space = self.board.get_space(end_space_name)
 
-        if start_space != self.current_player.piece_type:
-            return
-        
-        
-        if end_space != BoardSpace.EMPTY_SPACE:
-            return
 
-        if end_space_name not in self.board.spaces[start_space_name].neighbors and self.current_player.pieces_on_board > 3:    
-            return
-        
-        # log piece movement
-        self.move_history.append(MoveRecord("MOVE", self.current_player, start_space_name, end_space_name))
-        
-        self.board.spaces[start_space_name].state = BoardSpace.EMPTY_SPACE
-        self.board.spaces[end_space_name].state = self.current_player.piece_type
+    def legal_moves(self) -> list:
+        return self.engine.legal_moves()
 
-        if self.check_for_mill(end_space_name):
-            self.game_state = Game.REMOVE_PIECE
-        else:
-            self.change_player()
+    def has_legal_move(self) -> bool:
+        return self.engine.has_legal_move()
 
+    def play_move(self, action):
+        # apply an action from legal_moves as if a player had made it
+        move_type, start, end = action
 
+        if move_type == bitboard.PLACE:
+            self.place_piece(SPACE_NAMES[start])
+        elif move_type == bitboard.MOVE:
+            self.move_piece(SPACE_NAMES[start], SPACE_NAMES[end])
+        elif move_type == bitboard.REMOVE:
+            self.remove_piece(SPACE_NAMES[start])
 
-    def change_player(self):
+    # make_move and unmake_move explore positions in place, without logging to
+    # move_history, so that search can walk the game tree on a single Game
+    def make_move(self, action) -> bool:
+        if not self.engine.make_move(action):
+            return False
 
-        temp = self.current_player
-        self.current_player = self.next_player
-        self.next_player = temp
-        
-        if self.current_player.pieces_in_deck + self.current_player.pieces_on_board < 3:
-            self.winner = self.next_player
-            self.game_state = Game.GAME_OVER
-            return
-        
-        if self.current_player.pieces_in_deck > 0:
-            self.game_state = Game.PLACE_PIECE
+        self._sync_players()
+        return True
+
+    def unmake_move(self):
+        self.engine.unmake_move()
+        self._sync_players()
+
+    def change_player(self):
+        self.engine.change_player()
+        self._sync_players()
+        if self.game_state == Game.GAME_OVER:
+            self._publish(Game.GAME_OVER_EVENT, self.winner)
         else:
-            self.game_state = Game.MOVE_PIECE
+            self._publish(Game.PLAYER_CHANGE_EVENT, self.current_player)
     
-    def surrender(self):
-        self.winner = self.next_player
-        self.game_state = Game.GAME_OVER
+    def surrender(self, player : Player = None):
+        self.engine.surrender(player.piece_type if player is not None else None)
+        self._sync_players()
+        self._publish(Game.GAME_OVER_EVENT, self.winner)
     
     def reset_game(self):
-        self.board = Game.Board()
+        self.board.reset()
+        self.engine = self.board.engine
         self.move_history = []
         self.game_state = Game.PLACE_PIECE
         self.winner = None
 
         self.current_player = self.staring_plauer
+        self.engine.side = self.current_player.piece_type
         
         if self.current_player == self.white_player:
             self.next_player = self.black_player
         else:
             self.next_player = self.white_player
+
+        self._publish(Game.PLAYER_CHANGE_EVENT, self.current_player)
@@ -0,0 +1,196 @@
+"""Compact binary game records.
+
+A move takes one or two bytes:
+
+    0ttppppp            PLACE (t = 0) or REMOVE (t = 1) on point p
+    1sssssss 000eeeee   MOVE from point s to point e
+
+An archive file starts with a short header and is followed by one frame per
+game: a flags byte holding the starting side and the winner, the length of
+the move bytes as a varint, and the move bytes. Frames are only ever
+appended, so an archive can grow across many runs, and ``read_games``
+streams it back one game at a time without decoding any moves until they
+are asked for.
+"""
+
+import io
+import os
+from typing import NamedTuple
+
+import bitboard
+from bitboard import PLACE, MOVE, REMOVE, SPACE_INDEX, SPACE_NAMES, WHITE
+
+MAGIC = b"MMGA"
+VERSION = 1
+HEADER = MAGIC + bytes((VERSION,))
+
+DRAW = 0
+_REMOVE_FLAG = 0x20
+_MOVE_FLAG = 0x80
+_MOVE_BYTES = bytes(range(_MOVE_FLAG, 0x100))
+
+DEFAULT_FLUSH_BYTES = 1 << 20
+
+
+def encode_action(action) -> bytes:
+    move_type, start, end = action
+    if move_type == MOVE:
+        return bytes((_MOVE_FLAG | start, end))
+    if move_type == REMOVE:
+        return bytes((_REMOVE_FLAG | start,))
+    return bytes((start,))
+
+
+def encode_actions(actions) -> bytes:
+    return b"".join(encode_action(action) for action in actions)
+
+
+def encode_records(records) -> bytes:
+    """Encode a Game's move_history."""
+    return encode_actions((record.move_type, SPACE_INDEX[record.start_space],
+                           SPACE_INDEX[record.end_space] if record.end_space else None) for record in records)
+
+
+def decode_actions(data: bytes):
+    """Yield the action tuples encoded in data."""
+    position = 0
+    length = len(data)
+    while position < length:
+        byte = data[position]
+        if byte & _MOVE_FLAG:
+            yield MOVE, byte & 0x7F, data[position + 1]
+            position += 2
+        elif byte & _REMOVE_FLAG:
+            yield REMOVE, byte & 0x1F, None
+            position += 1
+        else:
+            yield PLACE, byte, None
+            position += 1
+
+
+class ArchivedGame(NamedTuple):
+    """One game as stored: the starting side and winner are colors (winner DRAW for none)."""
+    starting_side: int
+    winner: int
+    data: bytes
+
+    @property
+    def plies(self) -> int:
+        # every ply has exactly one byte without the top bit set
+        return len(self.data.translate(None, _MOVE_BYTES))
+
+    def actions(self):
+        return decode_actions(self.data)
+
+    def replay(self) -> bitboard.Bitboard:
+        """The final position, replayed on a Bitboard."""
+        engine = bitboard.Bitboard(self.starting_side)
+        for action in self.actions():
+            if not engine.make_move(action):
+                raise ValueError(f"illegal archived move {action}")
+        engine.undo_stack.clear()
+        return engine
+
+    def move_strings(self) -> list:
+        """The moves in the same text form as str(MoveRecord)."""
+        engine = bitboard.Bitboard(self.starting_side)
+        strings = []
+        for move_type, start, end in self.actions():
+            player = "WHITE" if engine.side == WHITE else "BLACK"
+            strings.append(f"{player} {move_type} {SPACE_NAMES[start]} {SPACE_NAMES[end] if end is not None else ''}")
+            engine.make_move((move_type, start, end))
+        return strings
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class ArchiveWriter:
+    """Appends games to an archive file, writing them out in batches.
+
+    Games are collected in memory until ``flush_bytes`` are waiting, then
+    written with a single call. Use it as a context manager, or call
+    ``close``, so the last batch is written.
+    """
+
+    def __init__(self, path: str, flush_bytes: int = DEFAULT_FLUSH_BYTES):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.file = open(path, "ab")
+        self.buffer = bytearray()
+        self.games = 0
+
+        if self.file.tell() == 0:
+            self.buffer += HEADER
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, starting_side: int, winner: int, data: bytes):
+        """Add one game; data is the encoded moves, see encode_actions and encode_records."""
+        self.buffer.append(starting_side | winner << 2)
+        _write_varint(self.buffer, len(data))
+        self.buffer += data
+        self.games += 1
+        if len(self.buffer) >= self.flush_bytes:
+            self.flush()
+
+    def write_game(self, game):
+        """Add a finished or abandoned MadMansMorris.Game."""
+        winner = game.winner.piece_type if game.winner is not None else DRAW
+        self.write(game.staring_plauer.piece_type, winner, encode_records(game.move_history))
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def _read_varint(stream) -> int:
+    value = 0
+    shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            raise ValueError("archive ends inside a frame")
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def read_games(path: str, buffer_size: int = io.DEFAULT_BUFFER_SIZE * 16):
+    """Yield every ArchivedGame in the archive at path, in the order they were written."""
+    with open(path, "rb", buffering=buffer_size) as stream:
+        header = stream.read(len(HEADER))
+        if not header:
+            return
+        if header != HEADER:
+            raise ValueError(f"{path} is not a version {VERSION} game archive")
+
+        while True:
+            flags = stream.read(1)
+            if not flags:
+                return
+            length = _read_varint(stream)
+            data = stream.read(length)
+            if len(data) != length:
+                raise ValueError("archive ends inside a frame")
+            yield ArchivedGame(flags[0] & 3, flags[0] >> 2, data)
+
+
+def count_games(path: str) -> int:
+    return sum(1 for _ in read_games(path)) if os.path.exists(path) else 0
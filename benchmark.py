@@ -0,0 +1,275 @@
+"""Performance benchmarks.
+
+Measures the throughput of the pieces the rest of the program leans on:
+mill checks, placing, moving and removing pieces through Game, building a
+Board and resetting a Game, whole random games, leaf evaluations,
+alpha-beta nodes per second and how fast a fresh interpreter imports the
+core modules. Every benchmark reports a rate in operations
+per second, the best of a few repeats, and the results are written as
+JSON::
+
+    python benchmark.py --out results.json
+    python benchmark.py --save-baseline
+    python benchmark.py --baseline benchmark_baseline.json --threshold 0.3
+
+With a baseline, any benchmark whose rate fell by more than the threshold
+fraction is reported as a regression and the exit status is 1. Baselines
+only mean something on the machine that recorded them.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import bitboard
+import search
+import simulate
+from MadMansMorris import Game
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_REPEAT = 5
+
+# the midgame position searched by the search benchmark
+SEARCH_SEED = 11
+SEARCH_PLIES = 24
+SEARCH_DEPTH = 4
+
+# modules that short-lived tools and worker processes import, timed by the imports benchmark
+CORE_MODULES = ("MadMansMorris", "bitboard", "simulate", "search", "mcts")
+
+
+def _recorded_game(seed: int = 7, max_plies: int = 400) -> tuple:
+    # a fixed random game, (starting side, actions), replayed by the move benchmarks
+    rng = random.Random(seed)
+    engine = bitboard.Bitboard(bitboard.WHITE)
+    actions = []
+    while engine.state != bitboard.GAME_OVER and len(actions) < max_plies:
+        action = rng.choice(engine.legal_moves())
+        engine.make_move(action)
+        actions.append(action)
+    return bitboard.WHITE, actions
+
+
+def bench_check_for_mill(scale: float) -> dict:
+    side, actions = _recorded_game()
+    game = Game(autostart=False)
+    game.engine.side = side
+    for action in actions[:30]:
+        game.play_move(action)
+
+    names = bitboard.SPACE_NAMES
+    rounds = max(1, int(80000 * scale))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            game.check_for_mill(name)
+    return {"operations": rounds * len(names), "seconds": time.perf_counter() - start}
+
+
+def bench_moves(scale: float) -> dict:
+    """Game.place_piece, move_piece and remove_piece, timed separately while replaying a recorded game."""
+    side, actions = _recorded_game()
+    counts = {bitboard.PLACE: 0, bitboard.MOVE: 0, bitboard.REMOVE: 0}
+    seconds = dict.fromkeys(counts, 0.0)
+    names = bitboard.SPACE_NAMES
+    clock = time.perf_counter
+
+    for _ in range(max(1, int(200 * scale))):
+        game = Game(autostart=False)
+        game.engine.side = side
+        game.current_player, game.next_player = game.white_player, game.black_player
+        for move_type, start, end in actions:
+            if move_type == bitboard.PLACE:
+                before = clock()
+                game.place_piece(names[start])
+            elif move_type == bitboard.MOVE:
+                before = clock()
+                game.move_piece(names[start], names[end])
+            else:
+                before = clock()
+                game.remove_piece(names[start])
+            seconds[move_type] += clock() - before
+            counts[move_type] += 1
+
+    return {move_type: {"operations": counts[move_type], "seconds": seconds[move_type]} for move_type in counts}
+
+
+def bench_board_construction(scale: float) -> dict:
+    rounds = max(1, int(20000 * scale))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        Game.Board().spaces
+    return {"operations": rounds, "seconds": time.perf_counter() - start}
+
+
+def bench_reset_game(scale: float) -> dict:
+    game = Game(autostart=False)
+    rounds = max(1, int(50000 * scale))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        game.place_piece("D2")
+        game.reset_game()
+    return {"operations": rounds, "seconds": time.perf_counter() - start}
+
+
+def bench_random_games(scale: float) -> dict:
+    games = max(1, int(100 * scale))
+    spec = simulate.PlayerSpec("random")
+    start = time.perf_counter()
+    for seed in range(games):
+        simulate.play_game(spec, spec, seed=seed)
+    return {"operations": games, "seconds": time.perf_counter() - start}
+
+
+def bench_search(scale: float) -> dict:
+    rng = random.Random(SEARCH_SEED)
+    engine = bitboard.Bitboard(bitboard.WHITE)
+    for _ in range(SEARCH_PLIES):
+        engine.make_move(rng.choice(engine.legal_moves()))
+    engine.undo_stack.clear()
+
+    depth = SEARCH_DEPTH if scale >= 1 else 2
+    searcher = search.AlphaBetaSearch()
+    start = time.perf_counter()
+    searcher.search(engine, max_depth=depth)
+    return {"operations": searcher.nodes, "seconds": time.perf_counter() - start}
+
+
+def bench_evaluate(scale: float) -> dict:
+    """search.evaluate over every position of a recorded game."""
+    side, actions = _recorded_game()
+    engine = bitboard.Bitboard(side)
+    positions = []
+    for action in actions:
+        engine.make_move(action)
+        positions.append(engine.copy())
+
+    rounds = max(1, int(200 * scale))
+    evaluate = search.evaluate
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for position in positions:
+            evaluate(position)
+    return {"operations": rounds * len(positions), "seconds": time.perf_counter() - start}
+
+
+def _import_seconds(module: str) -> float:
+    # the cumulative column of -X importtime, in a fresh interpreter
+    directory = os.path.dirname(os.path.abspath(__file__))
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=directory,
+                            capture_output=True, text=True, check=True).stderr
+    line = [line for line in stderr.splitlines() if line.split("|")[-1].strip() == module][-1]
+    return int(line.split("|")[1]) / 1e6
+
+
+def bench_imports(scale: float) -> dict:
+    """Import time of each core module, as imports per second."""
+    return {module: {"operations": 1, "seconds": _import_seconds(module)} for module in CORE_MODULES}
+
+
+# name -> (function, unit); a function returning a dict of dicts reports one rate per key
+BENCHMARKS = {
+    "check_for_mill": (bench_check_for_mill, "checks/s"),
+    "moves": (bench_moves, "moves/s"),
+    "board_construction": (bench_board_construction, "boards/s"),
+    "reset_game": (bench_reset_game, "resets/s"),
+    "random_games": (bench_random_games, "games/s"),
+    "evaluate": (bench_evaluate, "evaluations/s"),
+    "search": (bench_search, "nodes/s"),
+    "imports": (bench_imports, "imports/s"),
+}
+
+
+def _rates(name: str, measured: dict) -> dict:
+    if "operations" in measured:
+        return {name: measured["operations"] / measured["seconds"] if measured["seconds"] else 0.0}
+    return {f"{name}.{part.lower()}": value["operations"] / value["seconds"] if value["seconds"] else 0.0
+            for part, value in measured.items()}
+
+
+def run_benchmarks(names=None, repeat: int = DEFAULT_REPEAT, scale: float = 1.0, progress=None) -> dict:
+    """Run the named benchmarks, all by default, and return ``{result: {"rate", "unit"}}`` with the best of repeat runs."""
+    results = {}
+    for name in names or BENCHMARKS:
+        function, unit = BENCHMARKS[name]
+        best = {}
+        for _ in range(repeat):
+            for result, rate in _rates(name, function(scale)).items():
+                best[result] = max(rate, best.get(result, 0.0))
+        for result, rate in best.items():
+            results[result] = {"rate": rate, "unit": unit}
+            if progress is not None:
+                progress(f"{result:28} {rate:14.1f} {unit}")
+    return results
+
+
+def report(results: dict) -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """``[(name, baseline rate, rate, change)]`` for every result slower than baseline by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["rate"]
+        change = result["rate"] / before - 1.0 if before else 0.0
+        if change < -threshold:
+            regressions.append((name, before, result["rate"], change))
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path) as stream:
+        return json.load(stream)["results"]
+
+
+def save(path: str, results: dict):
+    with open(path, "w") as stream:
+        json.dump(report(results), stream, indent=2, sort_keys=True)
+        stream.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Mad Man's Morris engine.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run, all by default")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the work done by every benchmark")
+    parser.add_argument("--out", help="file to write the results to as JSON")
+    parser.add_argument("--baseline", help="results to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fractional slowdown reported as a regression")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help=f"store the results as the new baseline, {DEFAULT_BASELINE} by default")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.repeat, args.scale, progress=print)
+    if args.out:
+        save(args.out, results)
+    if args.save_baseline:
+        save(args.save_baseline, results)
+
+    if not args.baseline:
+        return 0
+    regressions = compare(results, load(args.baseline), args.threshold)
+    for name, before, after, change in regressions:
+        print(f"REGRESSION {name}: {before:.1f} -> {after:.1f} ({100.0 * change:+.1f}%)")
+    if not regressions:
+        print(f"no regressions beyond {100.0 * args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
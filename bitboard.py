@@ -0,0 +1,614 @@
+"""Bitboard engine for Mad Man's Morris.
+
+The 24 playable points are numbered in the order Game.Board lists them (row
+by row, A1 first and G7 last) and a position is packed into two 24-bit
+integers, one for each colour. Point ``i`` is occupied when bit ``1 << i`` is
+set in that colour's integer.
+"""
+
+import random
+from typing import NamedTuple
+
+# These mirror BoardSpace and Game so that values can be passed between the
+# two without translation.
+EMPTY = 0
+WHITE = 1
+BLACK = 2
+
+GAME_OVER = -1
+PLACE_PIECE = 0
+MOVE_PIECE = 1
+REMOVE_PIECE = 2
+
+# action types, named the same as MoveRecord.move_type; flying is a MOVE
+PLACE = "PLACE"
+MOVE = "MOVE"
+REMOVE = "REMOVE"
+
+PIECES_PER_PLAYER = 9
+
+SPACE_NAMES = (
+    "A1", "D1", "G1",
+    "B2", "D2", "F2",
+    "C3", "D3", "E3",
+    "A4", "B4", "C4", "E4", "F4", "G4",
+    "C5", "D5", "E5",
+    "B6", "D6", "F6",
+    "A7", "D7", "G7",
+)
+SPACE_INDEX = {name: index for index, name in enumerate(SPACE_NAMES)}
+
+NUM_SPACES = len(SPACE_NAMES)
+FULL_BOARD = (1 << NUM_SPACES) - 1
+
+_MILL_NAMES = (
+    # horizontal
+    ("A1", "D1", "G1"), ("B2", "D2", "F2"), ("C3", "D3", "E3"), ("A4", "B4", "C4"),
+    ("E4", "F4", "G4"), ("C5", "D5", "E5"), ("B6", "D6", "F6"), ("A7", "D7", "G7"),
+    # vertical
+    ("A1", "A4", "A7"), ("B2", "B4", "B6"), ("C3", "C4", "C5"), ("D1", "D2", "D3"),
+    ("D5", "D6", "D7"), ("E3", "E4", "E5"), ("F2", "F4", "F6"), ("G1", "G4", "G7"),
+)
+
+# every line of three points that forms a mill, as index triples and as masks
+MILLS = tuple(tuple(SPACE_INDEX[name] for name in mill) for mill in _MILL_NAMES)
+MILL_MASKS = tuple((1 << a) | (1 << b) | (1 << c) for a, b, c in MILLS)
+
+
+def opponent(color: int) -> int:
+    return BLACK if color == WHITE else WHITE
+
+
+def iter_bits(mask: int):
+    """Yield the index of every set bit in mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _build_adjacency():
+    # two points are adjacent exactly when they are next to each other in a mill line
+    neighbors = [[] for _ in range(NUM_SPACES)]
+    for a, b, c in MILLS:
+        for first, second in ((a, b), (b, c)):
+            neighbors[first].append(second)
+            neighbors[second].append(first)
+    return tuple(tuple(sorted(n)) for n in neighbors)
+
+
+def _build_zobrist_keys():
+    # a fixed seed keeps hashes stable between processes and runs, so they can be stored
+    rng = random.Random(0x4D4F52524953)
+
+    def key():
+        return rng.getrandbits(64)
+
+    stones = tuple(tuple(key() if color else 0 for _ in range(NUM_SPACES)) for color in (EMPTY, WHITE, BLACK))
+    deck = tuple(tuple(key() if color else 0 for _ in range(PIECES_PER_PLAYER + 1)) for color in (EMPTY, WHITE, BLACK))
+    side = (0, 0, key())
+    remove = key()
+    return stones, deck, side, remove
+
+
+ZOBRIST_STONES, ZOBRIST_DECK, ZOBRIST_SIDE, ZOBRIST_REMOVE = _build_zobrist_keys()
+
+ADJACENCY = _build_adjacency()
+NEIGHBOR_MASKS = tuple(sum(1 << n for n in neighbors) for neighbors in ADJACENCY)
+
+# every point lies on exactly two mill lines, one horizontal and one vertical
+POINT_MILLS = tuple(tuple(mask for mask in MILL_MASKS if mask & (1 << index)) for index in range(NUM_SPACES))
+
+
+def _crossing_lines(index: int):
+    # each mill line through index, with the other lines through the line's two other points
+    return tuple((line, tuple(next(other for other in POINT_MILLS[space] if other != line)
+                              for space in iter_bits(line & ~(1 << index))))
+                 for line in POINT_MILLS[index])
+
+
+# the lines along which mills and double mills change when the stone on a point changes
+CROSSING_LINES = tuple(_crossing_lines(index) for index in range(NUM_SPACES))
+
+
+def milled_mask(stones: int) -> int:
+    """The stones of one colour that sit in a complete mill line."""
+    milled = 0
+    for mask in MILL_MASKS:
+        if stones & mask == mask:
+            milled |= mask
+    return milled
+
+
+def _neighbor_tables():
+    tables = []
+    for shift in (0, 8, 16):
+        # each value is the neighbours of its lowest set point joined with the neighbours of the rest
+        table = [0] * 256
+        for byte in range(1, 256):
+            low = byte & -byte
+            point = shift + low.bit_length() - 1
+            table[byte] = table[byte ^ low] | (NEIGHBOR_MASKS[point] if point < NUM_SPACES else 0)
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+# NEIGHBOR_TABLES[byte][value]: the points next to any point in that byte of a mask
+NEIGHBOR_TABLES = _neighbor_tables()
+
+
+def neighbors_of(mask: int) -> int:
+    """The points next to at least one point of mask, in three lookups."""
+    low, middle, high = NEIGHBOR_TABLES
+    return low[mask & 0xFF] | middle[mask >> 8 & 0xFF] | high[mask >> 16]
+
+
+# The counted evaluation features of both colours, kept up to date by
+# Bitboard, are packed into one integer: a FEATURE_BITS wide field per
+# feature, white's fields in the low bits and black's above them. Feature f
+# of colour c is ``features >> FEATURE_SHIFTS[f][c] & FEATURE_MASK``.
+MILL_COUNT, OPEN_TWOS, MOBILITY, DOUBLE_MILLS = range(4)
+# wide enough for the largest count, 36 for the mobility of nine stones
+FEATURE_BITS = 6
+FEATURE_MASK = (1 << FEATURE_BITS) - 1
+COLOR_SHIFTS = (0, 0, 4 * FEATURE_BITS)
+FEATURE_SHIFTS = tuple(tuple(shift + FEATURE_BITS * feature for shift in COLOR_SHIFTS) for feature in range(4))
+
+# one in the field of each feature, before shifting into a colour's fields
+MILL_UNIT, OPEN_TWO_UNIT, MOBILITY_UNIT, DOUBLE_MILL_UNIT = (1 << FEATURE_BITS * feature for feature in range(4))
+
+
+def count_features(white: int, black: int) -> int:
+    """The packed evaluation features of a position, counted from scratch."""
+    features = 0
+    empty = FULL_BOARD & ~(white | black)
+    for color, stones, others in ((WHITE, white, black), (BLACK, black, white)):
+        counts = 0
+        for mask in MILL_MASKS:
+            if stones & mask == mask:
+                counts += MILL_UNIT
+            elif not others & mask and (stones & mask).bit_count() == 2:
+                counts += OPEN_TWO_UNIT
+        for index in iter_bits(stones):
+            counts += (NEIGHBOR_MASKS[index] & empty).bit_count() * MOBILITY_UNIT
+            first, second = POINT_MILLS[index]
+            if stones & first == first and stones & second == second:
+                counts += DOUBLE_MILL_UNIT
+        features += counts << COLOR_SHIFTS[color]
+    return features
+
+
+class Features(NamedTuple):
+    """The evaluation features of one colour, see Bitboard.color_features."""
+    in_deck: int
+    on_board: int
+    mills: int  # complete mill lines
+    open_twos: int  # lines holding two of its stones and an empty point
+    blocked: int  # stones with no empty neighbour, see Bitboard.blocked_stones
+    mobility: int  # empty neighbours summed over its stones, the moves it has when not flying
+    double_mills: int  # stones in two complete mills at once
+
+
+class GameState(NamedTuple):
+    """An immutable, hashable position, see Bitboard.snapshot and Bitboard.from_state.
+
+    It holds only the stone masks, the piece counts, the phase (``state``),
+    the side to move and the winner; everything else is derived from those,
+    so equal positions compare and hash equal and pickle to a few dozen bytes.
+    """
+    white: int
+    black: int
+    white_deck: int
+    black_deck: int
+    white_on_board: int
+    black_on_board: int
+    side: int
+    state: int
+    winner: int
+
+
+class Bitboard:
+    """A complete game position with the same rules as Game.
+
+    ``place_piece``, ``move_piece`` and ``remove_piece`` take point indexes
+    and return True when the action was legal and applied, False otherwise.
+    Lists indexed by colour (``stones``, ``milled``, ``pieces_in_deck`` and
+    ``pieces_on_board``) leave slot 0 unused so that WHITE and BLACK can be
+    used directly as indexes.
+
+    ``milled`` caches, per colour, the stones that currently sit in a mill.
+    It is updated incrementally along the mill lines of every point that
+    changes, and so is ``features``, the packed counted evaluation features
+    of both colours (see FEATURE_SHIFTS and Features). Reading one is a
+    shift and a mask, and ``blocked_stones`` is three table lookups, so an
+    evaluation never has to scan the board::
+
+        mobility = engine.features >> FEATURE_SHIFTS[MOBILITY][color] & FEATURE_MASK
+
+    Actions are ``(move_type, start, end)`` tuples of an action type and
+    point indexes, with ``end`` set to None for placements and removals.
+    ``make_move`` applies one in place and pushes what it overwrote onto
+    ``undo_stack`` so that ``unmake_move`` can restore it exactly.
+
+    ``stone_hash`` is the Zobrist hash of the stones on the board and is
+    updated incrementally whenever a stone is placed, moved or removed. The
+    ``zobrist`` property folds in the side to move, the pieces in each deck
+    and a pending removal.
+    """
+
+    __slots__ = ("stones", "milled", "pieces_in_deck", "pieces_on_board", "side", "state", "winner",
+                 "stone_hash", "features", "undo_stack")
+
+    def __init__(self, side: int = WHITE):
+        self.stones = [0, 0, 0]
+        self.milled = [0, 0, 0]
+        self.features = 0
+        self.stone_hash = 0
+        self.pieces_in_deck = [0, PIECES_PER_PLAYER, PIECES_PER_PLAYER]
+        self.pieces_on_board = [0, 0, 0]
+
+        self.side = side
+        self.state = PLACE_PIECE
+        self.winner = EMPTY
+
+        self.undo_stack = []
+
+    @property
+    def white(self) -> int:
+        return self.stones[WHITE]
+
+    @property
+    def black(self) -> int:
+        return self.stones[BLACK]
+
+    def copy(self) -> 'Bitboard':
+        other = Bitboard.__new__(Bitboard)
+        other.stones = self.stones[:]
+        other.milled = self.milled[:]
+        other.pieces_in_deck = self.pieces_in_deck[:]
+        other.pieces_on_board = self.pieces_on_board[:]
+        other.side = self.side
+        other.state = self.state
+        other.winner = self.winner
+        other.stone_hash = self.stone_hash
+        other.features = self.features
+        other.undo_stack = []
+        return other
+
+    def snapshot(self) -> GameState:
+        stones = self.stones
+        deck = self.pieces_in_deck
+        on_board = self.pieces_on_board
+        return GameState(stones[WHITE], stones[BLACK], deck[WHITE], deck[BLACK], on_board[WHITE], on_board[BLACK],
+                         self.side, self.state, self.winner)
+
+    @classmethod
+    def from_state(cls, state: GameState) -> 'Bitboard':
+        engine = cls.__new__(cls)
+        white, black = state.white, state.black
+        engine.stones = [0, white, black]
+        engine.milled = [0, milled_mask(white), milled_mask(black)]
+        stone_hash = 0
+        for index in iter_bits(white):
+            stone_hash ^= ZOBRIST_STONES[WHITE][index]
+        for index in iter_bits(black):
+            stone_hash ^= ZOBRIST_STONES[BLACK][index]
+        engine.stone_hash = stone_hash
+        engine.pieces_in_deck = [0, state.white_deck, state.black_deck]
+        engine.pieces_on_board = [0, state.white_on_board, state.black_on_board]
+        engine.side = state.side
+        engine.state = state.state
+        engine.winner = state.winner
+        engine.features = count_features(white, black)
+        engine.undo_stack = []
+        return engine
+
+    def feature(self, feature: int, color: int) -> int:
+        return self.features >> FEATURE_SHIFTS[feature][color] & FEATURE_MASK
+
+    def blocked_stones(self, color: int) -> int:
+        """The stones of color with no empty neighbour."""
+        return self.stones[color] & ~neighbors_of(self.empty_spaces())
+
+    def color_features(self, color: int) -> Features:
+        features = self.features
+        mills, twos, mobility, doubles = (features >> shifts[color] & FEATURE_MASK for shifts in FEATURE_SHIFTS)
+        return Features(self.pieces_in_deck[color], self.pieces_on_board[color], mills, twos,
+                        self.blocked_stones(color).bit_count(), mobility, doubles)
+
+    @property
+    def zobrist(self) -> int:
+        deck = self.pieces_in_deck
+        key = (self.stone_hash ^ ZOBRIST_SIDE[self.side]
+               ^ ZOBRIST_DECK[WHITE][deck[WHITE]] ^ ZOBRIST_DECK[BLACK][deck[BLACK]])
+        if self.state == REMOVE_PIECE:
+            key ^= ZOBRIST_REMOVE
+        return key
+
+    def get(self, index: int) -> int:
+        bit = 1 << index
+        if self.stones[WHITE] & bit:
+            return WHITE
+        if self.stones[BLACK] & bit:
+            return BLACK
+        return EMPTY
+
+    def set(self, index: int, value: int):
+        self.stone_hash ^= ZOBRIST_STONES[self.get(index)][index]
+        if value == WHITE or value == BLACK:
+            self.stone_hash ^= ZOBRIST_STONES[value][index]
+
+        bit = 1 << index
+        for color in (WHITE, BLACK):
+            if self.stones[color] & bit:
+                self.stones[color] &= ~bit
+                self._stone_removed(color, index)
+        if value == WHITE or value == BLACK:
+            self.stones[value] |= bit
+            self._stone_added(value, index)
+
+    def empty_spaces(self) -> int:
+        return FULL_BOARD & ~(self.stones[WHITE] | self.stones[BLACK])
+
+    def pieces_not_in_mill(self, color: int) -> int:
+        return self.stones[color] & ~self.milled[color]
+
+    def check_for_mill(self, index: int) -> bool:
+        return bool((self.milled[WHITE] | self.milled[BLACK]) & (1 << index))
+
+    def _stone_added(self, color: int, index: int):
+        # update milled and the features for a stone of color just put on the empty point index
+        other = BLACK if color == WHITE else WHITE
+        mine = self.stones[color]
+        theirs = self.stones[other]
+        neighbors = NEIGHBOR_MASKS[index]
+
+        # the stone gains its empty neighbours and every neighbour loses index
+        mine_delta = ((neighbors & ~(mine | theirs)).bit_count() - (neighbors & mine).bit_count()) * MOBILITY_UNIT
+        theirs_delta = -(neighbors & theirs).bit_count() * MOBILITY_UNIT
+
+        completed = 0
+        for line, crossing in CROSSING_LINES[index]:
+            if mine & line == line:
+                mine_delta += MILL_UNIT - OPEN_TWO_UNIT
+                self.milled[color] |= line
+                completed += 1
+                # the line's other stones become double mills where their other line is complete
+                for cross in crossing:
+                    if mine & cross == cross:
+                        mine_delta += DOUBLE_MILL_UNIT
+            elif not theirs & line:
+                if (mine & line).bit_count() == 2:
+                    mine_delta += OPEN_TWO_UNIT
+            elif (theirs & line).bit_count() == 2:
+                theirs_delta -= OPEN_TWO_UNIT
+        if completed == 2:
+            mine_delta += DOUBLE_MILL_UNIT
+
+        self.features += (mine_delta << COLOR_SHIFTS[color]) + (theirs_delta << COLOR_SHIFTS[other])
+
+    def _stone_removed(self, color: int, index: int):
+        # update milled and the features for a stone of color just taken off index
+        other = BLACK if color == WHITE else WHITE
+        mine = self.stones[color]
+        theirs = self.stones[other]
+        neighbors = NEIGHBOR_MASKS[index]
+
+        mine_delta = ((neighbors & mine).bit_count() - (neighbors & ~(mine | theirs)).bit_count()) * MOBILITY_UNIT
+        theirs_delta = (neighbors & theirs).bit_count() * MOBILITY_UNIT
+
+        bit = 1 << index
+        broken = 0
+        for line, crossing in CROSSING_LINES[index]:
+            if mine & line | bit == line:
+                mine_delta += OPEN_TWO_UNIT - MILL_UNIT
+                # its other stones stay milled, though no longer double mills, where their other line is complete
+                milled = self.milled[color] & ~line
+                for cross in crossing:
+                    if mine & cross == cross:
+                        milled |= cross
+                        mine_delta -= DOUBLE_MILL_UNIT
+                self.milled[color] = milled
+                broken += 1
+            elif not theirs & line:
+                if (mine & line).bit_count() == 1:
+                    mine_delta -= OPEN_TWO_UNIT
+            elif (theirs & line).bit_count() == 2:
+                theirs_delta += OPEN_TWO_UNIT
+        if broken == 2:
+            mine_delta -= DOUBLE_MILL_UNIT
+
+        self.features += (mine_delta << COLOR_SHIFTS[color]) + (theirs_delta << COLOR_SHIFTS[other])
+
+    def place_piece(self, index: int) -> bool:
+        if self.state != PLACE_PIECE:
+            return False
+
+        bit = 1 << index
+        if (self.stones[WHITE] | self.stones[BLACK]) & bit:
+            return False
+
+        side = self.side
+        if self.pieces_in_deck[side] == 0:
+            return False
+
+        self.pieces_in_deck[side] -= 1
+        self.pieces_on_board[side] += 1
+        self.stones[side] |= bit
+        self.stone_hash ^= ZOBRIST_STONES[side][index]
+        self._stone_added(side, index)
+
+        if self.milled[side] & bit:
+            self._mill_formed()
+        else:
+            self.change_player()
+        return True
+
+    def move_piece(self, start: int, end: int) -> bool:
+        if self.state != MOVE_PIECE:
+            return False
+
+        side = self.side
+        if self.pieces_in_deck[side] > 0:
+            return False
+
+        start_bit = 1 << start
+        end_bit = 1 << end
+        if not self.stones[side] & start_bit:
+            return False
+        if (self.stones[WHITE] | self.stones[BLACK]) & end_bit:
+            return False
+
+        # with three pieces left a player may fly to any empty point
+        if not NEIGHBOR_MASKS[start] & end_bit and self.pieces_on_board[side] > 3:
+            return False
+
+        self.stones[side] ^= start_bit
+        self._stone_removed(side, start)
+        self.stones[side] ^= end_bit
+        self._stone_added(side, end)
+        self.stone_hash ^= ZOBRIST_STONES[side][start] ^ ZOBRIST_STONES[side][end]
+
+        if self.milled[side] & end_bit:
+            self._mill_formed()
+        else:
+            self.change_player()
+        return True
+
+    def remove_piece(self, index: int) -> bool:
+        if self.state != REMOVE_PIECE:
+            return False
+
+        other = opponent(self.side)
+        bit = 1 << index
+        if not self.stones[other] & bit:
+            return False
+
+        # pieces in a mill are protected unless every opponent piece is in one
+        if self.milled[other] & bit and self.pieces_not_in_mill(other):
+            return False
+
+        self.stones[other] &= ~bit
+        self.stone_hash ^= ZOBRIST_STONES[other][index]
+        self._stone_removed(other, index)
+        self.pieces_on_board[other] -= 1
+        self.change_player()
+        return True
+
+    def _mill_formed(self):
+        # there is nothing to take while the opponent's pieces are all in the deck
+        if self.stones[opponent(self.side)]:
+            self.state = REMOVE_PIECE
+        else:
+            self.change_player()
+
+    def change_player(self):
+        previous = self.side
+        self.side = opponent(previous)
+        side = self.side
+
+        if self.pieces_in_deck[side] + self.pieces_on_board[side] < 3:
+            self.winner = previous
+            self.state = GAME_OVER
+            return
+
+        if self.pieces_in_deck[side] > 0:
+            self.state = PLACE_PIECE
+        else:
+            self.state = MOVE_PIECE
+
+            # a player who cannot move any piece loses
+            if not self.has_legal_move():
+                self.winner = previous
+                self.state = GAME_OVER
+
+    def make_move(self, action) -> bool:
+        stones = self.stones
+        milled = self.milled
+        deck = self.pieces_in_deck
+        on_board = self.pieces_on_board
+        self.undo_stack.append((stones[WHITE], stones[BLACK], milled[WHITE], milled[BLACK],
+                                deck[WHITE], deck[BLACK], on_board[WHITE], on_board[BLACK],
+                                self.side, self.state, self.winner, self.stone_hash, self.features))
+
+        move_type, start, end = action
+        if move_type == PLACE:
+            applied = self.place_piece(start)
+        elif move_type == MOVE:
+            applied = self.move_piece(start, end)
+        elif move_type == REMOVE:
+            applied = self.remove_piece(start)
+        else:
+            applied = False
+
+        if not applied:
+            self.undo_stack.pop()
+        return applied
+
+    def unmake_move(self):
+        (white, black, milled_white, milled_black, deck_white, deck_black,
+         on_board_white, on_board_black, self.side, self.state, self.winner,
+         self.stone_hash, self.features) = self.undo_stack.pop()
+
+        stones = self.stones
+        stones[WHITE] = white
+        stones[BLACK] = black
+        milled = self.milled
+        milled[WHITE] = milled_white
+        milled[BLACK] = milled_black
+        deck = self.pieces_in_deck
+        deck[WHITE] = deck_white
+        deck[BLACK] = deck_black
+        on_board = self.pieces_on_board
+        on_board[WHITE] = on_board_white
+        on_board[BLACK] = on_board_black
+
+    def legal_moves(self) -> list:
+        state = self.state
+        side = self.side
+
+        if state == PLACE_PIECE:
+            return [(PLACE, index, None) for index in iter_bits(self.empty_spaces())]
+
+        if state == REMOVE_PIECE:
+            other = opponent(side)
+            targets = self.pieces_not_in_mill(other) or self.stones[other]
+            return [(REMOVE, index, None) for index in iter_bits(targets)]
+
+        if state == MOVE_PIECE:
+            empty = self.empty_spaces()
+            flying = self.pieces_on_board[side] <= 3
+
+            moves = []
+            for start in iter_bits(self.stones[side]):
+                targets = empty if flying else NEIGHBOR_MASKS[start] & empty
+                for end in iter_bits(targets):
+                    moves.append((MOVE, start, end))
+            return moves
+
+        return []
+
+    def has_legal_move(self) -> bool:
+        state = self.state
+
+        if state == PLACE_PIECE:
+            return self.pieces_in_deck[self.side] > 0 and self.empty_spaces() != 0
+
+        if state == REMOVE_PIECE:
+            return self.stones[opponent(self.side)] != 0
+
+        if state == MOVE_PIECE:
+            empty = self.empty_spaces()
+            if self.pieces_on_board[self.side] <= 3:
+                return empty != 0
+
+            for start in iter_bits(self.stones[self.side]):
+                if NEIGHBOR_MASKS[start] & empty:
+                    return True
+
+        return False
+
+    def surrender(self, color: int = None):
+        # the side to move gives up unless another color is named
+        self.winner = opponent(color if color is not None else self.side)
+        self.state = GAME_OVER
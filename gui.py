@@ -1,26 +1,49 @@
-from hashlib import blake2b
-from http.cookiejar import DefaultCookiePolicy
-from string import whitespace
 from PyQt6.QtWidgets import QApplication, QWidget, QMainWindow, QGraphicsScene, QGraphicsView, QSizePolicy, QVBoxLayout, QHBoxLayout, QMenuBar
-from PyQt6.QtWidgets import QLabel, QMessageBox, QGraphicsBlurEffect, QGraphicsColorizeEffect, QDialog, QPushButton, QToolButton
+from PyQt6.QtWidgets import QLabel, QMessageBox, QGraphicsBlurEffect, QGraphicsColorizeEffect, QDialog, QPushButton, QToolButton, QComboBox
 from PyQt6.QtGui import QBrush, QColor, QPen, QPainter, QPaintEvent, QMouseEvent, QFont, QPalette, QResizeEvent, QIcon, QAction
 from PyQt6.QtSvgWidgets import QGraphicsSvgItem
 from PyQt6.QtSvg import QSvgRenderer
-from PyQt6.QtCore import QRect, Qt, pyqtSignal, QObject, QThread, QSize
-from threading import Thread
-import time
-
+from PyQt6.QtCore import QRect, Qt, pyqtSignal, QObject, QThread, QSize, QRunnable, QThreadPool, QTimer
 from collections import deque
+import functools
 
 import MadMansMorris
+import bitboard
+import instrument
+import os
+import search
+import sys
+import threading
+import time
 
-black_piece_render = QSvgRenderer("images/black_piece.svg")
-black_piece_mill_render = QSvgRenderer("images/black_piece_mill.svg")
-
-white_piece_render = QSvgRenderer("images/white_piece.svg")
-white_piece_mill_render = QSvgRenderer("images/white_piece_mill.svg")
-
-empty_space_render = QSvgRenderer("images/empty_space.svg")
+# seconds between dumps of the game's counters when instrumentation is on
+STATS_INTERVAL = 10.0
+
+# seconds a searching computer player gets for each move
+SEARCH_TIME_LIMIT = 2.0
+
+# the computer players offered by the main menu, the first is the default
+COMPUTER_PLAYERS = {
+    "Alpha-beta search": functools.partial(search.AlphaBetaPlayer, time_limit=SEARCH_TIME_LIMIT),
+    # keeps searching while a human is to move, see GameWidget.start_pondering
+    "Alpha-beta search, thinking on your time": functools.partial(search.AlphaBetaPlayer, time_limit=SEARCH_TIME_LIMIT,
+                                                                   ponder=True),
+    "Random moves": MadMansMorris.ComputerPlayer,
+}
+
+IMAGE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# one renderer per image is shared by every space; renderers need a QApplication,
+# so they are loaded on first use rather than when the module is imported
+@functools.lru_cache(maxsize=None)
+def piece_renderer(state: int, in_mill: bool) -> QSvgRenderer:
+    if state == MadMansMorris.BoardSpace.BLACK_SPACE:
+        name = "black_piece_mill" if in_mill else "black_piece"
+    elif state == MadMansMorris.BoardSpace.WHITE_SPACE:
+        name = "white_piece_mill" if in_mill else "white_piece"
+    else:
+        name = "empty_space"
+    return QSvgRenderer(os.path.join(IMAGE_DIRECTORY, name + ".svg"))
 
 class QBoardSpace(QGraphicsSvgItem):
     def __init__(self, board_space: MadMansMorris.BoardSpace, game: MadMansMorris.Game,board_renderer: 'GameWidget'):
@@ -30,28 +53,26 @@ class QBoardSpace(QGraphicsSvgItem):
 
         self.board_space : MadMansMorris = board_space
         self.game : MadMansMorris = game
-        self.update()
-
-    def update(self):
-        if self.board_space.state == MadMansMorris.BoardSpace.BLACK_SPACE:
-            if self.game.check_for_mill(self.board_space.space_name):
-                self.setSharedRenderer(black_piece_mill_render)
-            else:
-                self.setSharedRenderer(black_piece_render)
-        elif self.board_space.state == MadMansMorris.BoardSpace.WHITE_SPACE:
-            if self.game.check_for_mill(self.board_space.space_name):
-                self.setSharedRenderer(white_piece_mill_render)
-            else:
-                self.setSharedRenderer(white_piece_render)
-        else:
-            self.setSharedRenderer(empty_space_render)
-        
+        self.renderer : QSvgRenderer = None
+
+        self.refresh(self.game.check_for_mill(self.board_space.space_name))
+
+        # the position and size never change, so they are set once here
         self.x, self.y = self.__position_from_space_name(self.board_space.space_name)
 
         self.setPos(self.x * 100.0 -354.0 / 2.0, self.y * 100.0 - 354.0 / 2.0)
 
         self.setTransformOriginPoint(self.boundingRect().center())
         self.setScale(0.15)
+
+    def refresh(self, in_mill: bool):
+        state = self.board_space.state
+        renderer = piece_renderer(state, in_mill and state != MadMansMorris.BoardSpace.EMPTY_SPACE)
+
+        # setSharedRenderer schedules a repaint of just this item
+        if renderer is not self.renderer:
+            self.renderer = renderer
+            self.setSharedRenderer(renderer)
     
     def mousePressEvent(self, event: 'QGraphicsSceneMouseEvent') -> None:
         self.board_renderer.space_clicked(self.board_space.space_name)
@@ -64,8 +85,8 @@ class QBoardSpace(QGraphicsSvgItem):
     
 
 class HumanComputerToggleButton(QWidget):
-    human_icon = QIcon("images/human.svg")
-    computer_icon = QIcon("images/computer.svg")
+    human_icon = QIcon(os.path.join(IMAGE_DIRECTORY, "human.svg"))
+    computer_icon = QIcon(os.path.join(IMAGE_DIRECTORY, "computer.svg"))
 
     human_computer_signal = pyqtSignal()
 
@@ -86,10 +107,20 @@ class HumanComputerToggleButton(QWidget):
 
         self.label = QLabel(f"{self.player}")
 
+        # which computer plays, only offered once the toggle is set to computer
+        self.computer_choice = QComboBox()
+        self.computer_choice.addItems(COMPUTER_PLAYERS)
+        self.computer_choice.setEnabled(False)
+
         self.button.clicked.connect(self.toggle)
 
         self.layout().addWidget(self.label)
         self.layout().addWidget(self.button)
+        self.layout().addWidget(self.computer_choice)
+
+    @property
+    def computer(self):
+        return COMPUTER_PLAYERS[self.computer_choice.currentText()]
 
     def toggle(self):
         self.human = not self.human
@@ -98,6 +129,7 @@ class HumanComputerToggleButton(QWidget):
             self.button.setIcon(self.human_icon)
         else:
             self.button.setIcon(self.computer_icon)
+        self.computer_choice.setEnabled(not self.human)
         
         self.human_computer_signal.emit()
         
@@ -174,22 +206,39 @@ class MainApplication(QMainWindow):
         self.show_main_menu()
     
     def show_main_menu(self):
+        self.end_game()
+
         self.main_menu_widget = MainMenuWidget()
         self.main_menu_widget.start_game_button.clicked.connect(self.start_game)
         
         self.setCentralWidget(self.main_menu_widget)
     
     def start_game(self):
-        self.game = MadMansMorris.Game(self.main_menu_widget.white_player_human, self.main_menu_widget.black_player_human)
+        menu = self.main_menu_widget
+        self.game = MadMansMorris.Game(menu.white_player_human, menu.black_player_human,
+                                       white_computer=menu.white_player_human_button.computer,
+                                       black_computer=menu.black_player_human_button.computer, autostart=False)
         self.game_widget = GameWidget(self.game)
         
-        self.game_widget.board_monitor.game_over_signal.connect(self.game_over)
+        self.game_widget.game_over_signal.connect(self.game_over)
         self.setCentralWidget(self.game_widget)
 
-    def game_over(self):
-        current = self.game.current_player
+    def end_game(self):
+        if getattr(self, "game_widget", None) is not None:
+            self.game_widget.shutdown()
+            self.game_widget = None
 
-        winner = "Black" if current == self.game.white_player else "White"
+    def surrender(self):
+        if getattr(self, "game_widget", None) is not None:
+            self.game_widget.surrender()
+
+    def closeEvent(self, a0) -> None:
+        self.end_game()
+        return super().closeEvent(a0)
+
+    def game_over(self):
+        self.game_widget = None
+        winner = "White" if self.game.winner == self.game.white_player else "Black"
 
         self.game_over_widget = GameOverWidget(winner)
         self.game_over_widget.play_again_button.clicked.connect(self.show_main_menu)
@@ -205,41 +254,54 @@ class MainApplication(QMainWindow):
         self.exit_action.triggered.connect(self.close)
 
         self.new_game_action = QAction("New Game", self)
+        self.new_game_action.triggered.connect(self.show_main_menu)
 
-        self.game_menu.triggered.connect(self.show_main_menu)
+        self.surrender_action = QAction("Surrender", self)
+        self.surrender_action.triggered.connect(self.surrender)
 
         self.game_menu.addAction(self.new_game_action)
+        self.game_menu.addAction(self.surrender_action)
         self.game_menu.addAction(self.exit_action)
 
 
         self.setMenuBar(self.menu_bar)
 
 
-class BoardUpdater(QThread):
-    update_board_signal = pyqtSignal()
-    game_over_signal = pyqtSignal()
+class ComputerTurnSignals(QObject):
+    # (chosen action, turn number)
+    move_chosen = pyqtSignal(object, int)
 
-    def __init__(self, game: MadMansMorris.Game):
+
+class ComputerTurn(QRunnable):
+    # runs a computer player's choose_move off the GUI thread; the GUI thread
+    # plays the result if the turn has not been cancelled in the meantime.
+    # The cancel event is made here, on the GUI thread, so a cancel that comes
+    # before the pool starts the search still reaches it
+    def __init__(self, player: MadMansMorris.ComputerPlayer, turn: int):
         super().__init__()
-        self.game = game
-    
+        self.player = player
+        self.turn = turn
+        self.cancelled = threading.Event()
+        self.signals = ComputerTurnSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.player.stop()
+
     def run(self):
-        number_moves = 0
-        while self.game.game_state != MadMansMorris.Game.GAME_OVER:
-            if number_moves != len(self.game.move_history):
-                if type(self.game.move_history[-1].player) == MadMansMorris.ComputerPlayer:
-                    time.sleep(0.4)
-                self.update_board_signal.emit()
-                number_moves = len(self.game.move_history)
-            time.sleep(0.1)
-        
-        if self.game.game_state == MadMansMorris.Game.GAME_OVER:
-            if self.game.turn_thead != None:
-                # wait for thread to finish
-                self.game.turn_thead.join()
-            self.game_over_signal.emit()
+        if self.cancelled.is_set():
+            return
+        move = self.player.choose_move(self.cancelled)
+        if not self.cancelled.is_set():
+            self.signals.move_chosen.emit(move, self.turn)
+
 
 class GameWidget(QWidget):
+    # game events are re-emitted as a queued signal, so they are handled on the
+    # GUI thread once the move that caused them has finished
+    game_event_signal = pyqtSignal(str, object)
+    game_over_signal = pyqtSignal()
+
     def __init__(self, game: MadMansMorris.Game):
         super().__init__()
 
@@ -259,6 +321,30 @@ class GameWidget(QWidget):
 
         self.layout().addWidget(self.last_move_text)
 
+        self.thinking_text = QLabel("")
+        self.thinking_text.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.layout().addWidget(self.thinking_text)
+
+        # the computer turn in progress, if any; turn numbers tell a stale result from a live one
+        self.computer_turn : ComputerTurn = None
+        self.turn_number = 0
+        self.thinking_started = 0.0
+
+        # refreshes the thinking indicator, and only runs while a computer is thinking
+        self.thinking_timer = QTimer(self)
+        self.thinking_timer.setInterval(250)
+        self.thinking_timer.timeout.connect(self.show_thinking)
+
+        # with MORRIS_STATS set the game's counters are printed every STATS_INTERVAL seconds
+        self.stats_dumper = None
+        if instrument.enabled():
+            self.stats_dumper = instrument.Dumper(STATS_INTERVAL, sys.stdout)
+            self.stats_timer = QTimer(self)
+            self.stats_timer.setInterval(int(STATS_INTERVAL * 1000))
+            self.stats_timer.timeout.connect(self.dump_stats)
+            self.stats_timer.start()
+
         self.view = QGraphicsView()
         self.layout().addWidget(self.view)
 
@@ -270,21 +356,17 @@ class GameWidget(QWidget):
         self.view.setScene(self.scene)
         self.view.setRenderHint(QPainter.RenderHint.Antialiasing)
 
+        # indexed like the bitboard points, so a move's delta masks pick out the items to refresh
         self.space_graphics = []
 
         self.draw_board()
 
-        self.update_board()
-
-        self.board_monitor = BoardUpdater(self.game)
-        self.board_monitor.update_board_signal.connect(self.update_board)
-
-        self.thread = QThread()
-        # Step 4: Move worker to the thread
-        self.board_monitor.moveToThread(self.thread)
-        self.thread.started.connect(self.board_monitor.run)
+        self.game_event_signal.connect(self.game_event, Qt.ConnectionType.QueuedConnection)
+        self.game.subscribe(self.game_event_signal.emit)
 
-        self.thread.start()
+        self.update_board()
+        self.start_computer_turn()
+        self.start_pondering()
 
     def draw_board(self):
         self.scene.addRect(0, 0, 600, 600, QPen(QColor(0, 0, 0)))
@@ -322,27 +404,125 @@ class GameWidget(QWidget):
     def mousePressEvent(self, a0: QMouseEvent) -> None:
         return super().mousePressEvent(a0)
     
-    def update_board(self):
-        self.player_turn_text.setText("Player Turn: " + ("Black" if self.game.current_player == self.game.black_player else "White"))
-        for space_graphic in self.space_graphics:
-            space_graphic.update()
-        
-        if len(self.game.move_history) > 0:
-            self.last_move_text.setText("Last Move: " + str(self.game.move_history[-1]))
-
-        self.scene.update()
+    def update_board(self, record: MadMansMorris.MoveRecord = None):
+        # with a move record only the spaces in its delta are refreshed, otherwise all of them
+        if record is not None and record.delta is not None:
+            milled = record.delta.milled
+            changed = record.delta.changed
+            self.last_move_text.setText("Last Move: " + str(record))
+        else:
+            milled = self.game.board_masks()[2]
+            changed = bitboard.FULL_BOARD
+            self.show_player_turn(self.game.current_player)
 
-        if type(self.game.current_player) == MadMansMorris.ComputerPlayer:
-            self.game.current_player.take_turn()
+        for index in bitboard.iter_bits(changed):
+            self.space_graphics[index].refresh(bool(milled & (1 << index)))
         
         # self.scene.setSceneRect(self.scene.itemsBoundingRect())
         # self.view.fitInView(self.scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+    def show_player_turn(self, player: MadMansMorris.Player):
+        self.player_turn_text.setText("Player Turn: " + ("Black" if player == self.game.black_player else "White"))
         
+    def game_event(self, event: str, value):
+        if event == MadMansMorris.Game.GAME_OVER_EVENT:
+            self.shutdown()
+            self.game_over_signal.emit()
+        elif event == MadMansMorris.Game.PLAYER_CHANGE_EVENT:
+            self.show_player_turn(value)
+            self.start_computer_turn()
+            self.start_pondering()
+        else:
+            self.update_board(value)
+
+    def computer_players(self) -> list:
+        return [player for player in (self.game.white_player, self.game.black_player)
+                if isinstance(player, MadMansMorris.ComputerPlayer)]
+
+    def start_pondering(self):
+        # computers think on a human's time only, two computers would just slow each other down
+        if self.game.game_state == MadMansMorris.Game.GAME_OVER:
+            return
+        if isinstance(self.game.current_player, MadMansMorris.ComputerPlayer):
+            return
+        for player in self.computer_players():
+            player.start_pondering()
+
+    def start_computer_turn(self):
+        if self.computer_turn is not None or self.game.game_state == MadMansMorris.Game.GAME_OVER:
+            return
+        if not isinstance(self.game.current_player, MadMansMorris.ComputerPlayer):
+            return
+
+        self.turn_number += 1
+        self.computer_turn = ComputerTurn(self.game.current_player, self.turn_number)
+        self.computer_turn.signals.move_chosen.connect(self.computer_move_chosen)
+
+        self.thinking_started = time.perf_counter()
+        self.show_thinking()
+        self.thinking_timer.start()
+
+        QThreadPool.globalInstance().start(self.computer_turn)
+
+    def computer_move_chosen(self, move, turn: int):
+        if self.computer_turn is None or turn != self.computer_turn.turn:
+            return
+
+        self.finish_computer_turn()
+        if move is not None:
+            self.game.play_move(move)
+
+        # a mill is followed by a removal by the same player
+        self.start_computer_turn()
+
+    def finish_computer_turn(self):
+        self.computer_turn = None
+        self.thinking_timer.stop()
+        self.thinking_text.setText("")
+
+    def cancel_computer_turn(self):
+        if self.computer_turn is not None:
+            self.computer_turn.cancel()
+            self.finish_computer_turn()
+
+    def show_thinking(self):
+        text = "Thinking..."
+        nodes = getattr(self.computer_turn.player, "nodes", None) if self.computer_turn is not None else None
+        elapsed = time.perf_counter() - self.thinking_started
+        if nodes and elapsed > 0:
+            text += f" {nodes / elapsed:,.0f} nodes/s"
+        self.thinking_text.setText(text)
+
+    def surrender(self):
+        if self.game.game_state == MadMansMorris.Game.GAME_OVER:
+            return
+
+        # a human gives up even while the computer is thinking
+        player = self.game.current_player
+        if isinstance(player, MadMansMorris.ComputerPlayer) and not isinstance(self.game.next_player, MadMansMorris.ComputerPlayer):
+            player = self.game.next_player
+
+        self.cancel_computer_turn()
+        self.game.surrender(player)
+
+    def dump_stats(self):
+        self.stats_dumper.dump(self.game.stats())
+
+    def shutdown(self):
+        # stop listening to the game and abandon any search, for a new game or on close
+        self.game.unsubscribe(self.game_event_signal.emit)
+        self.cancel_computer_turn()
+        for player in self.computer_players():
+            player.stop_pondering()
+        if self.stats_dumper is not None and self.stats_timer.isActive():
+            self.stats_timer.stop()
+            self.dump_stats()
+
     def space_clicked(self, space_name: str):
         if self.game.game_state == MadMansMorris.Game.GAME_OVER:
             return
         
-        if type(self.game.current_player) == MadMansMorris.ComputerPlayer:
+        if isinstance(self.game.current_player, MadMansMorris.ComputerPlayer):
             return
 
         if self.game.game_state == MadMansMorris.Game.PLACE_PIECE:
@@ -363,9 +543,16 @@ class GameWidget(QWidget):
                     self.game.move_piece(self.spaces_selected_stack[0], space_name)
                     self.spaces_selected_stack.clear()
 
-app = QApplication([])
+def main() -> int:
+    if os.environ.get("MORRIS_STATS"):
+        instrument.enable()
+
+    app = QApplication(sys.argv)
+
+    window = MainApplication()
+    window.show()
 
-window = MainApplication()
-window.show()
+    return app.exec()
 
-app.exec()
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
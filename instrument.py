@@ -0,0 +1,195 @@
+"""Opt-in instrumentation of the game's hot paths.
+
+``enable()`` wraps Game.place_piece, move_piece and remove_piece, and every
+player class's take_turn and choose_move, with wrappers that count the calls
+and time them per Game; ``disable()`` puts the original methods back, so
+while it is off nothing is wrapped at all. The engine finds mills and
+changes players inside those moves, so its mill update and change_player
+are wrapped too and counted, as check_for_mill and change_player, against
+the Game whose move is running on the same thread; searches on engine
+copies are not counted.
+``Game.stats()`` returns a snapshot of a game's counters::
+
+    instrument.enable()
+    game = Game(False, False)
+    print(instrument.format_stats(game.stats()))
+
+``Dumper`` writes merged counters at most every few seconds for long runs,
+such as the simulator's ``--stats`` and the GUI. For a whole-program view,
+``simulate.py --profile games.prof`` plays under cProfile and writes the
+profile in the pstats format read by snakeviz, flameprof and gprof2dot.
+"""
+
+import functools
+import sys
+import threading
+import time
+
+from bitboard import Bitboard
+from MadMansMorris import Game, Player
+
+GAME_METHODS = ("place_piece", "move_piece", "remove_piece")
+# Bitboard method -> the name it is counted under
+ENGINE_METHODS = {"_stone_added": "check_for_mill", "change_player": "change_player"}
+PLAYER_METHODS = ("take_turn", "choose_move")
+
+_originals = {}
+# .counters is the Counters of the Game whose move is running on this thread, if any
+_active = threading.local()
+
+
+class Counters:
+    """Calls and total seconds per instrumented method, for one Game."""
+
+    __slots__ = ("calls", "seconds")
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+
+    def record(self, name: str, seconds: float):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def snapshot(self) -> dict:
+        return {name: {"calls": calls, "seconds": self.seconds[name]} for name, calls in self.calls.items()}
+
+
+def merge(total: dict, stats: dict) -> dict:
+    """Add the snapshot stats into total, in place, and return total."""
+    for name, value in stats.items():
+        entry = total.setdefault(name, {"calls": 0, "seconds": 0.0})
+        entry["calls"] += value["calls"]
+        entry["seconds"] += value["seconds"]
+    return total
+
+
+def format_stats(stats: dict) -> str:
+    lines = [f"{'method':16} {'calls':>10} {'seconds':>10} {'us/call':>10}"]
+    for name, value in sorted(stats.items(), key=lambda item: -item[1]["seconds"]):
+        per_call = 1e6 * value["seconds"] / value["calls"] if value["calls"] else 0.0
+        lines.append(f"{name:16} {value['calls']:10} {value['seconds']:10.4f} {per_call:10.2f}")
+    return "\n".join(lines)
+
+
+def _counters(game: Game) -> Counters:
+    counters = game.counters
+    if counters is None:
+        counters = game.counters = Counters()
+    return counters
+
+
+def _timed(method, name: str, game_of):
+    clock = time.perf_counter
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = clock()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _counters(game_of(self)).record(name, clock() - start)
+
+    return wrapper
+
+
+def _timed_move(method, name: str):
+    # a Game move, which also makes the game the target of the engine's counts
+    clock = time.perf_counter
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        counters = _counters(self)
+        outer = getattr(_active, "counters", None)
+        _active.counters = counters
+        start = clock()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            counters.record(name, clock() - start)
+            _active.counters = outer
+
+    return wrapper
+
+
+def _timed_engine(method, name: str):
+    clock = time.perf_counter
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        counters = getattr(_active, "counters", None)
+        if counters is None:
+            return method(self, *args, **kwargs)
+        start = clock()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            counters.record(name, clock() - start)
+
+    return wrapper
+
+
+def _player_classes(cls=Player):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _player_classes(subclass)
+
+
+def enabled() -> bool:
+    return bool(_originals)
+
+
+def enable():
+    """Start counting on every Game; player classes defined later are not covered until the next enable."""
+    if enabled():
+        return
+    for name in GAME_METHODS:
+        method = Game.__dict__[name]
+        _originals[(Game, name)] = method
+        setattr(Game, name, _timed_move(method, name))
+    for name, counted in ENGINE_METHODS.items():
+        method = Bitboard.__dict__[name]
+        _originals[(Bitboard, name)] = method
+        setattr(Bitboard, name, _timed_engine(method, counted))
+    for cls in set(_player_classes()):
+        for name in PLAYER_METHODS:
+            if name in cls.__dict__:
+                method = cls.__dict__[name]
+                _originals[(cls, name)] = method
+                setattr(cls, name, _timed(method, name, lambda player: player.game))
+
+
+def disable():
+    for (cls, name), method in _originals.items():
+        setattr(cls, name, method)
+    _originals.clear()
+
+
+class Dumper:
+    """Writes stats to a stream, at most once every interval seconds.
+
+    ``add`` merges in the stats of a finished game and ``maybe_dump`` writes
+    the running totals, or the stats passed to it, when the interval has
+    passed since the last dump.
+    """
+
+    def __init__(self, interval: float = 10.0, stream=None):
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stderr
+        self.totals = {}
+        self.last_dump = time.monotonic()
+
+    def add(self, stats: dict):
+        merge(self.totals, stats)
+        self.maybe_dump()
+
+    def maybe_dump(self, stats: dict = None) -> bool:
+        if time.monotonic() - self.last_dump < self.interval:
+            return False
+        self.dump(stats)
+        return True
+
+    def dump(self, stats: dict = None):
+        self.last_dump = time.monotonic()
+        self.stream.write(format_stats(stats if stats is not None else self.totals) + "\n\n")
+        self.stream.flush()
@@ -0,0 +1,243 @@
+"""Lockstep engine that plays many games at once with NumPy.
+
+LockstepGames holds K games as arrays and applies one action to every game
+per step, so random playouts and data generation cost a handful of array
+operations per ply instead of a Python loop per game. The rules are the
+same as bitboard.Bitboard's.
+
+An action is a single integer ``start * ACTION_STRIDE + end``: place and
+remove actions use ``end == NO_END``, and which kind an action is follows
+from the game's state, exactly as with Bitboard. ``legal_mask`` returns a
+(K, ACTION_COUNT) boolean array of the actions each game may play.
+"""
+
+import numpy as np
+
+import bitboard
+from bitboard import (EMPTY, WHITE, BLACK, GAME_OVER, PLACE_PIECE, MOVE_PIECE, REMOVE_PIECE, PLACE, MOVE,
+                      REMOVE, NUM_SPACES, PIECES_PER_PLAYER, MILLS, ADJACENCY, POINT_MILLS, iter_bits)
+
+NO_END = NUM_SPACES
+ACTION_STRIDE = NUM_SPACES + 1
+ACTION_COUNT = NUM_SPACES * ACTION_STRIDE
+
+# (16, 3) point indexes of every mill line and its (16, 24) point membership
+MILL_POINTS = np.array(MILLS, dtype=np.intp)
+MILL_MEMBERS = np.zeros((len(MILLS), NUM_SPACES), dtype=np.int8)
+MILL_MEMBERS[np.arange(len(MILLS))[:, None], MILL_POINTS] = 1
+
+# (24, 24) adjacency matrix
+ADJACENT = np.zeros((NUM_SPACES, NUM_SPACES), dtype=bool)
+for _index, _neighbors in enumerate(ADJACENCY):
+    ADJACENT[_index, list(_neighbors)] = True
+
+# (24, 2, 2): the two other points of both mill lines through each point
+MILL_PARTNERS = np.array([[[point for point in iter_bits(mask) if point != index] for mask in POINT_MILLS[index]]
+                          for index in range(NUM_SPACES)], dtype=np.intp)
+
+
+def encode_action(action) -> int:
+    _, start, end = action
+    return start * ACTION_STRIDE + (NO_END if end is None else end)
+
+
+class LockstepGames:
+    """K games stored as arrays.
+
+    ``board`` is (K, 24) with EMPTY, WHITE or BLACK per point. ``deck`` and
+    ``on_board`` are (K, 3) and indexed by colour like Bitboard's lists.
+    ``state``, ``side``, ``winner`` (EMPTY while the game runs) and
+    ``plies`` are (K,).
+    """
+
+    def __init__(self, count: int, side=WHITE):
+        self.count = count
+        self.board = np.zeros((count, NUM_SPACES), dtype=np.int8)
+        self.deck = np.zeros((count, 3), dtype=np.int8)
+        self.deck[:, WHITE] = PIECES_PER_PLAYER
+        self.deck[:, BLACK] = PIECES_PER_PLAYER
+        self.on_board = np.zeros((count, 3), dtype=np.int8)
+        self.state = np.full(count, PLACE_PIECE, dtype=np.int8)
+        self.side = np.empty(count, dtype=np.int8)
+        self.side[:] = side
+        self.winner = np.zeros(count, dtype=np.int8)
+        self.plies = np.zeros(count, dtype=np.int32)
+
+    @classmethod
+    def from_engines(cls, engines) -> 'LockstepGames':
+        games = cls(len(engines))
+        for row, engine in enumerate(engines):
+            for color in (WHITE, BLACK):
+                for point in iter_bits(engine.stones[color]):
+                    games.board[row, point] = color
+                games.deck[row, color] = engine.pieces_in_deck[color]
+                games.on_board[row, color] = engine.pieces_on_board[color]
+            games.state[row] = engine.state
+            games.side[row] = engine.side
+            games.winner[row] = engine.winner or EMPTY
+        return games
+
+    def engine(self, row: int) -> bitboard.Bitboard:
+        """Game row as a Bitboard."""
+        engine = bitboard.Bitboard(int(self.side[row]))
+        for point in range(NUM_SPACES):
+            if self.board[row, point]:
+                engine.set(point, int(self.board[row, point]))
+        engine.pieces_in_deck = [0, int(self.deck[row, WHITE]), int(self.deck[row, BLACK])]
+        engine.pieces_on_board = [0, int(self.on_board[row, WHITE]), int(self.on_board[row, BLACK])]
+        engine.state = int(self.state[row])
+        engine.winner = int(self.winner[row])
+        return engine
+
+    @property
+    def active(self) -> np.ndarray:
+        return self.state != GAME_OVER
+
+    def milled(self, color, rows=slice(None)) -> np.ndarray:
+        """Bool per point of the given rows: holds a stone of color (one per row, or for all) in a mill."""
+        board = self.board[rows]
+        owned = board == np.asarray(color, dtype=np.int8).reshape(-1, 1)
+        complete = owned[:, MILL_POINTS].all(axis=2)
+        return (complete.astype(np.int8) @ MILL_MEMBERS > 0) & owned
+
+    def legal_mask(self, rows=slice(None)) -> np.ndarray:
+        """(rows, ACTION_COUNT) bool of the legal actions of the given games, all of them by default."""
+        board = self.board[rows]
+        state = self.state[rows]
+        side = self.side[rows]
+        mask = np.zeros((len(board), NUM_SPACES, ACTION_STRIDE), dtype=bool)
+        empty = board == EMPTY
+
+        placing = state == PLACE_PIECE
+        mask[placing, :, NO_END] = empty[placing]
+
+        removing = state == REMOVE_PIECE
+        if removing.any():
+            other = 3 - side[removing]
+            theirs = board[removing] == other[:, None]
+            complete = theirs[:, MILL_POINTS].all(axis=2)
+            free = theirs & ~(complete.astype(np.int8) @ MILL_MEMBERS > 0)
+            # protected stones may go once every opponent stone is in a mill
+            mask[removing, :, NO_END] = np.where(free.any(axis=1)[:, None], free, theirs)
+
+        moving = state == MOVE_PIECE
+        if moving.any():
+            own = board[moving] == side[moving, None]
+            flying = self.on_board[rows][moving, side[moving]] <= 3
+            reach = ADJACENT[None, :, :] | flying[:, None, None]
+            mask[moving, :, :NUM_SPACES] = own[:, :, None] & empty[moving][:, None, :] & reach
+
+        return mask.reshape(len(board), ACTION_COUNT)
+
+    def random_actions(self, rng: np.random.Generator, rows=None) -> np.ndarray:
+        """A uniformly random legal action for every game, -1 for finished ones.
+
+        With ``rows`` only those games are drawn for and the result has one
+        action per row.
+        """
+        mask = self.legal_mask(rows if rows is not None else slice(None))
+        # legal actions get keys in [1, 2) and always beat the illegal ones
+        keys = rng.random(mask.shape, dtype=np.float32)
+        keys += mask
+        actions = keys.argmax(axis=1)
+        actions[~mask.any(axis=1)] = -1
+        return actions
+
+    def step(self, actions, check: bool = True):
+        """Apply one action per game; -1 skips a game.
+
+        Illegal actions raise ValueError; ``check=False`` skips that test for
+        actions known to be legal, such as those from random_actions.
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        rows = np.flatnonzero(actions >= 0)
+        if rows.size == 0:
+            return
+        chosen = actions[rows]
+        if check and not self.legal_mask(rows)[np.arange(rows.size), chosen].all():
+            raise ValueError("illegal action in step")
+
+        start = chosen // ACTION_STRIDE
+        end = chosen % ACTION_STRIDE
+        state = self.state[rows]
+        side = self.side[rows]
+        other = 3 - side
+        self.plies[rows] += 1
+
+        placing = state == PLACE_PIECE
+        moving = state == MOVE_PIECE
+        removing = state == REMOVE_PIECE
+
+        place_rows = rows[placing]
+        self.board[place_rows, start[placing]] = side[placing]
+        self.deck[place_rows, side[placing]] -= 1
+        self.on_board[place_rows, side[placing]] += 1
+
+        move_rows = rows[moving]
+        self.board[move_rows, start[moving]] = EMPTY
+        self.board[move_rows, end[moving]] = side[moving]
+
+        remove_rows = rows[removing]
+        self.board[remove_rows, start[removing]] = EMPTY
+        self.on_board[remove_rows, other[removing]] -= 1
+
+        # a placed or moved stone that closes a line forms a mill
+        target = np.where(moving, end, start)
+        partners = self.board[rows[:, None, None], MILL_PARTNERS[target]]
+        formed = ~removing & (partners == side[:, None, None]).all(axis=2).any(axis=1)
+
+        # there is nothing to take while the opponent's pieces are all in the deck
+        take = formed & (self.on_board[rows, other] > 0)
+        self.state[rows[take]] = REMOVE_PIECE
+        self._change_player(rows[~take])
+
+    def _change_player(self, rows):
+        if rows.size == 0:
+            return
+        previous = self.side[rows]
+        side = 3 - previous
+        self.side[rows] = side
+
+        lost = self.deck[rows, side] + self.on_board[rows, side] < 3
+        placing = ~lost & (self.deck[rows, side] > 0)
+        moving = ~lost & ~placing
+
+        self.state[rows[placing]] = PLACE_PIECE
+        self.state[rows[moving]] = MOVE_PIECE
+
+        # a player who cannot move any piece loses
+        if moving.any():
+            move_rows = rows[moving]
+            empty = self.board[move_rows] == EMPTY
+            own = self.board[move_rows] == side[moving][:, None]
+            flying = self.on_board[move_rows, side[moving]] <= 3
+            can_step = (own & (empty.astype(np.int8) @ ADJACENT.astype(np.int8) > 0)).any(axis=1)
+            blocked = np.zeros(rows.size, dtype=bool)
+            blocked[moving] = ~(can_step | (flying & empty.any(axis=1)))
+            lost |= blocked
+
+        self.state[rows[lost]] = GAME_OVER
+        self.winner[rows[lost]] = previous[lost]
+
+    def play_random(self, rng: np.random.Generator = None, max_plies: int = 400) -> np.ndarray:
+        """Finish every game with random actions; return the winners, EMPTY for games still going at max_plies."""
+        rng = rng if rng is not None else np.random.default_rng()
+        actions = np.full(self.count, -1, dtype=np.intp)
+        while True:
+            running = np.flatnonzero(self.active & (self.plies < max_plies))
+            if running.size == 0:
+                break
+            actions[:] = -1
+            actions[running] = self.random_actions(rng, running)
+            self.step(actions, check=False)
+        return self.winner.copy()
+
+
+def decode_action(state: int, action: int):
+    """Integer action -> Bitboard action tuple for a game in state."""
+    start, end = divmod(int(action), ACTION_STRIDE)
+    if state == PLACE_PIECE:
+        return PLACE, start, None
+    if state == REMOVE_PIECE:
+        return REMOVE, start, None
+    return MOVE, start, end
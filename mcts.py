@@ -0,0 +1,274 @@
+"""Monte Carlo tree search (UCT) computer player for Mad Man's Morris.
+
+Each playout walks the tree from the root by the UCT rule, expands one new
+action, finishes the game with random moves and credits the result to
+every node on the path. Playouts are gathered in batches; the random
+finishes of a batch can run in worker processes. The tree is kept between
+moves and picked up again at the position the opponent left.
+
+Measure rollout throughput on this machine with::
+
+    python mcts.py --time-limit 10 --workers 8
+"""
+
+import argparse
+import math
+import random
+import sys
+import threading
+import time
+
+import bitboard
+from bitboard import GAME_OVER
+from MadMansMorris import ComputerPlayer
+
+# exploration constant of the UCT formula
+EXPLORATION = 1.4
+
+# random finishes longer than this many actions are scored as a draw
+ROLLOUT_PLIES = 200
+
+# how many actions after the kept root to look for the current position
+REUSE_DEPTH = 4
+
+
+def rollout(engine: bitboard.Bitboard, rng: random.Random, max_plies: int = ROLLOUT_PLIES):
+    """Play random actions on engine until the game ends; return the winner or None for a draw."""
+    for _ in range(max_plies):
+        if engine.state == GAME_OVER:
+            return engine.winner
+        engine.make_move(rng.choice(engine.legal_moves()))
+    return engine.winner if engine.state == GAME_OVER else None
+
+
+def _rollout_batch(batch) -> list:
+    # worker process entry point: [(GameState, seed)] -> [winner]
+    return [rollout(bitboard.Bitboard.from_state(state), random.Random(seed)) for state, seed in batch]
+
+
+class Node:
+    __slots__ = ("move", "parent", "mover", "key", "children", "untried", "visits", "wins")
+
+    def __init__(self, engine: bitboard.Bitboard, move=None, parent=None, mover=None):
+        self.move = move
+        self.parent = parent
+        # the side that played move, whose point of view wins are counted from
+        self.mover = mover
+        self.key = engine.zobrist
+        self.children = {}
+        self.untried = engine.legal_moves() if engine.state != GAME_OVER else []
+        self.visits = 0
+        self.wins = 0.0
+
+    def uct_child(self, exploration: float):
+        log_visits = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda child: child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+    def find(self, key: int, depth: int):
+        """The node for position key at most depth actions below this one, if it is in the tree."""
+        level = [self]
+        for _ in range(depth + 1):
+            for node in level:
+                if node.key == key:
+                    return node
+            level = [child for node in level for child in node.children.values()]
+        return None
+
+
+class MonteCarloSearch:
+    """UCT search over a Bitboard.
+
+    ``workers`` greater than one sends the random finishes of each batch of
+    ``batch_size`` playouts to a process pool; call ``close`` to shut it
+    down. After ``search`` returns, ``playouts`` and ``elapsed`` describe
+    that search and ``playouts_per_second`` its rollout throughput.
+    """
+
+    def __init__(self, workers: int = 1, batch_size: int = None, exploration: float = EXPLORATION,
+                 rng: random.Random = None):
+        self.workers = workers
+        self.batch_size = batch_size or (8 * workers if workers > 1 else 1)
+        self.exploration = exploration
+        self.rng = rng or random.Random()
+        self.executor = None
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+
+        self.root = None
+        self.reused = False
+        # the Event passed to the running search, set to stop it early
+        self.cancel = None
+        self.playouts = 0
+        self.elapsed = 0.0
+
+    @property
+    def playouts_per_second(self) -> float:
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _set_root(self, engine):
+        key = engine.zobrist
+        root = self.root.find(key, REUSE_DEPTH) if self.root is not None else None
+        self.reused = root is not None
+        if root is None:
+            root = Node(engine)
+        root.parent = None
+        root.move = None
+        self.root = root
+
+    def search(self, engine: bitboard.Bitboard, time_limit: float = None, max_playouts: int = None,
+               cancel: threading.Event = None):
+        """Return the most visited action from engine's position; engine is left as it was.
+
+        Setting ``cancel``, even before the search has started, ends it after the current batch.
+        """
+        if time_limit is None and max_playouts is None:
+            raise ValueError("MCTS needs a time limit or a playout budget")
+
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit is not None else None
+        self._set_root(engine)
+        self.cancel = cancel
+        self.playouts = 0
+
+        if not self.root.untried and not self.root.children:
+            self.elapsed = time.perf_counter() - start
+            return None
+
+        # the budget is checked after each batch, so even a zero budget or an
+        # early stop leaves the root with children to pick from
+        while True:
+            batch = self.batch_size
+            if max_playouts is not None:
+                batch = max(1, min(batch, max_playouts - self.playouts))
+            self._run_batch(engine, batch)
+            self.playouts += batch
+            if max_playouts is not None and self.playouts >= max_playouts:
+                break
+            if (cancel is not None and cancel.is_set()) or (deadline is not None and time.perf_counter() >= deadline):
+                break
+
+        self.elapsed = time.perf_counter() - start
+        return max(self.root.children.values(), key=lambda child: child.visits).move
+
+    def _select(self, engine):
+        # walk down to a leaf, expanding one action, and count the visit on
+        # the way so the next selection of the batch is steered elsewhere
+        node = self.root
+        node.visits += 1
+        path = [node]
+        depth = 0
+
+        while not node.untried and node.children:
+            node = node.uct_child(self.exploration)
+            engine.make_move(node.move)
+            depth += 1
+            node.visits += 1
+            path.append(node)
+
+        if node.untried:
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            mover = engine.side
+            engine.make_move(move)
+            depth += 1
+            child = Node(engine, move, node, mover)
+            node.children[move] = child
+            child.visits += 1
+            path.append(child)
+
+        return path, depth
+
+    def _run_batch(self, engine, size):
+        paths = []
+        finishes = []
+        for _ in range(size):
+            path, depth = self._select(engine)
+            paths.append(path)
+            finishes.append((engine.snapshot(), self.rng.getrandbits(32)))
+            for _ in range(depth):
+                engine.unmake_move()
+
+        if self.executor is not None:
+            chunk = max(1, len(finishes) // self.workers)
+            parts = [finishes[index:index + chunk] for index in range(0, len(finishes), chunk)]
+            winners = [winner for part in self.executor.map(_rollout_batch, parts) for winner in part]
+        else:
+            winners = _rollout_batch(finishes)
+
+        for path, winner in zip(paths, winners):
+            for node in path:
+                if node.mover is None:
+                    continue
+                if winner is None:
+                    node.wins += 0.5
+                elif winner == node.mover:
+                    node.wins += 1.0
+
+
+class MCTSPlayer(ComputerPlayer):
+    """Computer player that picks its moves with MonteCarloSearch.
+
+    Each move gets ``time_limit`` seconds and at most ``max_playouts``
+    playouts; either may be None but not both. ``workers`` and
+    ``batch_size`` are passed to the search.
+    """
+
+    def __init__(self, piece_type, game, time_limit: float = 1.0, max_playouts: int = None,
+                 workers: int = 1, batch_size: int = None):
+        super().__init__(piece_type, game)
+        self.time_limit = time_limit
+        self.max_playouts = max_playouts
+        self.searcher = MonteCarloSearch(workers, batch_size, rng=random.Random(random.getrandbits(32)))
+        # the cancel event of the choose_move in progress, which stop sets
+        self.turn_cancel = None
+
+    @property
+    def playouts(self) -> int:
+        return self.searcher.playouts
+
+    @property
+    def playouts_per_second(self) -> float:
+        return self.searcher.playouts_per_second
+
+    @property
+    def nodes(self) -> int:
+        # every playout adds one node to the tree
+        return self.searcher.playouts
+
+    def stop(self):
+        if self.turn_cancel is not None:
+            self.turn_cancel.set()
+
+    def close(self):
+        self.searcher.close()
+
+    def choose_move(self, cancel: threading.Event = None):
+        self.turn_cancel = cancel if cancel is not None else threading.Event()
+        return self.searcher.search(self.game.engine.copy(), self.time_limit, self.max_playouts, self.turn_cancel)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure MCTS playouts per second from the opening position.")
+    parser.add_argument("--time-limit", type=float, default=5.0)
+    parser.add_argument("--workers", "-j", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    searcher = MonteCarloSearch(args.workers, args.batch_size)
+    try:
+        searcher.search(bitboard.Bitboard(), args.time_limit)
+    finally:
+        searcher.close()
+    print(f"{searcher.playouts} playouts in {searcher.elapsed:.2f}s, "
+          f"{searcher.playouts_per_second:.0f} playouts per second with {args.workers} worker(s)")
+    return searcher
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,251 @@
+"""Opening book for the placement phase.
+
+A book maps positions, by Zobrist key, to the moves worth playing there and
+a weight for each. Positions are stored once per symmetry class: the key is
+that of the canonical position (see symmetry.py) and its moves are stored
+as they are played on it. It is built either from self-play games, weighting every
+placement-phase move by how often the player who made it went on to win, or
+by searching the opening offline. The file is a sorted array of fixed-size
+entries, so a lookup is a binary search over the mapped file::
+
+    python openingbook.py --source search --plies 4 --depth 4 --out opening.book
+    python openingbook.py --source selfplay --games 2000 --white alphabeta --black alphabeta --out opening.book
+"""
+
+import argparse
+import mmap
+import random
+import struct
+import sys
+import time
+from collections import defaultdict
+
+import bitboard
+import symmetry
+from bitboard import GAME_OVER, PLACE, MOVE, REMOVE, WHITE, BLACK, SPACE_INDEX
+
+MAGIC = b"MMOB"
+VERSION = 2
+_HEADER = struct.Struct("<4sHI")
+# Zobrist key, encoded action, weight
+_ENTRY = struct.Struct("<QHH")
+
+MAX_WEIGHT = 0xFFFF
+
+_MOVE_CODES = {PLACE: 0, MOVE: 1, REMOVE: 2}
+_MOVE_TYPES = (PLACE, MOVE, REMOVE)
+_NO_SPACE = 31
+
+
+def encode_move(action) -> int:
+    move_type, start, end = action
+    return _MOVE_CODES[move_type] << 10 | start << 5 | (_NO_SPACE if end is None else end)
+
+
+def decode_move(code: int):
+    end = code & 31
+    return _MOVE_TYPES[code >> 10], (code >> 5) & 31, (None if end == _NO_SPACE else end)
+
+
+def in_opening(engine: bitboard.Bitboard) -> bool:
+    return engine.state != GAME_OVER and bool(engine.pieces_in_deck[WHITE] or engine.pieces_in_deck[BLACK])
+
+
+def position_key(engine: bitboard.Bitboard):
+    """``(key, symmetry)``: the book key of engine's position and the symmetry that maps the position onto it."""
+    state, transform = symmetry.canonical_state(engine.snapshot())
+    return bitboard.Bitboard.from_state(state).zobrist, transform
+
+
+def write(path: str, entries: dict):
+    """Write ``{key: {action: weight}}`` as a book file, heaviest move first within each key.
+
+    Keys come from position_key and actions are those of the canonical position.
+    """
+    rows = []
+    for key, moves in entries.items():
+        for action, weight in moves.items():
+            weight = min(int(weight), MAX_WEIGHT)
+            if weight > 0:
+                rows.append((key, -weight, encode_move(action)))
+    rows.sort()
+
+    with open(path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, VERSION, len(rows)))
+        for key, weight, code in rows:
+            out.write(_ENTRY.pack(key, code, -weight))
+
+
+class OpeningBook:
+    """A book file mapped into memory.
+
+    ``lookup`` returns the ``(action, weight)`` pairs stored for a position
+    and ``choose`` picks one of them at random in proportion to its weight,
+    or returns None when the position is not in the book.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def _key_at(self, position: int) -> int:
+        return _ENTRY.unpack_from(self.data, _HEADER.size + position * _ENTRY.size)[0]
+
+    def lookup(self, engine: bitboard.Bitboard) -> list:
+        if not in_opening(engine):
+            return []
+
+        key, transform = position_key(engine)
+        back = symmetry.inverse(transform)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        legal = None
+        while low < self.count:
+            found, code, weight = _ENTRY.unpack_from(self.data, _HEADER.size + low * _ENTRY.size)
+            if found != key:
+                break
+            if legal is None:
+                legal = engine.legal_moves()
+            # a key collision must never make the player try an illegal move
+            action = symmetry.transform_action(decode_move(code), back)
+            if action in legal:
+                moves.append((action, weight))
+            low += 1
+        return moves
+
+    def choose(self, engine: bitboard.Bitboard, rng=random):
+        moves = self.lookup(engine)
+        if not moves:
+            return None
+        return rng.choices([action for action, _ in moves], [weight for _, weight in moves])[0]
+
+
+def _parse_record(record: str):
+    # str(MoveRecord) -> action
+    _, move_type, start, *end = record.split()
+    return move_type, SPACE_INDEX[start], (SPACE_INDEX[end[0]] if end else None)
+
+
+def from_games(results) -> dict:
+    """Book entries from simulate.GameResult records.
+
+    Each opening move scores two for a win of the player who made it and one
+    for a draw, so moves that only ever lost are left out.
+    """
+    entries = defaultdict(lambda: defaultdict(int))
+    for result in results:
+        engine = bitboard.Bitboard(WHITE if result.starting_player == "WHITE" else BLACK)
+        for record in result.moves:
+            if not in_opening(engine):
+                break
+            action = _parse_record(record)
+            mover = "WHITE" if engine.side == WHITE else "BLACK"
+            score = 2 if result.winner == mover else 1 if result.winner == "DRAW" else 0
+            if score:
+                key, transform = position_key(engine)
+                entries[key][symmetry.transform_action(action, transform)] += score
+            engine.make_move(action)
+    return entries
+
+
+def from_search(plies: int, depth: int, time_limit: float = None, progress=None) -> dict:
+    """Book entries from searching the first ``plies`` actions of the game.
+
+    The tree is walked once from each side's point of view: that side's
+    positions get the searched best move only, while every reply of the
+    other side is followed, so the book holds an answer to anything the
+    opponent may play. Both starting colours are covered.
+    """
+    # search imports this module for its players
+    import search
+
+    searcher = search.AlphaBetaSearch()
+    book = {}
+
+    def walk(engine, ply, perspective, visited):
+        if ply >= plies or not in_opening(engine):
+            return
+        key, transform = position_key(engine)
+        if (key, perspective) in visited:
+            return
+        visited.add((key, perspective))
+
+        if engine.side == perspective:
+            move = book.get(key)
+            if move is None:
+                move = searcher.search(engine, time_limit, depth)
+                book[key] = symmetry.transform_action(move, transform)
+                if progress is not None and len(book) % 100 == 0:
+                    progress(f"searched {len(book)} positions")
+            else:
+                move = symmetry.transform_action(move, symmetry.inverse(transform))
+            moves = [move]
+        else:
+            moves = engine.legal_moves()
+
+        for action in moves:
+            engine.make_move(action)
+            walk(engine, ply + 1, perspective, visited)
+            engine.unmake_move()
+
+    for first in (WHITE, BLACK):
+        for perspective in (WHITE, BLACK):
+            walk(bitboard.Bitboard(first), 0, perspective, set())
+
+    return {key: {move: 1} for key, move in book.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Mad Man's Morris opening book.")
+    parser.add_argument("--source", choices=("search", "selfplay"), default="search")
+    parser.add_argument("--plies", type=int, default=4, help="opening actions searched (search source)")
+    parser.add_argument("--depth", type=int, default=4, help="search depth per position (search source)")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per searched position or move")
+    parser.add_argument("--games", "-n", type=int, default=1000, help="games played (selfplay source)")
+    parser.add_argument("--white", choices=("random", "alphabeta"), default="alphabeta")
+    parser.add_argument("--black", choices=("random", "alphabeta"), default="alphabeta")
+    parser.add_argument("--workers", "-j", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="opening.book")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.source == "search":
+        entries = from_search(args.plies, args.depth, args.time_limit, progress=print)
+    else:
+        import simulate
+
+        options = (("time_limit", args.time_limit or 0.05),)
+        spec = {name: simulate.PlayerSpec(name, options if name == "alphabeta" else ())
+                for name in (args.white, args.black)}
+        results = []
+        simulate.run_games(args.games, spec[args.white], spec[args.black], args.workers,
+                           seed=args.seed, on_result=results.append)
+        entries = from_games(results)
+
+    write(args.out, entries)
+    print(f"wrote {sum(len(moves) for moves in entries.values())} moves for {len(entries)} positions "
+          f"to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
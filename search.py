@@ -0,0 +1,731 @@
+"""Alpha-beta search computer player for Mad Man's Morris.
+
+The search runs negamax with alpha-beta pruning and iterative deepening on a
+private copy of the game's bitboard, so the live Game is never touched until
+the chosen move is played. A mill and the removal that follows it count as a
+single ply of depth. An optional endgame Tablebase replaces the search in
+the positions it covers.
+
+ParallelSearch splits the root moves over worker processes. Run this module
+to measure its speedup over a single process::
+
+    python search.py --workers 1 2 4 8 --depth 7
+"""
+
+import argparse
+import functools
+import random
+import sys
+import threading
+import time
+
+import bitboard
+import tablebase as tb
+import transposition
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from bitboard import (GAME_OVER, REMOVE_PIECE, PLACE, MOVE, REMOVE, POINT_MILLS, MOBILITY, FEATURE_MASK,
+                      FEATURE_SHIFTS, neighbors_of, opponent)
+from MadMansMorris import ComputerPlayer
+
+WIN_SCORE = 100000
+INFINITY = 10 * WIN_SCORE
+
+PIECE_WEIGHT = 100
+MILL_WEIGHT = 8
+MOBILITY_WEIGHT = 3
+BLOCKED_WEIGHT = 6
+
+# how many nodes are searched between clock checks
+CHECK_INTERVAL = 1024
+
+# scores at least this close to WIN_SCORE are forced wins; tablebase wins can
+# lie far beyond the search horizon
+MATE_BOUND = WIN_SCORE - 1000
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def evaluate(engine: bitboard.Bitboard) -> int:
+    """Score the position from the point of view of the side to move."""
+    side = engine.side
+    features = engine.features
+    # the points next to an empty point; stones outside it are blocked
+    free = neighbors_of(engine.empty_spaces())
+    score = 0
+
+    # every term is kept up to date by the engine or read in a few lookups, so nothing here scans the board
+    for color, sign in ((side, 1), (opponent(side), -1)):
+        on_board = engine.pieces_on_board[color]
+        value = PIECE_WEIGHT * (engine.pieces_in_deck[color] + on_board) + MILL_WEIGHT * engine.milled[color].bit_count()
+
+        # mobility only matters once a player is moving without flying
+        if on_board > 3:
+            value += (MOBILITY_WEIGHT * (features >> FEATURE_SHIFTS[MOBILITY][color] & FEATURE_MASK)
+                      - BLOCKED_WEIGHT * (engine.stones[color] & ~free).bit_count())
+
+        score += sign * value
+
+    # a pending removal is as good as a piece in hand
+    if engine.state == REMOVE_PIECE:
+        score += PIECE_WEIGHT
+
+    return score
+
+
+def _score_to_table(score: int, ply: int) -> int:
+    # wins are stored as distance from this node rather than from the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def forms_mill(engine: bitboard.Bitboard, action) -> bool:
+    move_type, start, end = action
+    stones = engine.stones[engine.side]
+
+    if move_type == PLACE:
+        target = start
+    elif move_type == MOVE:
+        target = end
+        stones &= ~(1 << start)
+    else:
+        return False
+
+    stones |= 1 << target
+    first, second = POINT_MILLS[target]
+    return stones & first == first or stones & second == second
+
+
+class AlphaBetaSearch:
+    """Iterative deepening negamax with alpha-beta pruning.
+
+    After ``search`` returns, ``nodes``, ``depth``, ``score``, ``pv`` and
+    ``elapsed`` describe the last search. ``depth`` is the deepest iteration
+    that finished; the returned move may come from a deeper, partly searched
+    iteration when it had already beaten the previous best move.
+
+    ``table`` is an optional TranspositionTable that is probed and filled at
+    every interior node; pass the same table to later searches to reuse it.
+    ``tablebase`` is an optional Tablebase whose exact results cut the search
+    off in every position it covers.
+
+    ``search`` takes an optional ``cancel`` threading.Event; setting it, even
+    before the search has started, ends the search as the deadline would.
+    """
+
+    MAX_PLY = 128
+
+    def __init__(self, table: TranspositionTable = None, tablebase=None):
+        self.table = table
+        self.tablebase = tablebase
+        self.tablebase_hits = 0
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.elapsed = 0.0
+
+        self.deadline = None
+        # the Event passed to the running search, set to stop it early
+        self.cancel = None
+        # a shared flag another process sets to stop the search, see ParallelSearch
+        self.abort = None
+
+        self.killers = [[None, None] for _ in range(self.MAX_PLY)]
+        self.history = {}
+        self.pv_table = [[] for _ in range(self.MAX_PLY + 1)]
+
+    def search(self, engine: bitboard.Bitboard, time_limit: float = None, max_depth: int = None,
+               cancel: threading.Event = None):
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.cancel = cancel
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.tablebase_hits = 0
+        self.reset()
+
+        moves = engine.legal_moves()
+        if not moves:
+            self.pv = []
+            self.elapsed = time.perf_counter() - start
+            return None
+
+        best_move = moves[0]
+        self.pv = [best_move]
+        max_depth = max_depth if max_depth is not None else self.MAX_PLY - 1
+        base = len(engine.undo_stack)
+
+        for depth in range(1, max_depth + 1):
+            self._root_best = None
+            try:
+                score = self._search_root(engine, moves, depth, best_move)
+            except SearchTimeout:
+                while len(engine.undo_stack) > base:
+                    engine.unmake_move()
+
+                # the previous best move is searched first, so anything that
+                # finished ahead of it in the cut-short iteration is better
+                if self._root_best is not None:
+                    best_move, self.score, self.pv = self._root_best
+                break
+
+            best_move = self.pv[0]
+            self.score = score
+            self.depth = depth
+
+            if len(moves) == 1 or abs(score) >= MATE_BOUND:
+                break
+
+        self.elapsed = time.perf_counter() - start
+        return best_move
+
+    def search_root(self, engine: bitboard.Bitboard, moves: list, depth: int):
+        """Search only the given root moves, best first, to depth; ``(move, score, pv)`` or None when stopped.
+
+        The search state (killers, history and table) carries over from the
+        previous call, so a worker can run one iteration after another.
+        """
+        self.nodes = 0
+        base = len(engine.undo_stack)
+        try:
+            score = self._search_root(engine, list(moves), depth, moves[0])
+        except SearchTimeout:
+            while len(engine.undo_stack) > base:
+                engine.unmake_move()
+            return None
+        return self.pv[0], score, self.pv
+
+    def reset(self):
+        """Forget the killers and history of earlier searches and age the table."""
+        self.history.clear()
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        if self.table is not None:
+            self.table.new_search()
+
+    def _check_time(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.cancel is not None and self.cancel.is_set():
+            raise SearchTimeout()
+        if self.abort is not None and self.abort.value:
+            raise SearchTimeout()
+
+    def _search_root(self, engine, moves, depth, best_move):
+        moves.sort(key=lambda move: self._order_key(engine, move, 0, best_move), reverse=True)
+
+        side = engine.side
+        alpha = -INFINITY
+        best_pv = None
+
+        for move in moves:
+            engine.make_move(move)
+            self.pv_table[1] = []
+            if engine.side == side:
+                # a mill was formed, the removal belongs to the same ply
+                score = self._negamax(engine, depth, alpha, INFINITY, 1)
+            else:
+                score = -self._negamax(engine, depth - 1, -INFINITY, -alpha, 1)
+            engine.unmake_move()
+
+            if score > alpha:
+                alpha = score
+                best_pv = [move] + self.pv_table[1]
+                self._root_best = (move, score, best_pv)
+
+        self.pv = best_pv
+        return alpha
+
+    def _negamax(self, engine, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self._check_time()
+
+        self.pv_table[ply] = []
+
+        if engine.state == GAME_OVER:
+            return WIN_SCORE - ply if engine.winner == engine.side else -WIN_SCORE + ply
+
+        if self.tablebase is not None:
+            outcome = self.tablebase.probe(engine)
+            if outcome is not None:
+                self.tablebase_hits += 1
+                result, distance = outcome
+                if result == tb.WIN:
+                    return WIN_SCORE - ply - distance
+                if result == tb.LOSS:
+                    return -WIN_SCORE + ply + distance
+                return 0
+
+        if depth <= 0 or ply >= self.MAX_PLY - 1:
+            return evaluate(engine)
+
+        table = self.table
+        table_move = None
+        original_alpha = alpha
+        if table is not None:
+            key = engine.zobrist
+            entry = table.probe(key)
+            if entry is not None:
+                table_move = entry[4]
+                if entry[1] >= depth:
+                    score = _score_from_table(entry[2], ply)
+                    flag = entry[3]
+                    if (flag == EXACT or (flag == LOWER_BOUND and score >= beta)
+                            or (flag == UPPER_BOUND and score <= alpha)):
+                        if table_move is not None:
+                            self.pv_table[ply] = [table_move]
+                        return score
+
+        moves = engine.legal_moves()
+        pv_move = self.pv[ply] if ply < len(self.pv) else None
+        moves.sort(key=lambda move: self._order_key(engine, move, ply, pv_move, table_move), reverse=True)
+
+        side = engine.side
+        best = -INFINITY
+        best_move = None
+
+        for move in moves:
+            engine.make_move(move)
+            self.pv_table[ply + 1] = []
+            if engine.side == side:
+                score = self._negamax(engine, depth, alpha, beta, ply + 1)
+            else:
+                score = -self._negamax(engine, depth - 1, -beta, -alpha, ply + 1)
+            engine.unmake_move()
+
+            if score > best:
+                best = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                if not forms_mill(engine, move) and move[0] != REMOVE:
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                self.history[move] = self.history.get(move, 0) + depth * depth
+                break
+
+        if table is not None:
+            if best <= original_alpha:
+                flag = UPPER_BOUND
+            elif best >= beta:
+                flag = LOWER_BOUND
+            else:
+                flag = EXACT
+            table.store(key, depth, _score_to_table(best, ply), flag, best_move)
+
+        return best
+
+    def _order_key(self, engine, move, ply, pv_move, table_move=None):
+        if move == pv_move or move == table_move:
+            return 3 * WIN_SCORE
+        if forms_mill(engine, move):
+            return 2 * WIN_SCORE
+        if move in self.killers[ply]:
+            return WIN_SCORE
+        return self.history.get(move, 0)
+
+
+@functools.lru_cache(maxsize=None)
+def _open_tablebase(path: str) -> tb.Tablebase:
+    # every player given the same file shares one mapping
+    return tb.Tablebase(path)
+
+
+@functools.lru_cache(maxsize=None)
+def _open_book(path: str) -> 'openingbook.OpeningBook':
+    import openingbook
+    return openingbook.OpeningBook(path)
+
+
+# the search of a ParallelSearch worker process, set up by _init_worker
+_worker_search = None
+_worker_search_id = None
+
+
+def _init_worker(table_bytes: int, tablebase_path: str, abort):
+    global _worker_search
+    table = TranspositionTable(table_bytes) if table_bytes else None
+    tablebase = _open_tablebase(tablebase_path) if tablebase_path else None
+    _worker_search = AlphaBetaSearch(table, tablebase)
+    _worker_search.abort = abort
+
+
+def _search_split(state: bitboard.GameState, moves: list, depth: int, search_id: int):
+    # worker process entry point: search some of the root moves to depth
+    global _worker_search_id
+    if search_id != _worker_search_id:
+        _worker_search_id = search_id
+        _worker_search.reset()
+    result = _worker_search.search_root(bitboard.Bitboard.from_state(state), moves, depth)
+    return result, _worker_search.nodes
+
+
+class ParallelSearch:
+    """Iterative deepening with the root moves split over worker processes.
+
+    Every iteration deals the root moves, best first, round-robin to
+    ``workers`` processes. Each searches its share with alpha-beta and its
+    own transposition table, which stays warm across iterations, and the
+    best of the shares wins. With a single worker the search runs in this
+    process as a plain, deterministic AlphaBetaSearch.
+
+    ``cancel``, ``deadline`` and the result attributes (``nodes``, ``depth``,
+    ``score``, ``pv`` and ``elapsed``) behave as on AlphaBetaSearch. Call
+    ``close`` to shut the worker processes down.
+    """
+
+    # how often, in seconds, the deadline and cancel event are checked while workers search
+    POLL_INTERVAL = 0.005
+
+    def __init__(self, workers: int, table_bytes: int = transposition.DEFAULT_MAX_BYTES, tablebase=None):
+        self.workers = workers
+        self.table_bytes = table_bytes
+        self.tablebase = tablebase
+        self.local = AlphaBetaSearch(TranspositionTable(table_bytes) if table_bytes else None, tablebase) \
+            if workers <= 1 else None
+        self.executor = None
+        self.abort = None
+        self.search_id = 0
+
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.elapsed = 0.0
+        self.deadline = None
+        self.cancel = None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _start_workers(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.abort = multiprocessing.Value("b", 0, lock=False)
+        tablebase_path = getattr(self.tablebase, "path", None)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.table_bytes // self.workers, tablebase_path, self.abort))
+
+    def search(self, engine: bitboard.Bitboard, time_limit: float = None, max_depth: int = None,
+               cancel: threading.Event = None):
+        if self.local is not None:
+            move = self.local.search(engine, time_limit, max_depth, cancel)
+            for name in ("nodes", "depth", "score", "pv", "elapsed"):
+                setattr(self, name, getattr(self.local, name))
+            return move
+
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.cancel = cancel
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.search_id += 1
+
+        moves = engine.legal_moves()
+        if not moves:
+            self.pv = []
+            self.elapsed = time.perf_counter() - start
+            return None
+        if self.executor is None:
+            self._start_workers()
+
+        state = engine.snapshot()
+        best_move = moves[0]
+        self.pv = [best_move]
+        scores = {}
+        max_depth = max_depth if max_depth is not None else AlphaBetaSearch.MAX_PLY - 1
+
+        for depth in range(1, max_depth + 1):
+            ordered = sorted(moves, key=lambda move: (move == best_move, scores.get(move, -INFINITY)), reverse=True)
+            shares = [ordered[index::self.workers] for index in range(min(self.workers, len(ordered)))]
+            futures = [self.executor.submit(_search_split, state, share, depth, self.search_id) for share in shares]
+            results = self._wait(futures)
+
+            # the share holding the previous best move comes first; without it the others prove nothing
+            if results[0] is None:
+                break
+            finished = [result for result in results if result is not None]
+            move, score, pv = max(finished, key=lambda result: result[1])
+            for share_move, share_score, _ in finished:
+                scores[share_move] = share_score
+            best_move, self.score, self.pv = move, score, pv
+            if len(finished) < len(results):
+                break
+            self.depth = depth
+
+            if len(moves) == 1 or abs(score) >= MATE_BOUND:
+                break
+
+        self.elapsed = time.perf_counter() - start
+        return best_move
+
+    def _wait(self, futures) -> list:
+        # results of every share, None for the shares cut short by the deadline or cancel
+        from concurrent.futures import wait
+
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=self.POLL_INTERVAL)
+            if pending and not self.abort.value:
+                if (self.cancel is not None and self.cancel.is_set()) or \
+                        (self.deadline is not None and time.perf_counter() >= self.deadline):
+                    self.abort.value = 1
+        self.abort.value = 0
+
+        results = []
+        for future in futures:
+            result, nodes = future.result()
+            self.nodes += nodes
+            results.append(result)
+        return results
+
+
+def measure_speedup(engine: bitboard.Bitboard, worker_counts, depth: int) -> list:
+    """Time a search of engine to a fixed depth with each number of workers.
+
+    Returns ``(workers, seconds, nodes, speedup)`` rows, where speedup is
+    the time with the first worker count divided by the time with this one.
+    """
+    rows = []
+    for workers in worker_counts:
+        searcher = ParallelSearch(workers)
+        try:
+            if workers > 1:
+                # start the processes outside the timing
+                searcher.search(engine.copy(), max_depth=1)
+            start = time.perf_counter()
+            searcher.search(engine.copy(), max_depth=depth)
+            seconds = time.perf_counter() - start
+        finally:
+            searcher.close()
+        rows.append((workers, seconds, searcher.nodes, rows[0][1] / seconds if rows else 1.0))
+    return rows
+
+
+class AlphaBetaPlayer(ComputerPlayer):
+    """Computer player that picks its moves with AlphaBetaSearch.
+
+    ``time_limit`` is the wall-clock budget in seconds for each move and
+    ``max_depth`` caps the iterative deepening; either may be None.
+    ``table_bytes`` sizes the player's transposition table, which is kept
+    between moves; 0 disables it. ``tablebase`` is a Tablebase, or the path
+    of a tablebase file, consulted before and during every search, and
+    ``book`` an OpeningBook, or the path of a book file, whose moves are
+    played without searching.
+
+    With ``ponder`` the player keeps searching during the opponent's turn
+    once ``start_pondering`` is called. When the principal variation
+    predicts the opponent's reply, the position after it is searched; if
+    that reply is then played the pondering search simply carries on as the
+    real one, finishing ``time_limit`` seconds after it started. Otherwise
+    the current position is searched, which fills the transposition table
+    for every reply, and the real search starts from a warm table.
+
+    With ``workers`` above one every search is a ParallelSearch over that
+    many processes, which ``close`` shuts down.
+    """
+
+    def __init__(self, piece_type, game, time_limit: float = 1.0, max_depth: int = None,
+                 table_bytes: int = transposition.DEFAULT_MAX_BYTES, tablebase=None, book=None,
+                 ponder: bool = False, workers: int = 1):
+        super().__init__(piece_type, game)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_bytes) if table_bytes else None
+        if isinstance(tablebase, str):
+            tablebase = _open_tablebase(tablebase)
+        self.tablebase = tablebase
+        if isinstance(book, str):
+            book = _open_book(book)
+        self.book = book
+        if workers > 1:
+            self.table = None
+            self.searcher = ParallelSearch(workers, table_bytes, tablebase)
+        else:
+            self.searcher = AlphaBetaSearch(self.table, tablebase)
+
+        self.ponder = ponder
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        # the principal variation of the search that chose the last move played
+        self.expected_line = None
+        self.ponder_thread = None
+        self.ponder_key = None
+        self.ponder_started = 0.0
+        self.ponder_result = None
+        self.ponder_cancel = None
+        # the cancel event of the choose_move in progress, which stop sets
+        self.turn_cancel = None
+
+    @property
+    def nodes(self) -> int:
+        return self.searcher.nodes
+
+    @property
+    def depth(self) -> int:
+        return self.searcher.depth
+
+    @property
+    def principal_variation(self) -> list:
+        return self.searcher.pv
+
+    @property
+    def pondering(self) -> bool:
+        return self.ponder_thread is not None
+
+    def stop(self):
+        for cancel in (self.turn_cancel, self.ponder_cancel):
+            if cancel is not None:
+                cancel.set()
+
+    def close(self):
+        self.stop_pondering()
+        if isinstance(self.searcher, ParallelSearch):
+            self.searcher.close()
+
+    def predicted_position(self):
+        """The engine after the opponent's expected reply to our last move, or None without a prediction."""
+        line = self.expected_line
+        history = self.game.move_history
+        if not line or not history or history[-1].player is not self:
+            return None
+        last = history[-1]
+        if line[0] != (last.move_type, bitboard.SPACE_INDEX[last.start_space],
+                       bitboard.SPACE_INDEX[last.end_space] if last.end_space else None):
+            return None
+
+        engine = self.game.engine.copy()
+        for move in line[1:]:
+            if engine.side == self.piece_type or engine.state == GAME_OVER or not engine.make_move(move):
+                break
+        if engine.side != self.piece_type or engine.state == GAME_OVER:
+            return None
+        engine.undo_stack.clear()
+        return engine
+
+    def start_pondering(self):
+        """Search in the background until our turn; call when the opponent starts thinking."""
+        if not self.ponder or self.pondering:
+            return
+        if self.game.game_state == GAME_OVER or self.game.current_player is self:
+            return
+
+        engine = self.predicted_position()
+        if engine is not None:
+            self.ponder_key = engine.zobrist
+        else:
+            engine = self.game.engine.copy()
+            self.ponder_key = None
+
+        self.ponder_result = None
+        self.ponder_started = time.perf_counter()
+        self.ponder_cancel = threading.Event()
+        self.ponder_thread = threading.Thread(target=self._ponder, args=(engine, self.ponder_cancel), daemon=True)
+        self.ponder_thread.start()
+
+    def _ponder(self, engine, cancel):
+        # with no time limit the search runs until cancelled or max_depth
+        self.ponder_result = self.searcher.search(engine, None, self.max_depth, cancel)
+
+    def stop_pondering(self):
+        """Abandon the background search, if any."""
+        thread = self.ponder_thread
+        if thread is None:
+            return
+        self.ponder_cancel.set()
+        thread.join()
+        self.ponder_thread = None
+
+    def _finish_pondering(self, cancel):
+        # the pondered move when the opponent played the predicted reply, None otherwise
+        thread = self.ponder_thread
+        if thread is None:
+            return None
+        if self.ponder_key is None or self.game.engine.zobrist != self.ponder_key:
+            self.ponder_misses += 1
+            self.stop_pondering()
+            return None
+
+        self.ponder_hits += 1
+        # the pondering search carries on as this turn's until time_limit after
+        # it started; stop sets its cancel event too, which ends the wait early
+        if not cancel.is_set():
+            remaining = None
+            if self.time_limit is not None:
+                remaining = max(0.0, self.ponder_started + self.time_limit - time.perf_counter())
+            thread.join(remaining)
+        self.stop_pondering()
+        return self.ponder_result
+
+    def choose_move(self, cancel: threading.Event = None):
+        cancel = cancel if cancel is not None else threading.Event()
+        self.turn_cancel = cancel
+        move = self._finish_pondering(cancel)
+        if move is not None:
+            self.expected_line = list(self.searcher.pv)
+            return move
+
+        self.expected_line = None
+        if self.book is not None:
+            move = self.book.choose(self.game.engine)
+            if move is not None:
+                return move
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(self.game.engine.copy())
+            if move is not None:
+                return move
+        move = self.searcher.search(self.game.engine.copy(), self.time_limit, self.max_depth, cancel)
+        self.expected_line = list(self.searcher.pv)
+        return move
+
+
+def _speedup_position(seed: int, plies: int) -> bitboard.Bitboard:
+    rng = random.Random(seed)
+    engine = bitboard.Bitboard(bitboard.WHITE)
+    for _ in range(plies):
+        if engine.state == GAME_OVER:
+            break
+        engine.make_move(rng.choice(engine.legal_moves()))
+    engine.undo_stack.clear()
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the speedup of the parallel search over one process.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to compare")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=11, help="seed of the random game giving the position")
+    parser.add_argument("--plies", type=int, default=24, help="random plies played before searching")
+    args = parser.parse_args(argv)
+
+    engine = _speedup_position(args.seed, args.plies)
+    print(f"{'workers':>7} {'seconds':>9} {'nodes':>10} {'nodes/s':>10} {'speedup':>8}")
+    for workers, seconds, nodes, speedup in measure_speedup(engine, args.workers, args.depth):
+        print(f"{workers:7} {seconds:9.3f} {nodes:10} {nodes / seconds if seconds else 0.0:10.0f} {speedup:8.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
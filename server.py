@@ -0,0 +1,480 @@
+"""Asyncio game server hosting many concurrent matches.
+
+Clients talk to the server over TCP, one command per line; the server
+answers with lines of its own. Commands:
+
+    LIST                      waiting lobbies, one ``LOBBY <id> <host>`` line each, then ``END``
+    NAME <name>               set the name shown in lobbies
+    CREATE                    open a lobby and wait for an opponent
+    JOIN <lobby>              join a waiting lobby
+    QUICK                     play the next player who also asks for a quick match
+    COMPUTER [kind]           play a computer at once (random, alphabeta or mcts)
+    PLACE <space>             the moves, as in the game's move records
+    MOVE <start> <end>
+    REMOVE <space>
+    SURRENDER
+    PING
+    QUIT
+
+Server lines: ``WAITING <lobby>``, ``START <match> <your color> <first color>``,
+``MOVED <color> <PLACE|MOVE|REMOVE> <start> [end]``, ``TURN <color>``,
+``GAMEOVER <winner|NONE> <WIN|SURRENDER|DISCONNECT|IDLE|ERROR>``, ``OK``,
+``PONG`` and ``ERROR <message>``.
+
+Every connection has a bounded outbox; a client that stops reading is
+disconnected once it fills rather than holding up anyone else. Matches
+that see no move for ``idle_timeout`` seconds are ended. Computer moves
+are chosen on a process pool so the event loop never waits on a search;
+a match whose computer move fails ends with ``GAMEOVER NONE ERROR``.
+Run a server with::
+
+    python server.py --port 4000 --workers 4
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+
+import bitboard
+from bitboard import SPACE_INDEX
+from MadMansMorris import Game, BoardSpace
+
+DEFAULT_PORT = 4000
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_QUEUE_LIMIT = 256
+DEFAULT_TIME_LIMIT = 0.5
+MAX_LINE = 1024
+
+COMPUTER_KINDS = ("random", "alphabeta", "mcts")
+
+WHITE = "WHITE"
+BLACK = "BLACK"
+
+
+def computer_move(kind: str, state: bitboard.GameState, time_limit: float, seed: int):
+    """Choose an action for the side to move in state; runs in a worker process."""
+    engine = bitboard.Bitboard.from_state(state)
+    rng = random.Random(seed)
+    if kind == "alphabeta":
+        import search
+        return search.AlphaBetaSearch().search(engine, time_limit)
+    if kind == "mcts":
+        import mcts
+        return mcts.MonteCarloSearch(rng=rng).search(engine, time_limit)
+    return rng.choice(engine.legal_moves())
+
+
+def _color_name(piece_type: int) -> str:
+    return WHITE if piece_type == BoardSpace.WHITE_SPACE else BLACK
+
+
+def parse_move(words: list):
+    """``["MOVE", "A1", "D1"]`` -> action tuple, or None if the words are not a move."""
+    if not words or words[0] not in (bitboard.PLACE, bitboard.MOVE, bitboard.REMOVE):
+        return None
+    if any(word not in SPACE_INDEX for word in words[1:]):
+        return None
+    if words[0] == bitboard.MOVE:
+        return (bitboard.MOVE, SPACE_INDEX[words[1]], SPACE_INDEX[words[2]]) if len(words) == 3 else None
+    return (words[0], SPACE_INDEX[words[1]], None) if len(words) == 2 else None
+
+
+class Connection:
+    """One client: its outbox, and the lobby or match it is in."""
+
+    def __init__(self, server: 'GameServer', reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 number: int, queue_limit: int):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.name = f"player{number}"
+        self.outbox = asyncio.Queue(queue_limit)
+        self.write_task = None
+        self.closed = False
+
+        self.lobby = None
+        self.match = None
+        self.color = None
+
+    def send(self, line: str):
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(line)
+        except asyncio.QueueFull:
+            self.abort()
+
+    def abort(self):
+        # the client is not reading its messages: drop it instead of buffering forever
+        self.closed = True
+        self.writer.transport.abort()
+        if self.write_task is not None:
+            self.write_task.cancel()
+
+    def close(self):
+        # hang up once everything queued has been sent
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.outbox.put_nowait(None)
+        except asyncio.QueueFull:
+            self.abort()
+
+    async def write_loop(self):
+        try:
+            while True:
+                line = await self.outbox.get()
+                if line is None:
+                    break
+                self.writer.write(line.encode() + b"\n")
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.writer.close()
+
+
+class Match:
+    """A running Game and who plays each color: a Connection or a computer kind."""
+
+    def __init__(self, server: 'GameServer', number: int, white, black):
+        self.server = server
+        self.number = number
+        self.players = {WHITE: white, BLACK: black}
+        self.game = Game(autostart=False)
+        self.last_activity = time.monotonic()
+        self.end_reason = "WIN"
+        self.finished = False
+        self.computer_task = None
+
+        self.game.subscribe(self.game_event)
+
+    @property
+    def turn(self) -> str:
+        return _color_name(self.game.current_player.piece_type)
+
+    def connections(self):
+        return [player for player in self.players.values() if isinstance(player, Connection)]
+
+    def broadcast(self, line: str):
+        for connection in self.connections():
+            connection.send(line)
+
+    def game_event(self, event: str, value):
+        if event == Game.PLAYER_CHANGE_EVENT:
+            self.broadcast(f"TURN {_color_name(value.piece_type)}")
+        elif event == Game.GAME_OVER_EVENT:
+            self.server.finish_match(self, _color_name(value.piece_type), self.end_reason)
+        else:
+            self.broadcast(f"MOVED {str(value).strip()}")
+
+    def play(self, action):
+        self.last_activity = time.monotonic()
+        self.game.play_move(action)
+        self.server.schedule_computer(self)
+
+
+class GameServer:
+    """Hosts lobbies and matches for any number of connections.
+
+    ``executor`` runs computer moves; by default a process pool of
+    ``workers`` processes is created on start and shut down on close.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, workers: int = 1, executor=None,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, queue_limit: int = DEFAULT_QUEUE_LIMIT,
+                 time_limit: float = DEFAULT_TIME_LIMIT):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.executor = executor
+        self.owns_executor = executor is None
+        self.idle_timeout = idle_timeout
+        self.queue_limit = queue_limit
+        self.time_limit = time_limit
+
+        self.connections = set()
+        self.lobbies = {}
+        self.quick_waiting = None
+        self.matches = {}
+        self.evicted = 0
+
+        self._numbers = itertools.count(1)
+        self._handlers = set()
+        self._server = None
+        self._sweeper = None
+
+    async def start(self) -> int:
+        """Start listening and return the port, which is chosen by the OS when port is 0."""
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_LINE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._sweeper = asyncio.create_task(self.sweep_idle())
+        return self.port
+
+    async def close(self):
+        self._sweeper.cancel()
+        self._server.close()
+        for connection in list(self.connections):
+            connection.close()
+        for match in list(self.matches.values()):
+            if match.computer_task is not None:
+                match.computer_task.cancel()
+        # the handlers return once their hung-up connections hit end of file
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        if self.owns_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = Connection(self, reader, writer, next(self._numbers), self.queue_limit)
+        self.connections.add(connection)
+        self._handlers.add(asyncio.current_task())
+        connection.write_task = asyncio.create_task(connection.write_loop())
+
+        try:
+            while not connection.closed:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    connection.send("ERROR line too long")
+                    break
+                if not line:
+                    break
+                words = line.decode(errors="replace").split()
+                if words and not self.handle_command(connection, words):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.disconnect(connection)
+            connection.close()
+            await asyncio.gather(connection.write_task, return_exceptions=True)
+            self._handlers.discard(asyncio.current_task())
+
+    def handle_command(self, connection: Connection, words: list) -> bool:
+        # returns False when the client is done
+        command = words[0].upper()
+        words[0] = command
+
+        if command == "QUIT":
+            return False
+        if command == "PING":
+            connection.send("PONG")
+        elif command == "NAME" and len(words) == 2:
+            connection.name = words[1]
+            connection.send("OK")
+        elif command == "LIST":
+            for number, host in self.lobbies.items():
+                connection.send(f"LOBBY {number} {host.name}")
+            connection.send("END")
+        elif command in ("CREATE", "JOIN", "QUICK", "COMPUTER"):
+            if connection.match is not None or connection.lobby is not None:
+                connection.send("ERROR already playing or waiting")
+            else:
+                self.matchmake(connection, words)
+        elif command == "SURRENDER":
+            match = connection.match
+            if match is None:
+                connection.send("ERROR not in a match")
+            else:
+                match.end_reason = "SURRENDER"
+                match.game.surrender(self.player_of(match, connection.color))
+        elif parse_move([word.upper() for word in words]) is not None:
+            self.move(connection, parse_move([word.upper() for word in words]))
+        else:
+            connection.send(f"ERROR unknown command {' '.join(words)}")
+        return True
+
+    def matchmake(self, connection: Connection, words: list):
+        command = words[0]
+        if command == "CREATE":
+            number = next(self._numbers)
+            self.lobbies[number] = connection
+            connection.lobby = number
+            connection.send(f"WAITING {number}")
+        elif command == "JOIN":
+            number = int(words[1]) if len(words) == 2 and words[1].isdigit() else None
+            host = self.lobbies.pop(number, None)
+            if host is None:
+                connection.send("ERROR no such lobby")
+                return
+            host.lobby = None
+            self.start_match(host, connection)
+        elif command == "QUICK":
+            waiting = self.quick_waiting
+            if waiting is None or waiting.closed:
+                self.quick_waiting = connection
+                connection.lobby = "QUICK"
+                connection.send("WAITING QUICK")
+            else:
+                self.quick_waiting = None
+                waiting.lobby = None
+                self.start_match(waiting, connection)
+        else:
+            kind = words[1].lower() if len(words) > 1 else "random"
+            if kind not in COMPUTER_KINDS:
+                connection.send(f"ERROR computer must be one of {', '.join(COMPUTER_KINDS)}")
+                return
+            if random.randint(0, 1):
+                self.start_match(connection, kind)
+            else:
+                self.start_match(kind, connection)
+
+    def start_match(self, white, black) -> Match:
+        match = Match(self, next(self._numbers), white, black)
+        self.matches[match.number] = match
+        first = match.turn
+        for color, player in match.players.items():
+            if isinstance(player, Connection):
+                player.match = match
+                player.color = color
+                player.send(f"START {match.number} {color} {first}")
+        self.schedule_computer(match)
+        return match
+
+    def player_of(self, match: Match, color: str):
+        return match.game.white_player if color == WHITE else match.game.black_player
+
+    def move(self, connection: Connection, action):
+        match = connection.match
+        if match is None:
+            connection.send("ERROR not in a match")
+        elif match.turn != connection.color:
+            connection.send("ERROR not your turn")
+        elif action not in match.game.legal_moves():
+            connection.send("ERROR illegal move")
+        else:
+            match.play(action)
+
+    def schedule_computer(self, match: Match):
+        if match.finished or match.computer_task is not None:
+            return
+        if isinstance(match.players[match.turn], str):
+            match.computer_task = asyncio.get_running_loop().create_task(self.computer_turn(match))
+
+    async def computer_turn(self, match: Match):
+        loop = asyncio.get_running_loop()
+        try:
+            while not match.finished and isinstance(match.players[match.turn], str):
+                kind = match.players[match.turn]
+                action = await loop.run_in_executor(self.executor, computer_move, kind, match.game.snapshot(),
+                                                    self.time_limit, random.getrandbits(32))
+                if match.finished:
+                    return
+                match.last_activity = time.monotonic()
+                match.game.play_move(action)
+        except Exception as error:
+            # a failed computer move would leave the match waiting forever
+            match.broadcast(f"ERROR computer move failed: {type(error).__name__}")
+            self.finish_match(match, "NONE", "ERROR")
+        finally:
+            match.computer_task = None
+        # the human's reply starts the next computer turn from Match.play
+
+    def finish_match(self, match: Match, winner: str, reason: str):
+        if match.finished:
+            return
+        match.finished = True
+        match.game.unsubscribe(match.game_event)
+        self.matches.pop(match.number, None)
+        if match.computer_task is not None and match.computer_task is not asyncio.current_task():
+            match.computer_task.cancel()
+        match.broadcast(f"GAMEOVER {winner} {reason}")
+        for connection in match.connections():
+            connection.match = None
+            connection.color = None
+
+    def disconnect(self, connection: Connection):
+        self.connections.discard(connection)
+        if connection.lobby is not None:
+            self.lobbies.pop(connection.lobby, None)
+            if self.quick_waiting is connection:
+                self.quick_waiting = None
+            connection.lobby = None
+        match = connection.match
+        if match is not None:
+            match.end_reason = "DISCONNECT"
+            match.game.surrender(self.player_of(match, connection.color))
+
+    async def sweep_idle(self):
+        interval = max(0.05, min(self.idle_timeout / 4, 30.0))
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self.idle_timeout
+            for match in [match for match in self.matches.values() if match.last_activity < deadline]:
+                self.evicted += 1
+                self.finish_match(match, "NONE", "IDLE")
+
+
+class GameClient:
+    """A minimal client for tests and scripts."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'GameClient':
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, line: str):
+        self.writer.write(line.encode() + b"\n")
+        await self.writer.drain()
+
+    async def receive(self, timeout: float = 5.0) -> str:
+        line = await asyncio.wait_for(self.reader.readline(), timeout)
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return line.decode().rstrip("\n")
+
+    async def expect(self, prefix: str, timeout: float = 5.0) -> str:
+        """Skip lines until one starts with prefix and return it."""
+        deadline = time.monotonic() + timeout
+        while True:
+            line = await self.receive(max(0.0, deadline - time.monotonic()))
+            if line.startswith(prefix):
+                return line
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(host: str, port: int, workers: int, idle_timeout: float, time_limit: float):
+    server = GameServer(host, port, workers, idle_timeout=idle_timeout, time_limit=time_limit)
+    await server.start()
+    print(f"serving on {host}:{server.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Mad Man's Morris games over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", "-j", type=int, default=1, help="processes for computer moves")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="seconds per computer move")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.idle_timeout, args.time_limit))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
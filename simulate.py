@@ -0,0 +1,246 @@
+"""Headless self-play simulator.
+
+Plays a batch of games between two computer player types without Qt,
+spreading the games over a process pool, and reports the results. Run it
+from the command line, for example::
+
+    python simulate.py --games 1000 --white alphabeta --black random --time-limit 0.05 --workers 8 --out games.txt
+
+``--archive`` also appends the games to a compact binary archive, see archive.py.
+``--stats`` counts and times the game's hot paths (see instrument.py) and
+``--profile games.prof`` plays in one process under cProfile.
+"""
+
+import argparse
+import cProfile
+import functools
+import random
+import sys
+import time
+from typing import NamedTuple
+
+from MadMansMorris import Game, ComputerPlayer, BoardSpace
+import archive
+import instrument
+import mcts
+import search
+
+# name on the command line -> player class
+PLAYER_TYPES = {
+    "random": ComputerPlayer,
+    "alphabeta": search.AlphaBetaPlayer,
+    "mcts": mcts.MCTSPlayer,
+}
+
+# games longer than this many actions are scored as a draw
+DEFAULT_MAX_PLIES = 400
+
+
+class PlayerSpec(NamedTuple):
+    """A player type by name plus the keyword arguments for its constructor.
+
+    Specs are plain tuples so they can be sent to worker processes.
+    """
+    name: str
+    options: tuple = ()
+
+    def factory(self):
+        player_type = PLAYER_TYPES[self.name]
+        if not self.options:
+            return player_type
+        return functools.partial(player_type, **dict(self.options))
+
+
+class GameResult(NamedTuple):
+    winner: str  # "WHITE", "BLACK" or "DRAW"
+    plies: int
+    starting_player: str
+    moves: tuple  # str(MoveRecord) for every action
+    record: bytes = b""  # the moves encoded for an archive, see archive.encode_records
+    stats: dict = None  # Game.stats() when played with instrumentation
+
+
+def _color_name(player) -> str:
+    return "WHITE" if player.piece_type == BoardSpace.WHITE_SPACE else "BLACK"
+
+
+def play_game(white: PlayerSpec, black: PlayerSpec, max_plies: int = DEFAULT_MAX_PLIES, seed: int = None,
+              stats: bool = False) -> GameResult:
+    if seed is not None:
+        random.seed(seed)
+    if stats:
+        instrument.enable()
+
+    game = Game(white_player_human=False, black_player_human=False,
+                white_computer=white.factory(), black_computer=black.factory(), autostart=False)
+    starting_player = _color_name(game.current_player)
+
+    try:
+        while game.game_state != Game.GAME_OVER and len(game.move_history) < max_plies:
+            game.current_player.take_turn()
+    finally:
+        game.white_player.close()
+        game.black_player.close()
+
+    winner = _color_name(game.winner) if game.game_state == Game.GAME_OVER else "DRAW"
+    return GameResult(winner, len(game.move_history), starting_player, tuple(str(move) for move in game.move_history),
+                      archive.encode_records(game.move_history), game.stats() if stats else None)
+
+
+def _play_game_task(args) -> GameResult:
+    return play_game(*args)
+
+
+class Summary(NamedTuple):
+    games: int
+    white_wins: int
+    black_wins: int
+    draws: int
+    average_plies: float
+    seconds: float
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        games = self.games or 1
+        return (f"games: {self.games}\n"
+                f"white wins: {self.white_wins} ({100.0 * self.white_wins / games:.1f}%)\n"
+                f"black wins: {self.black_wins} ({100.0 * self.black_wins / games:.1f}%)\n"
+                f"draws: {self.draws} ({100.0 * self.draws / games:.1f}%)\n"
+                f"average game length: {self.average_plies:.1f} plies\n"
+                f"games per second: {self.games_per_second:.2f}")
+
+
+def run_games(games: int, white: PlayerSpec, black: PlayerSpec, workers: int = 1,
+              max_plies: int = DEFAULT_MAX_PLIES, seed: int = None, on_result=None, stats: bool = False) -> Summary:
+    """Play games and return a Summary, passing each GameResult to on_result as it arrives.
+
+    With a seed every game gets its own derived seed, so a run can be repeated
+    exactly whatever the number of workers. With stats the games are played
+    with instrumentation on and each result carries its Game.stats().
+    """
+    seeds = random.Random(seed).sample(range(1 << 30), games) if seed is not None else [None] * games
+    tasks = [(white, black, max_plies, game_seed, stats) for game_seed in seeds]
+
+    counts = {"WHITE": 0, "BLACK": 0, "DRAW": 0}
+    total_plies = 0
+    start = time.perf_counter()
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_play_game_task, tasks, chunksize=max(1, games // (workers * 8)))
+    else:
+        executor = None
+        results = map(_play_game_task, tasks)
+
+    try:
+        for result in results:
+            counts[result.winner] += 1
+            total_plies += result.plies
+            if on_result is not None:
+                on_result(result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    seconds = time.perf_counter() - start
+    return Summary(games, counts["WHITE"], counts["BLACK"], counts["DRAW"],
+                   total_plies / games if games else 0.0, seconds)
+
+
+def write_result(stream, number: int, result: GameResult):
+    stream.write(f"GAME {number} {result.winner} {result.plies} {result.starting_player}\n")
+    for move in result.moves:
+        stream.write(move + "\n")
+
+
+_COLORS = {"WHITE": BoardSpace.WHITE_SPACE, "BLACK": BoardSpace.BLACK_SPACE, "DRAW": archive.DRAW}
+
+
+def archive_result(writer: archive.ArchiveWriter, result: GameResult):
+    writer.write(_COLORS[result.starting_player], _COLORS[result.winner], result.record)
+
+
+def _player_spec(args, color: str) -> PlayerSpec:
+    name = getattr(args, color)
+    if name == "mcts":
+        return PlayerSpec(name, (("time_limit", args.time_limit), ("max_playouts", args.playouts)))
+    if name != "alphabeta":
+        return PlayerSpec(name)
+    options = (("time_limit", args.time_limit), ("max_depth", args.max_depth))
+    if args.search_workers > 1:
+        options += (("workers", args.search_workers),)
+    if args.tablebase:
+        options += (("tablebase", args.tablebase),)
+    if args.book:
+        options += (("book", args.book),)
+    return PlayerSpec(name, options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Mad Man's Morris games between computer players.")
+    parser.add_argument("--games", "-n", type=int, default=100)
+    parser.add_argument("--white", choices=sorted(PLAYER_TYPES), default="random")
+    parser.add_argument("--black", choices=sorted(PLAYER_TYPES), default="random")
+    parser.add_argument("--workers", "-j", type=int, default=1)
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument("--time-limit", type=float, default=0.1, help="seconds per move for search players")
+    parser.add_argument("--max-depth", type=int, default=None, help="depth cap for search players")
+    parser.add_argument("--playouts", type=int, default=None, help="playout cap for MCTS players")
+    parser.add_argument("--search-workers", type=int, default=1,
+                        help="processes each alpha-beta player searches with")
+    parser.add_argument("--tablebase", help="endgame tablebase file for search players")
+    parser.add_argument("--book", help="opening book file for search players")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", help="file to write the move records to")
+    parser.add_argument("--archive", help="binary game archive to append the games to")
+    parser.add_argument("--stats", type=float, nargs="?", const=10.0, metavar="SECONDS",
+                        help="count and time the game's hot paths, printing the totals every SECONDS")
+    parser.add_argument("--profile", metavar="PATH", help="play in this process under cProfile and write the profile")
+    args = parser.parse_args(argv)
+
+    white = _player_spec(args, "white")
+    black = _player_spec(args, "black")
+
+    out = open(args.out, "w") if args.out else None
+    writer = archive.ArchiveWriter(args.archive) if args.archive else None
+    dumper = instrument.Dumper(args.stats) if args.stats is not None else None
+    written = 0
+
+    def on_result(result):
+        nonlocal written
+        written += 1
+        if out is not None:
+            write_result(out, written, result)
+        if writer is not None:
+            archive_result(writer, result)
+        if dumper is not None:
+            dumper.add(result.stats)
+
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        summary = run_games(args.games, white, black, 1 if profiler else args.workers, args.max_plies, args.seed,
+                            on_result if out or writer or dumper else None, dumper is not None)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if out is not None:
+            out.close()
+        if writer is not None:
+            writer.close()
+
+    if dumper is not None:
+        dumper.dump()
+    print(summary)
+    return summary
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+"""Board symmetries and canonical positions.
+
+The board has 16 symmetries: the eight rotations and reflections of the
+square, each with or without swapping the inner and outer rings. They all
+map points to points, mill lines to mill lines and neighbours to
+neighbours, so symmetric positions have the same value and symmetric best
+moves.
+
+Every symmetry is stored as a permutation of the 24 points and as lookup
+tables over the three bytes of a stone mask, so transforming a mask costs
+three lookups. ``canonical`` picks one representative of the 16 images of a
+position and returns the symmetry that produced it; applying ``inverse`` of
+that symmetry maps moves found for the representative back onto the board
+the caller holds.
+"""
+
+from bitboard import GameState, SPACE_NAMES, NUM_SPACES
+
+SYMMETRY_COUNT = 16
+IDENTITY = 0
+
+_CENTER = 3
+
+
+def _coordinates(name: str):
+    return ord(name[0]) - ord("A") - _CENTER, int(name[1]) - 1 - _CENTER
+
+
+def _square_transforms():
+    # the dihedral group of the square acting on offsets from the centre
+    return (
+        lambda x, y: (x, y), lambda x, y: (-y, x), lambda x, y: (-x, -y), lambda x, y: (y, -x),
+        lambda x, y: (-x, y), lambda x, y: (x, -y), lambda x, y: (y, x), lambda x, y: (-y, -x),
+    )
+
+
+def _swap_rings(x: int, y: int):
+    # ring 1 is the inner square and ring 3 the outer one, ring 2 stays put
+    ring = max(abs(x), abs(y))
+    scale = 4 - ring
+    return x // ring * scale, y // ring * scale
+
+
+def _build_permutations():
+    index = {_coordinates(name): point for point, name in enumerate(SPACE_NAMES)}
+    permutations = []
+    for swap in (False, True):
+        for square in _square_transforms():
+            permutation = []
+            for name in SPACE_NAMES:
+                x, y = _coordinates(name)
+                if swap:
+                    x, y = _swap_rings(x, y)
+                permutation.append(index[square(x, y)])
+            permutations.append(tuple(permutation))
+    return tuple(permutations)
+
+
+# PERMUTATIONS[symmetry][point] is the point that point is mapped onto
+PERMUTATIONS = _build_permutations()
+
+INVERSE = tuple(PERMUTATIONS.index(tuple(sorted(range(NUM_SPACES), key=permutation.__getitem__)))
+                for permutation in PERMUTATIONS)
+
+
+def _byte_tables(permutation):
+    tables = []
+    for shift in (0, 8, 16):
+        # each value is the image of its lowest set bit joined with the image of the rest
+        table = [0] * 256
+        for byte in range(1, 256):
+            low = byte & -byte
+            point = shift + low.bit_length() - 1
+            table[byte] = table[byte ^ low] | (1 << permutation[point] if point < NUM_SPACES else 0)
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+# MASK_TABLES[symmetry][byte][value]: the image of the stones in that byte of a mask
+MASK_TABLES = tuple(_byte_tables(permutation) for permutation in PERMUTATIONS)
+
+
+def inverse(symmetry: int) -> int:
+    return INVERSE[symmetry]
+
+
+def transform_point(point: int, symmetry: int) -> int:
+    return PERMUTATIONS[symmetry][point]
+
+
+def transform_mask(mask: int, symmetry: int) -> int:
+    low, middle, high = MASK_TABLES[symmetry]
+    return low[mask & 0xFF] | middle[mask >> 8 & 0xFF] | high[mask >> 16]
+
+
+def transform_action(action, symmetry: int):
+    move_type, start, end = action
+    permutation = PERMUTATIONS[symmetry]
+    return move_type, permutation[start], (None if end is None else permutation[end])
+
+
+def canonical(white: int, black: int):
+    """``(white, black, symmetry)`` for the image of the stones with the smallest masks.
+
+    The image is compared on ``(white, black)``; of symmetries giving the same
+    image, the lowest numbered one is returned.
+    """
+    best_white, best_black, best = white, black, IDENTITY
+    for symmetry in range(1, SYMMETRY_COUNT):
+        low, middle, high = MASK_TABLES[symmetry]
+        image = low[white & 0xFF] | middle[white >> 8 & 0xFF] | high[white >> 16]
+        if image > best_white:
+            continue
+        other = low[black & 0xFF] | middle[black >> 8 & 0xFF] | high[black >> 16]
+        if image < best_white or other < best_black:
+            best_white, best_black, best = image, other, symmetry
+    return best_white, best_black, best
+
+
+def transform_state(state: GameState, symmetry: int) -> GameState:
+    return state._replace(white=transform_mask(state.white, symmetry), black=transform_mask(state.black, symmetry))
+
+
+def canonical_state(state: GameState):
+    """``(GameState, symmetry)``: the canonical image of state and the symmetry mapping state onto it."""
+    white, black, symmetry = canonical(state.white, state.black)
+    return state._replace(white=white, black=black), symmetry
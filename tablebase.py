@@ -0,0 +1,439 @@
+"""Endgame tablebase for the move phase, built by retrograde analysis.
+
+A tablebase covers every position in which both decks are empty and the side
+to move has ``a`` stones on the board against the opponent's ``b``, for all
+``3 <= a, b <= max_stones``. Positions are always seen from the side to
+move, so (own stones, opponent stones) is all that is stored. A mill and the
+removal that follows it count as a single move, which keeps every indexed
+position in the MOVE_PIECE state.
+
+Each position takes one byte: 0 means neither side can force a win (a draw
+under perfect play), anything else is the distance to the end of the game in
+moves plus one. Wins are always an odd distance away and losses an even one,
+so the distance alone tells which side wins.
+
+Build a file from the command line, then load it with Tablebase::
+
+    python tablebase.py --max-stones 4 --out endgame.tb
+"""
+
+import argparse
+import itertools
+import mmap
+import struct
+import sys
+import time
+from array import array
+from collections import defaultdict
+
+import bitboard
+from bitboard import (NUM_SPACES, FULL_BOARD, NEIGHBOR_MASKS, POINT_MILLS, MILL_MASKS, GAME_OVER,
+                      MOVE_PIECE, REMOVE_PIECE, iter_bits, milled_mask, opponent)
+
+WIN = 1
+LOSS = -1
+DRAW = 0
+
+MAGIC = b"MMTB"
+VERSION = 1
+_HEADER = struct.Struct("<4sHBB")
+_CLASS_ENTRY = struct.Struct("<BBQQ")
+
+MIN_STONES = 3
+MAX_DISTANCE = 254
+
+# counter value for positions that can reach a win or a draw, so never lose
+_NEVER_LOST = 255
+
+
+def _combinations(count: int, points: int) -> list:
+    """Every mask with count bits set among the lowest points bits, in rank order."""
+    return [sum(1 << p for p in combo) for combo in itertools.combinations(range(points), count)]
+
+
+class _Indexer:
+    """Ranks (own, opponent) mask pairs of one stone-count class.
+
+    The opponent mask is ranked among all placements of ``b`` stones on the
+    board and the own mask among the placements of ``a`` stones on the points
+    the opponent leaves free. Every predecessor of a position shares the
+    opponent mask of its successor's own stones, so retraction only has to
+    squeeze one mask per position.
+    """
+
+    def __init__(self, a: int, b: int):
+        self.a = a
+        self.b = b
+        self.other_masks = _combinations(b, NUM_SPACES)
+        self.other_rank = {mask: rank for rank, mask in enumerate(self.other_masks)}
+        self.own_masks = _combinations(a, NUM_SPACES - b)
+        self.own_rank = {mask: rank for rank, mask in enumerate(self.own_masks)}
+        self.stride = len(self.own_masks)
+        self.size = len(self.other_masks) * self.stride
+        self._squeeze = {}
+
+    def squeeze_map(self, other: int) -> tuple:
+        """Point -> bit of the own mask once the opponent's points are squeezed out."""
+        squeeze = self._squeeze.get(other)
+        if squeeze is None:
+            squeeze = []
+            position = 0
+            for point in range(NUM_SPACES):
+                if other & (1 << point):
+                    squeeze.append(0)
+                else:
+                    squeeze.append(1 << position)
+                    position += 1
+            squeeze = self._squeeze[other] = tuple(squeeze)
+        return squeeze
+
+    def index(self, own: int, other: int) -> int:
+        squeeze = self.squeeze_map(other)
+        compressed = 0
+        for point in iter_bits(own):
+            compressed |= squeeze[point]
+        return self.other_rank[other] * self.stride + self.own_rank[compressed]
+
+    def position(self, index: int):
+        other = self.other_masks[index // self.stride]
+        free = [point for point in range(NUM_SPACES) if not other & (1 << point)]
+        own = 0
+        for position in iter_bits(self.own_masks[index % self.stride]):
+            own |= 1 << free[position]
+        return own, other
+
+    def positions(self):
+        """Yield (index, own, opponent) for every position of the class, in index order."""
+        index = 0
+        for other in self.other_masks:
+            free = [1 << point for point in range(NUM_SPACES) if not other & (1 << point)]
+            for compressed in self.own_masks:
+                own = 0
+                for position in iter_bits(compressed):
+                    own |= free[position]
+                yield index, own, other
+                index += 1
+
+
+def _forms_mill(stones: int, point: int) -> bool:
+    first, second = POINT_MILLS[point]
+    return stones & first == first or stones & second == second
+
+
+def _decode(value: int):
+    if value == 0:
+        return DRAW, None
+    distance = value - 1
+    return (WIN if distance % 2 else LOSS), distance
+
+
+class _Solver:
+    def __init__(self, progress=None):
+        self.indexers = {}
+        self.tables = {}
+        self.progress = progress
+
+    def solve_pair(self, a: int, b: int):
+        """Solve class (a, b) and its mirror (b, a), which only reach each other and smaller classes."""
+        classes = [(a, b)] if a == b else [(a, b), (b, a)]
+        counters = {}
+        floors = {}
+        # distance -> class -> indexes of positions that settle at that distance
+        buckets = defaultdict(lambda: {cls: array("l") for cls in classes})
+
+        for cls in classes:
+            indexer = _Indexer(*cls)
+            self.indexers[cls] = indexer
+            self.tables[cls] = bytearray(indexer.size)
+            counters[cls] = bytearray(indexer.size)
+            floors[cls] = bytearray(indexer.size)
+
+        for cls in classes:
+            self._count_moves(cls, counters[cls], floors[cls], buckets)
+
+        # backward pass: settle positions in order of distance and walk back to their predecessors
+        distance = 0
+        while buckets:
+            if distance > MAX_DISTANCE:
+                raise ValueError(f"distance to result exceeds {MAX_DISTANCE} moves")
+
+            settling = buckets.pop(distance, None)
+            if settling is not None:
+                for cls, indexes in settling.items():
+                    table = self.tables[cls]
+                    for index in indexes:
+                        if not table[index]:
+                            table[index] = distance + 1
+                            self._retract(cls, index, distance, counters, floors, buckets)
+
+                if self.progress is not None:
+                    self.progress(f"  {a}v{b}: distance {distance} settled")
+            distance += 1
+
+    def _count_moves(self, cls, counter, floor, buckets):
+        """Count each position's quiet moves and resolve its captures against smaller classes."""
+        own_count, other_count = cls
+        flying = own_count == MIN_STONES
+        capture_wins = other_count == MIN_STONES
+
+        for index, own, other in self.indexers[cls].positions():
+            empty = FULL_BOARD & ~(own | other)
+
+            if flying:
+                moves = own_count * empty.bit_count()
+            else:
+                moves = 0
+                for start in iter_bits(own):
+                    moves += (NEIGHBOR_MASKS[start] & empty).bit_count()
+
+            # the stones that can close a mill on each empty point
+            closers = {}
+            for mill in MILL_MASKS:
+                if (mill & own).bit_count() == 2 and mill & empty:
+                    end = (mill & empty).bit_length() - 1
+                    movers = own & ~mill
+                    if not flying:
+                        movers &= NEIGHBOR_MASKS[end]
+                    if movers:
+                        closers[end] = closers.get(end, 0) | movers
+
+            if not closers:
+                if moves:
+                    counter[index] = moves
+                else:
+                    # no moves at all: the side to move is blocked and has lost
+                    buckets[0][cls].append(index)
+                continue
+
+            if capture_wins:
+                # the opponent drops to two stones
+                counter[index] = _NEVER_LOST
+                buckets[1][cls].append(index)
+                continue
+
+            best_win = None
+            worst_loss = 0
+            can_draw = False
+            removable = other & ~milled_mask(other) or other
+            child_cls = (other_count - 1, own_count)
+            child_indexer = self.indexers[child_cls]
+            child_table = self.tables[child_cls]
+            captures = 0
+
+            for end, movers in closers.items():
+                for start in iter_bits(movers):
+                    captures += 1
+                    moved = own ^ (1 << start) ^ (1 << end)
+                    for taken in iter_bits(removable):
+                        value = child_table[child_indexer.index(other & ~(1 << taken), moved)]
+                        if value == 0:
+                            can_draw = True
+                        elif value % 2:
+                            # the child's distance is even: the opponent loses
+                            if best_win is None or value < best_win:
+                                best_win = value
+                        elif value > worst_loss:
+                            worst_loss = value
+
+            quiet = moves - captures
+            if best_win is not None:
+                counter[index] = _NEVER_LOST
+                buckets[best_win][cls].append(index)
+            elif can_draw:
+                counter[index] = _NEVER_LOST
+            elif quiet == 0:
+                buckets[worst_loss][cls].append(index)
+            else:
+                counter[index] = quiet
+                floor[index] = worst_loss
+
+    def _retract(self, cls, index, distance, counters, floors, buckets):
+        own_count, other_count = cls
+        own, other = self.indexers[cls].position(index)
+
+        # the previous mover is the current opponent, who moved a stone onto one of its points
+        parent_cls = (other_count, own_count)
+        parent_indexer = self.indexers[parent_cls]
+        parent_table = self.tables[parent_cls]
+        counter = counters[parent_cls]
+        floor = floors[parent_cls]
+        empty = FULL_BOARD & ~(own | other)
+        flying = other_count == MIN_STONES
+        child_lost = distance % 2 == 0
+        parent_distance = distance + 1
+
+        squeeze = parent_indexer.squeeze_map(own)
+        row = parent_indexer.other_rank[own] * parent_indexer.stride
+        rank = parent_indexer.own_rank
+
+        for end in iter_bits(other):
+            # a move that closed a mill would have been followed by a removal
+            if _forms_mill(other, end):
+                continue
+            sources = empty if flying else NEIGHBOR_MASKS[end] & empty
+            base = 0
+            for point in iter_bits(other & ~(1 << end)):
+                base |= squeeze[point]
+
+            for start in iter_bits(sources):
+                parent = row + rank[base | squeeze[start]]
+                if parent_table[parent]:
+                    continue
+
+                if child_lost:
+                    buckets[parent_distance][parent_cls].append(parent)
+                elif counter[parent] != _NEVER_LOST:
+                    counter[parent] -= 1
+                    if counter[parent] == 0:
+                        buckets[max(floor[parent], parent_distance)][parent_cls].append(parent)
+
+
+def class_order(max_stones: int) -> list:
+    """Classes as (a, b) pairs, in an order where every capture lands on a class built earlier."""
+    pairs = []
+    for total in range(2 * MIN_STONES, 2 * max_stones + 1):
+        for a in range(MIN_STONES, max_stones + 1):
+            b = total - a
+            if a <= b <= max_stones:
+                pairs.append((a, b))
+    return pairs
+
+
+def build(max_stones: int, path: str, progress=None):
+    """Solve every class up to max_stones a side and write the tablebase file to path."""
+    if max_stones < MIN_STONES or max_stones > bitboard.PIECES_PER_PLAYER:
+        raise ValueError(f"max_stones must be between {MIN_STONES} and {bitboard.PIECES_PER_PLAYER}")
+
+    solver = _Solver(progress)
+    for a, b in class_order(max_stones):
+        if progress is not None:
+            progress(f"solving {a}v{b}")
+        solver.solve_pair(a, b)
+
+    write(path, max_stones, solver.tables)
+
+
+def write(path: str, max_stones: int, tables: dict):
+    """Write solved tables, keyed by (a, b) class, as a tablebase file."""
+    classes = sorted(tables)
+    offset = _HEADER.size + _CLASS_ENTRY.size * len(classes)
+    with open(path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, VERSION, max_stones, len(classes)))
+        for cls in classes:
+            size = len(tables[cls])
+            out.write(_CLASS_ENTRY.pack(cls[0], cls[1], offset, size))
+            offset += size
+        for cls in classes:
+            out.write(tables[cls])
+
+
+class Tablebase:
+    """A tablebase file mapped into memory for probing.
+
+    ``probe`` returns ``(result, distance)`` for the side to move, where
+    result is WIN, LOSS or DRAW and distance is None for draws, or None when
+    the position is not covered.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.max_stones, count = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+
+        self.classes = {}
+        for entry in range(count):
+            a, b, offset, size = _CLASS_ENTRY.unpack_from(self.data, _HEADER.size + entry * _CLASS_ENTRY.size)
+            self.classes[(a, b)] = (offset, _Indexer(a, b))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def covers(self, engine: bitboard.Bitboard) -> bool:
+        side = engine.side
+        return (engine.state == MOVE_PIECE and engine.pieces_in_deck[side] == 0
+                and engine.pieces_in_deck[opponent(side)] == 0
+                and (engine.pieces_on_board[side], engine.pieces_on_board[opponent(side)]) in self.classes)
+
+    def probe(self, engine: bitboard.Bitboard):
+        if engine.state == GAME_OVER:
+            return (WIN if engine.winner == engine.side else LOSS), 0
+        if not self.covers(engine):
+            return None
+
+        side = engine.side
+        other = opponent(side)
+        offset, indexer = self.classes[(engine.pieces_on_board[side], engine.pieces_on_board[other])]
+        return _decode(self.data[offset + indexer.index(engine.stones[side], engine.stones[other])])
+
+    def _outcome(self, engine: bitboard.Bitboard, side: int):
+        # the result of the current position for side, who may still owe a removal
+        if engine.state == REMOVE_PIECE and engine.side == side:
+            best = None
+            for removal in engine.legal_moves():
+                engine.make_move(removal)
+                outcome = self._outcome(engine, side)
+                engine.unmake_move()
+                if outcome is None:
+                    return None
+                if best is None or _rank(outcome) > _rank(best):
+                    best = outcome
+            return best
+
+        outcome = self.probe(engine)
+        if outcome is None or engine.side == side:
+            return outcome
+        return _flip(outcome)
+
+    def best_move(self, engine: bitboard.Bitboard):
+        """The perfect-play action for the side to move, or None when the table cannot tell."""
+        if engine.state not in (MOVE_PIECE, REMOVE_PIECE) or engine.pieces_in_deck[engine.side]:
+            return None
+
+        side = engine.side
+        best = None
+        best_outcome = None
+        for action in engine.legal_moves():
+            engine.make_move(action)
+            outcome = self._outcome(engine, side)
+            engine.unmake_move()
+            if outcome is None:
+                return None
+            if best_outcome is None or _rank(outcome) > _rank(best_outcome):
+                best = action
+                best_outcome = outcome
+        return best
+
+
+def _flip(outcome):
+    result, distance = outcome
+    return -result, (distance + 1 if distance is not None else None)
+
+
+def _rank(outcome):
+    # quick wins first, then draws, then the slowest losses
+    result, distance = outcome
+    if result == WIN:
+        return 1000 - distance
+    if result == LOSS:
+        return -1000 + distance
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Mad Man's Morris endgame tablebase.")
+    parser.add_argument("--max-stones", type=int, default=3, help="largest number of stones per side")
+    parser.add_argument("--out", default="endgame.tb")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    build(args.max_stones, args.out, progress=print)
+    print(f"wrote {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,6 +1,30 @@
 import unittest
 import sys
+import random
 from MadMansMorris import *
+import bitboard
+import functools
+import search
+import transposition
+import simulate
+import tablebase
+import openingbook
+import mcts
+import lockstep
+import numpy as np
+import tempfile
+import os
+import threading
+import time
+import asyncio
+import server
+import archive
+import symmetry
+import benchmark
+import json
+import instrument
+import io
+import subprocess
 
 class NewGameTests(unittest.TestCase):
     def setUp(self):
@@ -486,6 +510,1702 @@ class TestWhitePlayerHumanBlackPlayerComputer(unittest.TestCase):
         self.assertEqual(self.game.board.get_space(last_move.start_space), self.computer_player.piece_type)
         self.assertEqual(last_move.move_type, "PLACE")
 
+
+class ReferenceRules:
+    """The rules of the game written out over point names, independent of bitboard's masks and tables.
+
+    Actions are ``(move_type, start, end)`` with point names in place of indexes.
+    """
+
+    MILLS = (("A7", "D7", "G7"), ("B6", "D6", "F6"), ("C5", "D5", "E5"), ("A4", "B4", "C4"),
+             ("E4", "F4", "G4"), ("C3", "D3", "E3"), ("B2", "D2", "F2"), ("A1", "D1", "G1"),
+             ("A1", "A4", "A7"), ("B2", "B4", "B6"), ("C3", "C4", "C5"), ("D1", "D2", "D3"),
+             ("D5", "D6", "D7"), ("E3", "E4", "E5"), ("F2", "F4", "F6"), ("G1", "G4", "G7"))
+
+    def __init__(self, side, board=None, decks=(9, 9)):
+        # points next to each other on a line are the only neighbours
+        self.neighbors = {name: set() for mill in self.MILLS for name in mill}
+        for first, middle, last in self.MILLS:
+            self.neighbors[first].add(middle)
+            self.neighbors[middle] |= {first, last}
+            self.neighbors[last].add(middle)
+
+        self.board = {name: BoardSpace.EMPTY_SPACE for name in self.neighbors}
+        self.board.update(board or {})
+        self.decks = {BoardSpace.WHITE_SPACE: decks[0], BoardSpace.BLACK_SPACE: decks[1]}
+        self.side = side
+        self.state = Game.PLACE_PIECE
+        self.winner = None
+
+    @staticmethod
+    def named(action):
+        move_type, start, end = action
+        return move_type, bitboard.SPACE_NAMES[start], bitboard.SPACE_NAMES[end] if end is not None else None
+
+    def other(self, side):
+        return BoardSpace.BLACK_SPACE if side == BoardSpace.WHITE_SPACE else BoardSpace.WHITE_SPACE
+
+    def stones(self, side):
+        return [name for name, state in self.board.items() if state == side]
+
+    def in_mill(self, name):
+        side = self.board[name]
+        return any(name in mill and all(self.board[point] == side for point in mill) for mill in self.MILLS)
+
+    def legal_moves(self):
+        empty = self.stones(BoardSpace.EMPTY_SPACE)
+        if self.state == Game.PLACE_PIECE:
+            return [("PLACE", name, None) for name in empty]
+        if self.state == Game.REMOVE_PIECE:
+            stones = self.stones(self.other(self.side))
+            # stones in a mill are only taken when every stone is in one
+            loose = [name for name in stones if not self.in_mill(name)]
+            return [("REMOVE", name, None) for name in loose or stones]
+
+        own = self.stones(self.side)
+        moves = []
+        for start in own:
+            targets = empty if len(own) == 3 else [name for name in empty if name in self.neighbors[start]]
+            moves.extend(("MOVE", start, end) for end in targets)
+        return moves
+
+    def play(self, action):
+        move_type, start, end = action
+        if move_type == "REMOVE":
+            self.board[start] = BoardSpace.EMPTY_SPACE
+            self.end_turn()
+            return
+
+        if move_type == "PLACE":
+            self.decks[self.side] -= 1
+            point = start
+        else:
+            self.board[start] = BoardSpace.EMPTY_SPACE
+            point = end
+        self.board[point] = self.side
+
+        if self.in_mill(point) and self.stones(self.other(self.side)):
+            self.state = Game.REMOVE_PIECE
+        else:
+            self.end_turn()
+
+    def end_turn(self):
+        previous = self.side
+        self.side = self.other(previous)
+        if self.decks[self.side] + len(self.stones(self.side)) < 3:
+            self.state = Game.GAME_OVER
+        elif self.decks[self.side]:
+            self.state = Game.PLACE_PIECE
+        else:
+            self.state = Game.MOVE_PIECE
+            # a player who cannot move loses
+            if not self.legal_moves():
+                self.state = Game.GAME_OVER
+        if self.state == Game.GAME_OVER:
+            self.winner = previous
+
+
+class BitboardEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.game = Game()
+
+    def test_board_is_view_over_engine(self):
+        self.game.place_piece("D2")
+        color = self.game.next_player.piece_type
+
+        index = bitboard.SPACE_INDEX["D2"]
+        self.assertEqual(self.game.engine.stones[color], 1 << index)
+        self.assertEqual(self.game.board.spaces["D2"].state, color)
+
+        self.game.board.set_space_value("D2", BoardSpace.EMPTY_SPACE)
+        self.assertEqual(self.game.engine.white | self.game.engine.black, 0)
+
+    def test_engine_matches_game_rules(self):
+        rng = random.Random(7)
+        flying = removals = 0
+
+        for _ in range(20):
+            game = Game(autostart=False)
+            rules = ReferenceRules(game.current_player.piece_type)
+            for _ in range(400):
+                if rules.state == Game.GAME_OVER:
+                    break
+                legal = rules.legal_moves()
+                self.assertEqual(set(legal), set(rules.named(action) for action in game.legal_moves()))
+
+                move_type, start, end = rng.choice(legal)
+                if move_type == "PLACE":
+                    game.place_piece(start)
+                elif move_type == "REMOVE":
+                    game.remove_piece(start)
+                    removals += 1
+                else:
+                    game.move_piece(start, end)
+                    flying += end not in rules.neighbors[start]
+                rules.play((move_type, start, end))
+                self.assert_same_position(game, rules)
+
+        # the random games close mills and reach the flying endgame
+        self.assertGreater(removals, 0)
+        self.assertGreater(flying, 0)
+
+    def test_engine_matches_game_rules_when_blocked(self):
+        white = ("D2", "G4", "A7", "B4", "F6")
+        black = ("A1", "D1", "G1", "A4")
+        state = bitboard.GameState(sum(1 << bitboard.SPACE_INDEX[name] for name in white),
+                                   sum(1 << bitboard.SPACE_INDEX[name] for name in black),
+                                   0, 0, len(white), len(black), bitboard.WHITE, Game.MOVE_PIECE, bitboard.EMPTY)
+        game = Game.from_state(state, autostart=False)
+        rules = ReferenceRules(bitboard.WHITE, {name: BoardSpace.WHITE_SPACE for name in white} |
+                               {name: BoardSpace.BLACK_SPACE for name in black}, decks=(0, 0))
+        rules.state = Game.MOVE_PIECE
+
+        game.move_piece("F6", "F4")
+        rules.play(("MOVE", "F6", "F4"))
+
+        self.assert_same_position(game, rules)
+        self.assertEqual(rules.winner, BoardSpace.WHITE_SPACE)
+
+    def assert_same_position(self, game, rules):
+        for name, state in rules.board.items():
+            self.assertEqual(game.board.get_space(name), state, name)
+        self.assertEqual(game.game_state, rules.state)
+        if rules.state == Game.GAME_OVER:
+            self.assertEqual(game.winner.piece_type, rules.winner)
+        else:
+            self.assertEqual(game.current_player.piece_type, rules.side)
+
+    def test_point_mill_tables(self):
+        for index in range(bitboard.NUM_SPACES):
+            self.assertEqual(len(bitboard.POINT_MILLS[index]), 2)
+            for mill in bitboard.POINT_MILLS[index]:
+                self.assertTrue(mill & (1 << index))
+                self.assertEqual(bin(mill).count("1"), 3)
+
+    def test_pieces_not_in_mill_cache(self):
+        engine = bitboard.Bitboard()
+        for name in ("A1", "B2", "D1", "D2", "G1"):
+            engine.place_piece(bitboard.SPACE_INDEX[name])
+
+        mill = bitboard.MILL_MASKS[0]
+        self.assertEqual(engine.state, bitboard.REMOVE_PIECE)
+        self.assertEqual(engine.milled[bitboard.WHITE], mill)
+        self.assertEqual(engine.pieces_not_in_mill(bitboard.WHITE), 0)
+        self.assertEqual(engine.pieces_not_in_mill(bitboard.BLACK), engine.black)
+
+        # breaking the mill from outside clears it for all three stones
+        engine.set(bitboard.SPACE_INDEX["D1"], bitboard.EMPTY)
+        self.assertEqual(engine.milled[bitboard.WHITE], 0)
+
+    def test_copy_is_independent(self):
+        engine = bitboard.Bitboard()
+        engine.place_piece(0)
+
+        other = engine.copy()
+        other.place_piece(1)
+
+        self.assertEqual(engine.black, 0)
+        self.assertEqual(other.black, 1 << 1)
+        self.assertEqual(engine.pieces_in_deck, [0, 8, 9])
+
+
+class LegalMoveTests(unittest.TestCase):
+    def all_actions(self):
+        for start in range(bitboard.NUM_SPACES):
+            yield (bitboard.PLACE, start, None)
+            yield (bitboard.REMOVE, start, None)
+            for end in range(bitboard.NUM_SPACES):
+                yield (bitboard.MOVE, start, end)
+
+    def apply(self, engine, action):
+        move_type, start, end = action
+        if move_type == bitboard.PLACE:
+            return engine.place_piece(start)
+        if move_type == bitboard.MOVE:
+            return engine.move_piece(start, end)
+        return engine.remove_piece(start)
+
+    def test_legal_moves_match_brute_force(self):
+        rng = random.Random(3)
+
+        for _ in range(5):
+            engine = bitboard.Bitboard()
+            plies = 0
+            while engine.state != bitboard.GAME_OVER and plies < 150:
+                accepted = set(action for action in self.all_actions() if self.apply(engine.copy(), action))
+                legal = engine.legal_moves()
+
+                self.assertEqual(len(legal), len(set(legal)))
+                self.assertEqual(set(legal), accepted)
+                self.assertEqual(engine.has_legal_move(), len(legal) > 0)
+
+                self.apply(engine, rng.choice(legal))
+                plies += 1
+
+    def test_blocked_player_loses(self):
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        engine.pieces_in_deck = [0, 0, 0]
+        engine.pieces_on_board = [0, 5, 4]
+        engine.state = bitboard.MOVE_PIECE
+        for name in ("D2", "G4", "A7", "B4", "F6"):
+            engine.set(bitboard.SPACE_INDEX[name], bitboard.WHITE)
+        for name in ("A1", "D1", "G1", "A4"):
+            engine.set(bitboard.SPACE_INDEX[name], bitboard.BLACK)
+
+        engine.move_piece(bitboard.SPACE_INDEX["F6"], bitboard.SPACE_INDEX["F4"])
+
+        self.assertEqual(engine.state, bitboard.GAME_OVER)
+        self.assertEqual(engine.winner, bitboard.WHITE)
+
+    def test_computer_player_uses_legal_moves(self):
+        game = Game(white_player_human=False, black_player_human=False, autostart=False)
+        for _ in range(300):
+            if game.game_state == Game.GAME_OVER:
+                break
+            legal = game.legal_moves()
+            accepted = set(action for action in self.all_actions() if self.apply(game.engine.copy(), action))
+            self.assertEqual(set(legal), accepted)
+
+            move = game.current_player.choose_move()
+            self.assertIn(move, legal)
+            played = len(game.move_history)
+            game.play_move(move)
+            self.assertEqual(len(game.move_history), played + 1)
+
+
+class MakeUnmakeTests(unittest.TestCase):
+    def position(self, game):
+        engine = game.engine
+        return (tuple(engine.stones), tuple(engine.milled), tuple(engine.pieces_in_deck),
+                tuple(engine.pieces_on_board), engine.side, engine.state, engine.winner,
+                game.current_player, game.next_player, game.winner)
+
+    def test_unmake_restores_every_position(self):
+        rng = random.Random(11)
+        game = Game()
+
+        positions = []
+        while game.game_state != Game.GAME_OVER and len(positions) < 200:
+            positions.append(self.position(game))
+            self.assertTrue(game.make_move(rng.choice(game.legal_moves())))
+
+        self.assertEqual(game.move_history, [])
+
+        while positions:
+            game.unmake_move()
+            self.assertEqual(self.position(game), positions.pop())
+
+    def test_mill_and_removal_undo_separately(self):
+        game = Game()
+        first = game.current_player
+        for name in ("A1", "B2", "D1", "D2"):
+            game.make_move((bitboard.PLACE, bitboard.SPACE_INDEX[name], None))
+
+        game.make_move((bitboard.PLACE, bitboard.SPACE_INDEX["G1"], None))
+        self.assertEqual(game.game_state, Game.REMOVE_PIECE)
+        self.assertEqual(game.current_player, first)
+
+        game.make_move((bitboard.REMOVE, bitboard.SPACE_INDEX["B2"], None))
+        self.assertEqual(game.current_player, game.black_player if first == game.white_player else game.white_player)
+        self.assertEqual(game.board.get_space("B2"), BoardSpace.EMPTY_SPACE)
+
+        game.unmake_move()
+        self.assertEqual(game.game_state, Game.REMOVE_PIECE)
+        self.assertEqual(game.current_player, first)
+        self.assertNotEqual(game.board.get_space("B2"), BoardSpace.EMPTY_SPACE)
+
+        game.unmake_move()
+        self.assertEqual(game.game_state, Game.PLACE_PIECE)
+        self.assertEqual(game.board.get_space("G1"), BoardSpace.EMPTY_SPACE)
+        self.assertEqual(first.pieces_in_deck, 7)
+
+    def test_illegal_action_is_not_pushed(self):
+        game = Game()
+        self.assertFalse(game.make_move((bitboard.REMOVE, 0, None)))
+        self.assertEqual(game.engine.undo_stack, [])
+
+
+class AlphaBetaSearchTests(unittest.TestCase):
+    def test_search_completes_open_mill(self):
+        engine = bitboard.Bitboard()
+        for name in ("A1", "B6", "D1", "F6"):
+            engine.place_piece(bitboard.SPACE_INDEX[name])
+
+        move = search.AlphaBetaSearch().search(engine, max_depth=2)
+
+        self.assertEqual(move, (bitboard.PLACE, bitboard.SPACE_INDEX["G1"], None))
+
+    def test_search_reports_statistics_and_leaves_engine_untouched(self):
+        rng = random.Random(5)
+        engine = bitboard.Bitboard()
+        for _ in range(10):
+            engine.make_move(rng.choice(engine.legal_moves()))
+        before = (tuple(engine.stones), tuple(engine.pieces_in_deck), engine.side, engine.state, len(engine.undo_stack))
+
+        searcher = search.AlphaBetaSearch()
+        move = searcher.search(engine, time_limit=0.05)
+
+        self.assertIn(move, engine.legal_moves())
+        self.assertGreater(searcher.nodes, 0)
+        self.assertGreaterEqual(searcher.depth, 1)
+        self.assertEqual(searcher.pv[0], move)
+        self.assertEqual((tuple(engine.stones), tuple(engine.pieces_in_deck), engine.side, engine.state,
+                          len(engine.undo_stack)), before)
+
+    def test_alpha_beta_player_plugs_into_game(self):
+        player_type = functools.partial(search.AlphaBetaPlayer, max_depth=1, time_limit=None)
+        game = Game(white_player_human=False, black_player_human=True, white_computer=player_type)
+
+        self.assertIsInstance(game.white_player, search.AlphaBetaPlayer)
+        if game.current_player == game.black_player:
+            game.play_move(game.legal_moves()[0])
+        game.white_player.take_turn()
+
+        self.assertEqual(game.move_history[-1].player, game.white_player)
+        self.assertEqual(game.current_player, game.black_player)
+
+
+class ZobristTests(unittest.TestCase):
+    def full_hash(self, engine):
+        key = bitboard.ZOBRIST_SIDE[engine.side]
+        for color in (bitboard.WHITE, bitboard.BLACK):
+            key ^= bitboard.ZOBRIST_DECK[color][engine.pieces_in_deck[color]]
+            for index in bitboard.iter_bits(engine.stones[color]):
+                key ^= bitboard.ZOBRIST_STONES[color][index]
+        if engine.state == bitboard.REMOVE_PIECE:
+            key ^= bitboard.ZOBRIST_REMOVE
+        return key
+
+    def test_incremental_hash_matches_full_hash(self):
+        rng = random.Random(17)
+        engine = bitboard.Bitboard()
+        keys = []
+        while engine.state != bitboard.GAME_OVER and len(keys) < 200:
+            self.assertEqual(engine.zobrist, self.full_hash(engine))
+            keys.append(engine.zobrist)
+            engine.make_move(rng.choice(engine.legal_moves()))
+
+        while keys:
+            engine.unmake_move()
+            self.assertEqual(engine.zobrist, keys.pop())
+
+    def test_transpositions_share_a_hash(self):
+        first = bitboard.Bitboard()
+        second = bitboard.Bitboard()
+        for index in (0, 5, 9, 20):
+            first.place_piece(index)
+        for index in (9, 20, 0, 5):
+            second.place_piece(index)
+
+        self.assertEqual(first.zobrist, second.zobrist)
+
+        second.set(0, bitboard.EMPTY)
+        self.assertNotEqual(first.zobrist, second.zobrist)
+
+    def test_pending_removal_changes_hash(self):
+        engine = bitboard.Bitboard()
+        for name in ("A1", "B2", "D1", "D2", "G1"):
+            engine.place_piece(bitboard.SPACE_INDEX[name])
+        key = engine.zobrist
+
+        engine.state = bitboard.PLACE_PIECE
+        self.assertNotEqual(engine.zobrist, key)
+
+
+class TranspositionTableTests(unittest.TestCase):
+    def test_size_follows_memory_cap(self):
+        table = transposition.TranspositionTable(max_bytes=transposition.ENTRY_SIZE * 100)
+        self.assertEqual(table.size, 100)
+
+    def test_depth_preferred_replacement(self):
+        table = transposition.TranspositionTable(max_bytes=transposition.ENTRY_SIZE)
+        table.store(1, 6, 10, transposition.EXACT, None)
+        table.store(2, 2, 20, transposition.EXACT, None)
+
+        self.assertIsNotNone(table.probe(1))
+        self.assertIsNone(table.probe(2))
+
+        # entries from an earlier search give way
+        table.new_search()
+        table.store(2, 2, 20, transposition.EXACT, None)
+        self.assertEqual(table.probe(2)[2], 20)
+
+    def test_always_replace(self):
+        table = transposition.TranspositionTable(max_bytes=transposition.ENTRY_SIZE,
+                                                 replacement=transposition.REPLACE_ALWAYS)
+        table.store(1, 6, 10, transposition.EXACT, None)
+        table.store(2, 2, 20, transposition.EXACT, None)
+
+        self.assertIsNone(table.probe(1))
+        self.assertEqual(table.probe(2)[2], 20)
+
+    def test_search_with_table_agrees_with_plain_search(self):
+        rng = random.Random(2)
+        engine = bitboard.Bitboard()
+        for _ in range(20):
+            engine.make_move(rng.choice(engine.legal_moves()))
+
+        plain = search.AlphaBetaSearch()
+        cached = search.AlphaBetaSearch(transposition.TranspositionTable())
+        plain.search(engine, max_depth=4)
+        cached.search(engine, max_depth=4)
+
+        self.assertEqual(plain.score, cached.score)
+        self.assertLessEqual(cached.nodes, plain.nodes)
+
+
+class SimulatorTests(unittest.TestCase):
+    def test_results_add_up(self):
+        summary = simulate.run_games(20, simulate.PlayerSpec("random"), simulate.PlayerSpec("random"), seed=1)
+
+        self.assertEqual(summary.white_wins + summary.black_wins + summary.draws, 20)
+        self.assertGreater(summary.average_plies, 0)
+        self.assertGreater(summary.games_per_second, 0)
+
+    def test_seeded_runs_repeat_across_worker_counts(self):
+        results = {}
+        for workers in (1, 2):
+            played = []
+            simulate.run_games(6, simulate.PlayerSpec("random"), simulate.PlayerSpec("random"),
+                               workers=workers, seed=9, on_result=played.append)
+            results[workers] = played
+
+        self.assertEqual(results[1], results[2])
+
+    def test_command_line_writes_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.txt")
+            summary = simulate.main(["--games", "3", "--black", "alphabeta", "--max-depth", "1",
+                                     "--seed", "4", "--out", path])
+
+            with open(path) as records:
+                headers = [line for line in records if line.startswith("GAME")]
+
+        self.assertEqual(summary.games, 3)
+        self.assertEqual(len(headers), 3)
+
+class TablebaseTests(unittest.TestCase):
+    @staticmethod
+    def endgame(white, black):
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        engine.pieces_in_deck = [0, 0, 0]
+        for name in white:
+            engine.set(bitboard.SPACE_INDEX[name], bitboard.WHITE)
+        for name in black:
+            engine.set(bitboard.SPACE_INDEX[name], bitboard.BLACK)
+        engine.pieces_on_board = [0, len(white), len(black)]
+        engine.state = bitboard.MOVE_PIECE
+        return engine
+
+    def test_index_round_trip(self):
+        indexer = tablebase._Indexer(4, 3)
+        rng = random.Random(3)
+        for index in rng.sample(range(indexer.size), 200):
+            own, other = indexer.position(index)
+            self.assertEqual((own.bit_count(), other.bit_count()), (4, 3))
+            self.assertFalse(own & other)
+            self.assertEqual(indexer.index(own, other), index)
+
+    def test_captures_land_on_earlier_classes(self):
+        order = tablebase.class_order(5)
+        for position, (a, b) in enumerate(order):
+            built = {cls for pair in order[:position] for cls in (pair, pair[::-1])}
+            if b > tablebase.MIN_STONES:
+                self.assertIn((b - 1, a), built)
+
+    def test_probe_reads_mapped_file(self):
+        # white can close the A1-D1-G1 mill and leave black with two stones
+        engine = self.endgame(["A1", "D1", "G4"], ["A7", "D7", "B4"])
+        indexer = tablebase._Indexer(3, 3)
+        table = bytearray(indexer.size)
+        table[indexer.index(engine.white, engine.black)] = 2
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "endgame.tb")
+            tablebase.write(path, 3, {(3, 3): table})
+            probe = tablebase.Tablebase(path)
+            try:
+                self.assertEqual(probe.probe(engine), (tablebase.WIN, 1))
+                engine.pieces_on_board[bitboard.WHITE] = 4
+                self.assertIsNone(probe.probe(engine))
+            finally:
+                probe.close()
+
+    def test_search_trusts_tablebase(self):
+        engine = self.endgame(["A1", "D1", "G4"], ["A7", "D7", "B4"])
+
+        class Losing:
+            def probe(self, position):
+                return tablebase.LOSS, 2
+
+        searcher = search.AlphaBetaSearch(tablebase=Losing())
+        searcher.search(engine, max_depth=2)
+
+        self.assertGreater(searcher.tablebase_hits, 0)
+        self.assertEqual(searcher.score, search.WIN_SCORE - 1 - 2)
+
+@unittest.skipUnless(os.environ.get("MORRIS_SLOW_TESTS"), "solving 3v3 takes about 40 s, set MORRIS_SLOW_TESTS=1")
+class TablebaseSolverTests(unittest.TestCase):
+    # solving 3v3 takes a while, so every test probes the same file
+    @classmethod
+    def setUpClass(cls):
+        solver = tablebase._Solver()
+        solver.solve_pair(3, 3)
+        cls.table = solver.tables[(3, 3)]
+        cls.indexer = solver.indexers[(3, 3)]
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, "endgame.tb")
+        tablebase.write(path, 3, solver.tables)
+        cls.tablebase = tablebase.Tablebase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tablebase.close()
+        cls.directory.cleanup()
+
+    def position(self, index):
+        # white to move with the class's own stones, black has the other ones
+        own, other = self.indexer.position(index)
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        engine.pieces_in_deck = [0, 0, 0]
+        for point in bitboard.iter_bits(own):
+            engine.set(point, bitboard.WHITE)
+        for point in bitboard.iter_bits(other):
+            engine.set(point, bitboard.BLACK)
+        engine.pieces_on_board = [0, 3, 3]
+        engine.state = bitboard.MOVE_PIECE
+        return engine
+
+    def minimax(self, engine):
+        # the value of engine from one ply of Bitboard moves over the probed children;
+        # a mill and its removal are one move, as in the tablebase
+        side = engine.side
+        children = []
+        for action in engine.legal_moves():
+            engine.make_move(action)
+            if engine.state == bitboard.REMOVE_PIECE:
+                for removal in engine.legal_moves():
+                    engine.make_move(removal)
+                    children.append(self.tablebase.probe(engine))
+                    engine.unmake_move()
+            else:
+                children.append(self.tablebase.probe(engine))
+            engine.unmake_move()
+        self.assertEqual(engine.side, side)
+
+        if not children:
+            return tablebase.LOSS, 0
+        losses = [distance for result, distance in children if result == tablebase.LOSS]
+        if losses:
+            return tablebase.WIN, min(losses) + 1
+        if any(result == tablebase.DRAW for result, _ in children):
+            return tablebase.DRAW, None
+        return tablebase.LOSS, max(distance for _, distance in children) + 1
+
+    def test_values_match_one_ply_minimax(self):
+        rng = random.Random(8)
+        seen = set()
+        for index in rng.sample(range(self.indexer.size), 400):
+            engine = self.position(index)
+            expected = self.minimax(engine)
+            self.assertEqual(self.tablebase.probe(engine), expected, index)
+            seen.add((expected[0], expected[1] is not None and expected[1] > 1))
+
+        # the sample reaches wins, losses and draws, some of them more than a move deep
+        self.assertTrue({(tablebase.WIN, True), (tablebase.LOSS, True), (tablebase.DRAW, False)} <= seen, seen)
+
+    def test_best_move_converts_the_longest_win(self):
+        # wins are stored as an even value, the distance plus one
+        value = max(value for value in self.table if value and value % 2 == 0)
+        engine = self.position(self.table.index(value))
+        self.assertEqual(self.tablebase.probe(engine), (tablebase.WIN, value - 1))
+
+        moves = 0
+        while engine.state != bitboard.GAME_OVER:
+            if engine.state != bitboard.REMOVE_PIECE:
+                moves += 1
+            engine.make_move(self.tablebase.best_move(engine))
+
+        self.assertEqual(engine.winner, bitboard.WHITE)
+        self.assertEqual(moves, value - 1)
+
+class OpeningBookTests(unittest.TestCase):
+    def write_book(self, entries):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "opening.book")
+        openingbook.write(path, entries)
+        book = openingbook.OpeningBook(path)
+        self.addCleanup(book.close)
+        return book
+
+    def test_move_codes_round_trip(self):
+        for action in (("PLACE", 0, None), ("MOVE", 23, 14), ("REMOVE", 9, None)):
+            self.assertEqual(openingbook.decode_move(openingbook.encode_move(action)), action)
+
+    def test_lookup_finds_every_key(self):
+        rng = random.Random(5)
+        entries = {}
+        engines = []
+        for _ in range(50):
+            engine = bitboard.Bitboard(bitboard.WHITE)
+            for _ in range(rng.randrange(6)):
+                engine.make_move(rng.choice(engine.legal_moves()))
+            action = rng.choice(engine.legal_moves())
+            key, transform = openingbook.position_key(engine)
+            entries[key] = {symmetry.transform_action(action, transform): 1}
+            engines.append(engine)
+        book = self.write_book(entries)
+
+        for engine in engines:
+            key, transform = openingbook.position_key(engine)
+            stored, = entries[key]
+            self.assertEqual(book.lookup(engine), [(symmetry.transform_action(stored, symmetry.inverse(transform)), 1)])
+
+    def test_heaviest_move_first_and_illegal_moves_skipped(self):
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        engine.place_piece(0)
+        key, transform = openingbook.position_key(engine)
+        moves = {("PLACE", 1, None): 3, ("PLACE", 2, None): 7, ("PLACE", 0, None): 9}
+        book = self.write_book({key: {symmetry.transform_action(action, transform): weight
+                                      for action, weight in moves.items()}})
+
+        self.assertEqual(book.lookup(engine), [(("PLACE", 2, None), 7), (("PLACE", 1, None), 3)])
+
+    def test_search_book_answers_every_first_move(self):
+        book = self.write_book(openingbook.from_search(plies=2, depth=1))
+        game = Game(False, False, autostart=False)
+        player = search.AlphaBetaPlayer(game.current_player.piece_type, game, book=book)
+
+        self.assertIsNotNone(book.choose(game.engine))
+        for action in game.legal_moves():
+            game.make_move(action)
+            self.assertIsNotNone(book.choose(game.engine))
+            game.unmake_move()
+        self.assertEqual(player.choose_move(), book.lookup(game.engine)[0][0])
+
+    def test_self_play_games_feed_the_book(self):
+        results = []
+        simulate.run_games(5, simulate.PlayerSpec("random"), simulate.PlayerSpec("random"),
+                           seed=2, on_result=results.append)
+        entries = openingbook.from_games(results)
+
+        self.assertTrue(entries)
+        for moves in entries.values():
+            self.assertTrue(all(weight > 0 for weight in moves.values()))
+
+class MonteCarloSearchTests(unittest.TestCase):
+    def test_playout_budget_is_respected(self):
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        searcher = mcts.MonteCarloSearch(rng=random.Random(1))
+        move = searcher.search(engine, max_playouts=200)
+
+        self.assertIn(move, engine.legal_moves())
+        self.assertEqual(searcher.playouts, 200)
+        self.assertEqual(searcher.root.visits, 200)
+        self.assertEqual(engine.undo_stack, [])
+        self.assertGreater(searcher.playouts_per_second, 0)
+
+    def test_tree_is_reused_after_the_reply(self):
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        searcher = mcts.MonteCarloSearch(rng=random.Random(2))
+        move = searcher.search(engine, max_playouts=300)
+        engine.make_move(move)
+        reply = max(searcher.root.children[move].children.values(), key=lambda node: node.visits).move
+        engine.make_move(reply)
+        searcher.search(engine, max_playouts=10)
+
+        self.assertTrue(searcher.reused)
+        self.assertGreater(searcher.root.visits, 10)
+
+    def test_parallel_rollouts(self):
+        searcher = mcts.MonteCarloSearch(workers=2, batch_size=8, rng=random.Random(3))
+        try:
+            move = searcher.search(bitboard.Bitboard(bitboard.BLACK), max_playouts=32)
+        finally:
+            searcher.close()
+
+        self.assertIsNotNone(move)
+        self.assertEqual(searcher.root.visits, 32)
+
+    def test_zero_budget_still_returns_a_legal_move(self):
+        engine = bitboard.Bitboard(bitboard.WHITE)
+        searcher = mcts.MonteCarloSearch(rng=random.Random(4))
+
+        self.assertIn(searcher.search(engine, time_limit=0), engine.legal_moves())
+        self.assertIn(searcher.search(engine, max_playouts=0), engine.legal_moves())
+        self.assertEqual(engine.undo_stack, [])
+
+    def test_player_finishes_a_game(self):
+        result = simulate.play_game(simulate.PlayerSpec("mcts", (("time_limit", None), ("max_playouts", 20))),
+                                    simulate.PlayerSpec("random"), seed=6)
+
+        self.assertIn(result.winner, ("WHITE", "BLACK", "DRAW"))
+        self.assertGreater(result.plies, 0)
+
+class LockstepTests(unittest.TestCase):
+    def test_matches_bitboard_rules(self):
+        rng = np.random.default_rng(4)
+        games = lockstep.LockstepGames(40, side=np.where(rng.random(40) < 0.5, bitboard.WHITE, bitboard.BLACK))
+        engines = [bitboard.Bitboard(int(side)) for side in games.side]
+
+        for _ in range(250):
+            mask = games.legal_mask()
+            for row, engine in enumerate(engines):
+                expected = sorted(lockstep.encode_action(action) for action in engine.legal_moves())
+                self.assertEqual(list(np.flatnonzero(mask[row])), expected)
+
+            actions = games.random_actions(rng)
+            for row, engine in enumerate(engines):
+                if actions[row] >= 0:
+                    engine.make_move(lockstep.decode_action(engine.state, actions[row]))
+            games.step(actions)
+
+            for row, engine in enumerate(engines):
+                self.assertEqual((games.state[row], games.side[row], games.winner[row]),
+                                 (engine.state, engine.side, engine.winner))
+
+    def test_illegal_action_raises(self):
+        games = lockstep.LockstepGames(2)
+        games.step([lockstep.encode_action(("PLACE", 0, None)), -1])
+
+        with self.assertRaises(ValueError):
+            games.step([-1, lockstep.encode_action(("MOVE", 0, 1))])
+
+    def test_engine_round_trip(self):
+        engine = bitboard.Bitboard(bitboard.BLACK)
+        for action in (("PLACE", 0, None), ("PLACE", 3, None), ("PLACE", 1, None)):
+            engine.make_move(action)
+        row = lockstep.LockstepGames.from_engines([engine]).engine(0)
+
+        self.assertEqual((row.white, row.black, row.side, row.state), (engine.white, engine.black, engine.side, engine.state))
+        self.assertEqual(row.pieces_in_deck, engine.pieces_in_deck)
+        self.assertEqual(row.legal_moves(), engine.legal_moves())
+        self.assertEqual(row.winner, bitboard.EMPTY)
+        self.assertEqual(row.snapshot(), engine.snapshot())
+
+    def test_random_playouts_finish(self):
+        games = lockstep.LockstepGames(64)
+        winners = games.play_random(np.random.default_rng(1), max_plies=400)
+
+        self.assertTrue(((games.state == bitboard.GAME_OVER) | (games.plies == 400)).all())
+        self.assertTrue(np.isin(winners, (bitboard.EMPTY, bitboard.WHITE, bitboard.BLACK)).all())
+
+class GameEventTests(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(autostart=False)
+        self.events = []
+        self.callback = lambda event, value: self.events.append((event, value))
+        self.game.subscribe(self.callback)
+
+    def test_place_publishes_move_and_player_change(self):
+        player = self.game.current_player
+        self.game.place_piece("A1")
+
+        self.assertEqual([event for event, _ in self.events], [Game.PLACE_EVENT, Game.PLAYER_CHANGE_EVENT])
+        self.assertEqual(str(self.events[0][1]), str(self.game.move_history[-1]))
+        self.assertIs(self.events[1][1], self.game.current_player)
+        self.assertIsNot(self.game.current_player, player)
+
+    def test_mill_keeps_the_turn_until_the_removal(self):
+        first = self.game.current_player
+        for space in ("A1", "B2", "D1", "D2"):
+            self.game.place_piece(space)
+        self.events.clear()
+
+        self.game.place_piece("G1")
+        self.assertEqual([event for event, _ in self.events], [Game.PLACE_EVENT])
+        self.assertIs(self.game.current_player, first)
+
+        self.game.remove_piece("B2")
+        self.assertEqual([event for event, _ in self.events],
+                         [Game.PLACE_EVENT, Game.REMOVE_EVENT, Game.PLAYER_CHANGE_EVENT])
+
+    def test_surrender_publishes_game_over(self):
+        loser = self.game.current_player
+        self.game.surrender()
+
+        self.assertEqual(self.events, [(Game.GAME_OVER_EVENT, self.game.winner)])
+        self.assertIsNot(self.game.winner, loser)
+
+    def test_search_moves_are_silent_and_unsubscribe_works(self):
+        self.game.make_move(self.game.legal_moves()[0])
+        self.game.unmake_move()
+        self.assertEqual(self.events, [])
+
+        self.game.unsubscribe(self.callback)
+        self.game.place_piece("A1")
+        self.assertEqual(self.events, [])
+
+class BoardDeltaTests(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(autostart=False)
+
+    @staticmethod
+    def mask(*names):
+        return sum(1 << bitboard.SPACE_INDEX[name] for name in names)
+
+    def test_place_changes_one_space(self):
+        self.game.place_piece("A1")
+        delta = self.game.move_history[-1].delta
+
+        self.assertEqual(delta, BoardDelta(self.mask("A1"), 0, 0))
+
+    def test_mill_and_removal_deltas(self):
+        for space in ("A1", "B2", "D1", "D2", "G1"):
+            self.game.place_piece(space)
+        formed = self.game.move_history[-1].delta
+        self.assertEqual(formed.stones, self.mask("G1"))
+        self.assertEqual(formed.mills, self.mask("A1", "D1", "G1"))
+        self.assertEqual(formed.milled, self.mask("A1", "D1", "G1"))
+
+        self.game.remove_piece("B2")
+        removed = self.game.move_history[-1].delta
+        self.assertEqual(removed, BoardDelta(self.mask("B2"), 0, self.mask("A1", "D1", "G1")))
+
+    def test_deltas_replay_the_board(self):
+        random.seed(8)
+        shown = [BoardSpace.EMPTY_SPACE] * bitboard.NUM_SPACES
+        while self.game.game_state != Game.GAME_OVER and len(self.game.move_history) < 200:
+            self.game.play_move(random.choice(self.game.legal_moves()))
+            for index in bitboard.iter_bits(self.game.move_history[-1].delta.changed):
+                shown[index] = self.game.engine.get(index)
+
+        self.assertEqual(shown, [self.game.engine.get(index) for index in range(bitboard.NUM_SPACES)])
+
+class ComputerTurnCancelTests(unittest.TestCase):
+    def test_surrender_names_the_loser(self):
+        game = Game(autostart=False)
+        waiting = game.next_player
+        game.surrender(waiting)
+
+        self.assertEqual(game.game_state, Game.GAME_OVER)
+        self.assertIs(game.winner, game.current_player)
+
+    def stop_while_choosing(self, player):
+        chosen = []
+        worker = threading.Thread(target=lambda: chosen.append(player.choose_move()))
+        start = time.perf_counter()
+        worker.start()
+        time.sleep(0.2)
+        player.stop()
+        worker.join(5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.perf_counter() - start, 3)
+        self.assertIn(chosen[0], player.game.legal_moves())
+
+    def test_alpha_beta_player_stops(self):
+        game = Game(False, False, white_computer=functools.partial(search.AlphaBetaPlayer, time_limit=30),
+                    black_computer=functools.partial(search.AlphaBetaPlayer, time_limit=30), autostart=False)
+        self.stop_while_choosing(game.current_player)
+
+    def test_mcts_player_stops(self):
+        game = Game(False, False, white_computer=functools.partial(mcts.MCTSPlayer, time_limit=30),
+                    black_computer=functools.partial(mcts.MCTSPlayer, time_limit=30), autostart=False)
+        self.stop_while_choosing(game.current_player)
+
+    def test_cancel_before_the_search_starts(self):
+        # a turn cancelled before its search has begun must not run for the whole time limit
+        for computer in (search.AlphaBetaPlayer, mcts.MCTSPlayer):
+            game = Game(False, False, white_computer=functools.partial(computer, time_limit=30),
+                        black_computer=functools.partial(computer, time_limit=30), autostart=False)
+            cancel = threading.Event()
+            cancel.set()
+            start = time.perf_counter()
+            move = game.current_player.choose_move(cancel)
+
+            self.assertLess(time.perf_counter() - start, 3)
+            self.assertIn(move, game.legal_moves())
+
+    def test_stop_ends_a_pondering_wait(self):
+        game = Game(False, False, white_computer=functools.partial(search.AlphaBetaPlayer, time_limit=30, ponder=True),
+                    black_computer=functools.partial(search.AlphaBetaPlayer, time_limit=30, ponder=True),
+                    autostart=False)
+        game.play_move(game.legal_moves()[0])
+        waiting = game.next_player
+        waiting.start_pondering()
+        game.play_move(game.legal_moves()[0])
+        # pass the next choose_move off as a ponder hit, whose wait stop has to cut short
+        waiting.ponder_key = game.engine.zobrist
+        worker = threading.Thread(target=waiting.choose_move)
+        start = time.perf_counter()
+        worker.start()
+        time.sleep(0.2)
+        waiting.stop()
+        worker.join(5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.perf_counter() - start, 3)
+        self.assertEqual(waiting.ponder_hits, 1)
+        self.assertFalse(waiting.pondering)
+
+class GameServerTests(unittest.IsolatedAsyncioTestCase):
+    async def start_server(self, **options):
+        self.server = server.GameServer(port=0, **options)
+        port = await self.server.start()
+        self.addAsyncCleanup(self.server.close)
+        return port
+
+    async def client(self, port):
+        client = await server.GameClient.connect("127.0.0.1", port)
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def quick_pair(self, port):
+        first = await self.client(port)
+        second = await self.client(port)
+        await first.send("QUICK")
+        await first.expect("WAITING")
+        await second.send("QUICK")
+        starts = [(await first.expect("START")).split(), (await second.expect("START")).split()]
+        return first, second, starts
+
+    async def play_out(self, client, color, first):
+        # mirror the game from the MOVED lines and answer with random legal moves
+        engine = bitboard.Bitboard(bitboard.WHITE if first == "WHITE" else bitboard.BLACK)
+        mine = bitboard.WHITE if color == "WHITE" else bitboard.BLACK
+        rng = random.Random(7)
+        pending = False
+        while True:
+            if engine.side == mine and engine.state != bitboard.GAME_OVER and not pending:
+                move_type, start, end = rng.choice(engine.legal_moves())
+                names = [bitboard.SPACE_NAMES[start]] + ([bitboard.SPACE_NAMES[end]] if end is not None else [])
+                await client.send(" ".join([move_type] + names))
+                pending = True
+
+            words = (await client.receive(10)).split()
+            if words[0] == "GAMEOVER":
+                return words
+            if words[0] == "MOVED":
+                engine.make_move(server.parse_move(words[2:]))
+                pending = pending and words[1] != color
+            self.assertNotEqual(words[0], "ERROR")
+
+    async def test_quick_match_and_turns(self):
+        port = await self.start_server()
+        first, second, starts = await self.quick_pair(port)
+
+        self.assertEqual({starts[0][2], starts[1][2]}, {"WHITE", "BLACK"})
+        self.assertEqual(starts[0][3], starts[1][3])
+        mover, waiter = (first, second) if starts[0][2] == starts[0][3] else (second, first)
+
+        await waiter.send("PLACE A1")
+        self.assertEqual(await waiter.receive(), "ERROR not your turn")
+        await mover.send("PLACE A1")
+        self.assertEqual(await waiter.expect("MOVED"), f"MOVED {starts[0][3]} PLACE A1")
+        self.assertTrue((await mover.expect("TURN")).endswith("WHITE" if starts[0][3] == "BLACK" else "BLACK"))
+
+    async def test_lobby_create_list_join(self):
+        port = await self.start_server()
+        host = await self.client(port)
+        guest = await self.client(port)
+        await host.send("NAME alice")
+        await host.send("CREATE")
+        lobby = (await host.expect("WAITING")).split()[1]
+
+        await guest.send("LIST")
+        self.assertEqual(await guest.expect("LOBBY"), f"LOBBY {lobby} alice")
+        await guest.send(f"JOIN {lobby}")
+
+        self.assertEqual((await host.expect("START")).split()[2], "WHITE")
+        self.assertEqual((await guest.expect("START")).split()[2], "BLACK")
+        self.assertEqual(self.server.lobbies, {})
+
+    async def test_full_game_against_a_computer(self):
+        port = await self.start_server(time_limit=0.01)
+        client = await self.client(port)
+        await client.send("COMPUTER random")
+        _, _, color, first = (await client.expect("START")).split()
+
+        words = await self.play_out(client, color, first)
+        self.assertIn(words[1], ("WHITE", "BLACK"))
+        self.assertEqual(words[2], "WIN")
+        self.assertEqual(self.server.matches, {})
+
+    async def test_failed_computer_move_ends_the_match(self):
+        class Failing:
+            def submit(self, *args):
+                raise RuntimeError("worker died")
+
+        port = await self.start_server(executor=Failing())
+        client = await self.client(port)
+        await client.send("COMPUTER random")
+        _, _, color, first = (await client.expect("START")).split()
+        if color == first:
+            await client.send("PLACE A1")
+
+        self.assertTrue((await client.expect("ERROR")).startswith("ERROR computer move failed"))
+        self.assertEqual(await client.expect("GAMEOVER"), "GAMEOVER NONE ERROR")
+        self.assertEqual(self.server.matches, {})
+
+    async def test_disconnect_forfeits(self):
+        port = await self.start_server()
+        first, second, starts = await self.quick_pair(port)
+        await first.close()
+
+        self.assertEqual(await second.expect("GAMEOVER"), f"GAMEOVER {starts[1][2]} DISCONNECT")
+
+    async def test_idle_matches_are_evicted(self):
+        port = await self.start_server(idle_timeout=0.2)
+        first, second, _ = await self.quick_pair(port)
+
+        self.assertEqual(await first.expect("GAMEOVER", 3), "GAMEOVER NONE IDLE")
+        self.assertEqual(await second.expect("GAMEOVER", 3), "GAMEOVER NONE IDLE")
+        self.assertEqual(self.server.evicted, 1)
+
+    async def test_slow_reader_is_dropped(self):
+        port = await self.start_server(queue_limit=4)
+        client = await self.client(port)
+        await client.send("PING")
+        await client.expect("PONG")
+        connection = next(iter(self.server.connections))
+
+        # a writer that never drains stands in for a client that stopped reading
+        stalled = asyncio.Event()
+        connection.writer.drain = stalled.wait
+        for _ in range(8):
+            connection.send("PONG")
+
+        self.assertTrue(connection.closed)
+        stalled.set()
+
+    async def lobby_pair(self, port):
+        host = await self.client(port)
+        guest = await self.client(port)
+        await host.send("CREATE")
+        lobby = (await host.expect("WAITING")).split()[1]
+        await guest.send(f"JOIN {lobby}")
+        return host, guest, [(await host.expect("START")).split(), (await guest.expect("START")).split()]
+
+    async def test_many_concurrent_matches(self):
+        port = await self.start_server()
+        pairs = await asyncio.gather(*(self.lobby_pair(port) for _ in range(50)))
+
+        self.assertEqual(len(self.server.matches), 50)
+        for first, second, starts in pairs:
+            mover = first if starts[0][2] == starts[0][3] else second
+            await mover.send("PLACE D2")
+        for first, second, starts in pairs:
+            await first.expect("MOVED")
+            await second.expect("MOVED")
+
+class GameArchiveTests(unittest.TestCase):
+    def archive_path(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return os.path.join(directory.name, "games.mmga")
+
+    def test_moves_take_one_or_two_bytes(self):
+        actions = [(bitboard.PLACE, 23, None), (bitboard.REMOVE, 0, None), (bitboard.MOVE, 23, 22)]
+
+        self.assertEqual([len(archive.encode_action(action)) for action in actions], [1, 1, 2])
+        self.assertEqual(list(archive.decode_actions(archive.encode_actions(actions))), actions)
+
+    def test_game_round_trip(self):
+        random.seed(5)
+        game = Game(False, False, autostart=False)
+        while game.game_state != Game.GAME_OVER:
+            game.current_player.take_turn()
+        path = self.archive_path()
+
+        with archive.ArchiveWriter(path) as writer:
+            writer.write_game(game)
+
+        stored, = archive.read_games(path)
+        self.assertEqual(stored.plies, len(game.move_history))
+        self.assertEqual(stored.starting_side, game.staring_plauer.piece_type)
+        self.assertEqual(stored.winner, game.winner.piece_type)
+        self.assertEqual(stored.move_strings(), [str(move) for move in game.move_history])
+        self.assertEqual(stored.replay().zobrist, game.engine.zobrist)
+
+    def test_writer_batches_and_appends(self):
+        path = self.archive_path()
+        data = archive.encode_actions([(bitboard.PLACE, index, None) for index in range(6)])
+
+        writer = archive.ArchiveWriter(path, flush_bytes=1 << 16)
+        writer.write(BoardSpace.WHITE_SPACE, archive.DRAW, data)
+        self.assertEqual(os.path.getsize(path), 0)
+        writer.close()
+        with archive.ArchiveWriter(path) as writer:
+            writer.write(BoardSpace.BLACK_SPACE, BoardSpace.WHITE_SPACE, data)
+
+        self.assertEqual([(game.starting_side, game.winner) for game in archive.read_games(path)],
+                         [(BoardSpace.WHITE_SPACE, archive.DRAW), (BoardSpace.BLACK_SPACE, BoardSpace.WHITE_SPACE)])
+
+    def test_truncated_archive_is_rejected(self):
+        path = self.archive_path()
+        with archive.ArchiveWriter(path) as writer:
+            writer.write(BoardSpace.WHITE_SPACE, archive.DRAW, bytes(range(10)))
+        with open(path, "r+b") as stream:
+            stream.truncate(os.path.getsize(path) - 1)
+
+        with self.assertRaises(ValueError):
+            list(archive.read_games(path))
+
+    def test_simulator_archives_games(self):
+        path = self.archive_path()
+        played = []
+        writer = archive.ArchiveWriter(path)
+        simulate.run_games(4, simulate.PlayerSpec("random"), simulate.PlayerSpec("random"), seed=2,
+                           on_result=lambda result: (played.append(result), simulate.archive_result(writer, result)))
+        writer.close()
+
+        stored = list(archive.read_games(path))
+        self.assertEqual([game.move_strings() for game in stored], [list(result.moves) for result in played])
+        self.assertEqual([game.plies for game in stored], [result.plies for result in played])
+
+class MemoryFootprintTests(unittest.TestCase):
+    @staticmethod
+    def traced_bytes(build):
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            kept = build()
+            return tracemalloc.get_traced_memory()[0], kept
+        finally:
+            tracemalloc.stop()
+
+    def test_core_objects_have_no_instance_dict(self):
+        game = Game(False, False, autostart=False)
+        game.current_player.take_turn()
+
+        for value in (game, game.board, game.white_player, game.move_history[0], game.board.spaces["A1"]):
+            self.assertFalse(hasattr(value, "__dict__"), type(value).__name__)
+
+    def test_topology_is_shared(self):
+        first, second = Game(autostart=False), Game(autostart=False)
+
+        self.assertEqual(set(first.board.spaces["D2"].neighbors), {"D1", "B2", "F2", "D3"})
+        self.assertIs(first.board.spaces["D2"].neighbors["D1"], first.board.spaces["D1"])
+        self.assertIsNot(first.board.spaces["D1"], second.board.spaces["D1"])
+
+    def test_reset_keeps_board_spaces_valid(self):
+        game = Game(autostart=False)
+        space = game.board.spaces["A1"]
+        game.place_piece("A1")
+        game.reset_game()
+
+        self.assertIs(game.board.spaces["A1"], space)
+        self.assertEqual(space.state, BoardSpace.EMPTY_SPACE)
+        game.place_piece("A1")
+        self.assertEqual(space.state, game.staring_plauer.piece_type)
+
+    def test_logged_moves_keep_their_delta(self):
+        game = Game(autostart=False)
+        game.place_piece("D2")
+
+        self.assertEqual(game.move_history[0].delta, BoardDelta(1 << bitboard.SPACE_INDEX["D2"], 0, 0))
+
+    def test_documented_footprint(self):
+        random.seed(3)
+        empty, _ = self.traced_bytes(lambda: [Game(False, False, autostart=False) for _ in range(200)])
+        self.assertLess(empty / 200, 1500)
+
+        def play():
+            games = [Game(False, False, autostart=False) for _ in range(50)]
+            for game in games:
+                while game.game_state != Game.GAME_OVER and len(game.move_history) < 200:
+                    game.current_player.take_turn()
+            return games
+
+        played, games = self.traced_bytes(play)
+        plies = sum(len(game.move_history) for game in games)
+        self.assertLess((played - empty / 4) / plies, 160)
+
+class GameStateTests(unittest.TestCase):
+    def played_engine(self, seed, plies=40):
+        rng = random.Random(seed)
+        engine = bitboard.Bitboard()
+        for _ in range(plies):
+            if engine.state == bitboard.GAME_OVER:
+                break
+            engine.make_move(rng.choice(engine.legal_moves()))
+        return engine
+
+    def test_round_trip_restores_engine(self):
+        for seed in range(20):
+            engine = self.played_engine(seed)
+            restored = bitboard.Bitboard.from_state(engine.snapshot())
+
+            self.assertEqual(restored.milled, engine.milled)
+            self.assertEqual(restored.zobrist, engine.zobrist)
+            self.assertEqual(restored.legal_moves(), engine.legal_moves())
+            self.assertEqual(restored.snapshot(), engine.snapshot())
+
+    def test_state_is_an_immutable_key(self):
+        first = bitboard.Bitboard()
+        second = bitboard.Bitboard()
+        for engine, order in ((first, (0, 23, 1)), (second, (1, 23, 0))):
+            for index in order:
+                engine.make_move((bitboard.PLACE, index, None))
+
+        state = first.snapshot()
+        self.assertEqual({state: "seen"}[second.snapshot()], "seen")
+        with self.assertRaises(AttributeError):
+            state.white = 0
+
+    def test_pickles_small(self):
+        import pickle
+        state = self.played_engine(4).snapshot()
+        data = pickle.dumps(state)
+
+        self.assertEqual(pickle.loads(data), state)
+        self.assertLess(len(data), len(pickle.dumps(self.played_engine(4).copy())))
+
+    def test_game_from_state(self):
+        random.seed(8)
+        game = Game(autostart=False)
+        for name in ("A1", "A4", "D1", "B4"):
+            game.place_piece(name)
+
+        copy = Game.from_state(game.snapshot(), autostart=False)
+        self.assertEqual(copy.snapshot(), game.snapshot())
+        self.assertEqual(copy.current_player.piece_type, game.current_player.piece_type)
+        self.assertEqual(copy.move_history, [])
+
+        copy.place_piece("G1")
+        self.assertEqual(copy.game_state, Game.REMOVE_PIECE)
+        self.assertNotEqual(copy.snapshot(), game.snapshot())
+
+    def test_finished_state_does_not_start_computer(self):
+        engine = self.played_engine(1, plies=400)
+        engine.surrender()
+
+        game = Game.from_state(engine.snapshot(), white_player_human=False, black_player_human=False)
+        self.assertEqual(game.game_state, Game.GAME_OVER)
+        self.assertEqual(game.winner.piece_type, engine.winner)
+
+class SymmetryTests(unittest.TestCase):
+    def random_engine(self, seed, plies=30):
+        rng = random.Random(seed)
+        engine = bitboard.Bitboard()
+        for _ in range(plies):
+            if engine.state == bitboard.GAME_OVER:
+                break
+            engine.make_move(rng.choice(engine.legal_moves()))
+        return engine
+
+    def test_symmetries_keep_mills_and_neighbors(self):
+        self.assertEqual(len(set(symmetry.PERMUTATIONS)), symmetry.SYMMETRY_COUNT)
+        mills = set(bitboard.MILL_MASKS)
+        for transform in range(symmetry.SYMMETRY_COUNT):
+            self.assertEqual({symmetry.transform_mask(mask, transform) for mask in mills}, mills)
+            for point, neighbors in enumerate(bitboard.ADJACENCY):
+                self.assertEqual({symmetry.transform_point(neighbor, transform) for neighbor in neighbors},
+                                 set(bitboard.ADJACENCY[symmetry.transform_point(point, transform)]))
+
+    def test_ring_swap_exchanges_inner_and_outer_squares(self):
+        names = {bitboard.SPACE_NAMES[symmetry.transform_point(bitboard.SPACE_INDEX[name], 8)]
+                 for name in ("A1", "D1", "D2", "D3")}
+        self.assertEqual(names, {"C3", "D3", "D2", "D1"})
+
+    def test_inverse_undoes_transform(self):
+        mask = 0b101100111000011110001101
+        for transform in range(symmetry.SYMMETRY_COUNT):
+            back = symmetry.inverse(transform)
+            self.assertEqual(symmetry.transform_mask(symmetry.transform_mask(mask, transform), back), mask)
+
+    def test_every_image_has_the_same_canonical_form(self):
+        for seed in range(10):
+            state = self.random_engine(seed).snapshot()
+            canonical, transform = symmetry.canonical_state(state)
+            self.assertEqual(symmetry.transform_state(state, transform), canonical)
+            for other in range(symmetry.SYMMETRY_COUNT):
+                self.assertEqual(symmetry.canonical_state(symmetry.transform_state(state, other))[0], canonical)
+
+    def test_moves_map_back(self):
+        for seed in range(10):
+            engine = self.random_engine(seed)
+            canonical, transform = symmetry.canonical_state(engine.snapshot())
+            moves = bitboard.Bitboard.from_state(canonical).legal_moves()
+            back = symmetry.inverse(transform)
+
+            self.assertEqual(sorted(symmetry.transform_action(action, back) for action in moves),
+                             sorted(engine.legal_moves()))
+
+class BenchmarkTests(unittest.TestCase):
+    def test_every_benchmark_reports_a_rate(self):
+        results = benchmark.run_benchmarks(repeat=1, scale=0.01)
+
+        self.assertEqual(set(results), {"check_for_mill", "moves.place", "moves.move", "moves.remove",
+                                         "board_construction", "reset_game", "random_games", "evaluate", "search"} |
+                         {f"imports.{module.lower()}" for module in benchmark.CORE_MODULES})
+        for result in results.values():
+            self.assertGreater(result["rate"], 0)
+
+    def test_compare_flags_slowdowns_beyond_threshold(self):
+        baseline = {"fast": {"rate": 100.0}, "slow": {"rate": 100.0}, "gone": {"rate": 100.0}}
+        results = {"fast": {"rate": 95.0}, "slow": {"rate": 70.0}, "new": {"rate": 1.0}}
+
+        regressions = benchmark.compare(results, baseline, threshold=0.1)
+        self.assertEqual([name for name, *_ in regressions], ["slow"])
+        self.assertAlmostEqual(regressions[0][3], -0.3)
+        self.assertEqual(benchmark.compare(results, baseline, threshold=0.5), [])
+
+    def test_command_line_writes_json_and_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            out = os.path.join(directory, "results.json")
+            baseline = os.path.join(directory, "baseline.json")
+            arguments = ["--only", "reset_game", "--repeat", "1", "--scale", "0.01"]
+
+            self.assertEqual(benchmark.main(arguments + ["--out", out, "--save-baseline", baseline]), 0)
+            with open(out) as stream:
+                self.assertIn("reset_game", json.load(stream)["results"])
+
+            with open(baseline, "w") as stream:
+                json.dump(benchmark.report({"reset_game": {"rate": 1e12, "unit": "resets/s"}}), stream)
+            self.assertEqual(benchmark.main(arguments + ["--baseline", baseline]), 1)
+
+    def test_stored_baseline_covers_every_benchmark(self):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), benchmark.DEFAULT_BASELINE)
+
+        self.assertEqual(set(benchmark.load(path)), set(benchmark.run_benchmarks(repeat=1, scale=0.01)))
+
+class InstrumentationTests(unittest.TestCase):
+    def setUp(self):
+        self.originals = {name: Game.__dict__[name] for name in instrument.GAME_METHODS}
+        self.engine_originals = {name: bitboard.Bitboard.__dict__[name] for name in instrument.ENGINE_METHODS}
+        self.addCleanup(instrument.disable)
+
+    def test_disabled_leaves_methods_alone(self):
+        game = Game(autostart=False)
+        game.place_piece("A1")
+
+        self.assertFalse(instrument.enabled())
+        self.assertEqual({name: Game.__dict__[name] for name in instrument.GAME_METHODS}, self.originals)
+        self.assertEqual(game.stats(), {})
+
+    def test_counts_every_call(self):
+        instrument.enable()
+        random.seed(4)
+        game = Game(False, False, autostart=False)
+        while game.game_state != Game.GAME_OVER and len(game.move_history) < 200:
+            game.current_player.take_turn()
+        stats = game.stats()
+
+        counts = {}
+        for move_type, method in (("PLACE", "place_piece"), ("MOVE", "move_piece"), ("REMOVE", "remove_piece")):
+            counts[move_type] = sum(1 for record in game.move_history if record.move_type == move_type)
+            self.assertEqual(stats.get(method, {"calls": 0})["calls"], counts[move_type])
+        self.assertEqual(stats["choose_move"]["calls"], len(game.move_history))
+        self.assertGreater(stats["take_turn"]["calls"], 0)
+        self.assertGreaterEqual(stats["take_turn"]["seconds"], stats["place_piece"]["seconds"])
+
+        # the engine checks every placed or moved stone for a mill and changes players after
+        # each turn, a removal ending the turn of the player who closed the mill
+        self.assertEqual(stats["check_for_mill"]["calls"], counts["PLACE"] + counts["MOVE"])
+        self.assertEqual(stats["change_player"]["calls"], len(game.move_history) - counts["REMOVE"])
+
+    def test_counts_engine_work_of_played_moves(self):
+        instrument.enable()
+        game = Game(autostart=False)
+        first = game.current_player.piece_type
+        # the first player closes the A1-D1-G1 mill and takes a stone
+        for name in ("A1", "B2", "D1", "B4", "G1", "B2"):
+            game.play_move((bitboard.REMOVE if game.game_state == Game.REMOVE_PIECE else bitboard.PLACE,
+                            bitboard.SPACE_INDEX[name], None))
+        stats = game.stats()
+
+        self.assertEqual(game.board.get_space("B2"), BoardSpace.EMPTY_SPACE)
+        self.assertEqual(game.current_player.piece_type, bitboard.opponent(first))
+        self.assertEqual(stats["check_for_mill"]["calls"], 5)
+        self.assertEqual(stats["change_player"]["calls"], 5)
+
+        # engines searched outside a Game move are not counted
+        engine = game.engine.copy()
+        engine.make_move(engine.legal_moves()[0])
+        self.assertEqual(game.stats(), stats)
+
+    def test_disable_restores_methods(self):
+        instrument.enable()
+        self.assertNotEqual(Game.__dict__["place_piece"], self.originals["place_piece"])
+        instrument.disable()
+
+        game = Game(autostart=False)
+        game.place_piece("A1")
+        self.assertEqual({name: Game.__dict__[name] for name in instrument.GAME_METHODS}, self.originals)
+        self.assertEqual({name: bitboard.Bitboard.__dict__[name] for name in instrument.ENGINE_METHODS},
+                         self.engine_originals)
+        self.assertEqual(game.stats(), {})
+
+    def test_dumper_waits_for_interval(self):
+        stream = io.StringIO()
+        dumper = instrument.Dumper(interval=3600, stream=stream)
+        dumper.add({"place_piece": {"calls": 2, "seconds": 0.5}})
+        dumper.add({"place_piece": {"calls": 1, "seconds": 0.25}})
+        self.assertEqual(stream.getvalue(), "")
+
+        dumper.dump()
+        self.assertEqual(dumper.totals, {"place_piece": {"calls": 3, "seconds": 0.75}})
+        self.assertIn("place_piece", stream.getvalue())
+
+    def test_simulator_stats_and_profile(self):
+        import pstats
+        played = []
+        simulate.run_games(3, simulate.PlayerSpec("random"), simulate.PlayerSpec("random"), seed=1,
+                           on_result=played.append, stats=True)
+        self.assertTrue(all(result.stats["take_turn"]["calls"] for result in played))
+
+        instrument.disable()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.prof")
+            simulate.main(["--games", "2", "--seed", "1", "--profile", path])
+            self.assertTrue(pstats.Stats(path).total_calls)
+
+class StartupBudgetTests(unittest.TestCase):
+    # import times are measured against a baseline by benchmark.py, see bench_imports
+    HEAVY_MODULES = ("PyQt6", "numpy", "concurrent.futures", "asyncio")
+
+    def run_python(self, *arguments):
+        directory = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.run([sys.executable, *arguments], cwd=directory, capture_output=True, text=True, check=True)
+
+    def test_core_does_not_load_qt_or_numpy(self):
+        for module in benchmark.CORE_MODULES:
+            loaded = self.run_python("-c", f"import sys, {module}; print(' '.join(sys.modules))").stdout.split()
+            self.assertFalse([name for name in self.HEAVY_MODULES if name in loaded], module)
+
+    def test_gui_import_does_not_start_qt(self):
+        try:
+            import PyQt6
+        except ImportError:
+            self.skipTest("PyQt6 is not installed")
+        output = self.run_python("-c", "import gui; from PyQt6.QtWidgets import QApplication; "
+                                       "print(QApplication.instance() is None, callable(gui.main))").stdout
+        self.assertEqual(output.split(), ["True", "True"])
+
+class PonderTests(unittest.TestCase):
+    def computer_game(self, **options):
+        # a human white player against a pondering search player who moves first
+        random.seed(1)
+        while True:
+            game = Game(True, False, black_computer=functools.partial(search.AlphaBetaPlayer, ponder=True, **options),
+                        autostart=False)
+            if game.current_player is game.black_player:
+                break
+        self.addCleanup(game.black_player.stop_pondering)
+        return game, game.black_player
+
+    def predicted_reply(self, player):
+        return player.expected_line[1]
+
+    def test_hit_continues_the_pondered_search(self):
+        game, player = self.computer_game(time_limit=None, max_depth=3)
+        game.play_move(player.choose_move())
+        player.start_pondering()
+        player.ponder_thread.join()
+        pondered = player.ponder_result
+
+        game.play_move(self.predicted_reply(player))
+        self.assertEqual(player.choose_move(), pondered)
+        self.assertEqual((player.ponder_hits, player.ponder_misses), (1, 0))
+        self.assertFalse(player.pondering)
+
+    def test_hit_answers_within_the_remaining_time(self):
+        game, player = self.computer_game(time_limit=0.4)
+        game.play_move(player.choose_move())
+        player.start_pondering()
+        time.sleep(0.5)
+
+        game.play_move(self.predicted_reply(player))
+        start = time.perf_counter()
+        move = player.choose_move()
+        self.assertLess(time.perf_counter() - start, 0.2)
+        self.assertIn(move, game.legal_moves())
+
+    def test_miss_searches_the_actual_position(self):
+        game, player = self.computer_game(time_limit=None, max_depth=2)
+        game.play_move(player.choose_move())
+        player.start_pondering()
+
+        other = next(move for move in game.legal_moves() if move != self.predicted_reply(player))
+        game.play_move(other)
+        self.assertIn(player.choose_move(), game.legal_moves())
+        self.assertEqual((player.ponder_hits, player.ponder_misses), (0, 1))
+
+    def test_without_prediction_all_replies_are_pondered(self):
+        game, player = self.computer_game(time_limit=None)
+        game.play_move(game.legal_moves()[0])
+        player.start_pondering()
+
+        self.assertTrue(player.pondering)
+        self.assertIsNone(player.ponder_key)
+        start = time.perf_counter()
+        player.stop_pondering()
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertFalse(player.pondering)
+
+    def test_pondering_is_opt_in(self):
+        game, player = self.computer_game(time_limit=None, max_depth=1)
+        player.ponder = False
+        game.play_move(player.choose_move())
+        player.start_pondering()
+        ComputerPlayer(BoardSpace.WHITE_SPACE, game).start_pondering()
+
+        self.assertFalse(player.pondering)
+
+class ParallelSearchTests(unittest.TestCase):
+    def position(self, seed=11, plies=24):
+        return search._speedup_position(seed, plies)
+
+    def parallel(self, workers):
+        searcher = search.ParallelSearch(workers)
+        self.addCleanup(searcher.close)
+        return searcher
+
+    def test_single_worker_matches_alpha_beta(self):
+        engine = self.position()
+        expected = search.AlphaBetaSearch(search.TranspositionTable(transposition.DEFAULT_MAX_BYTES))
+        move = expected.search(engine.copy(), max_depth=4)
+        searcher = self.parallel(1)
+        self.assertEqual(searcher.search(engine.copy(), max_depth=4), move)
+        self.assertEqual((searcher.score, searcher.pv, searcher.nodes), (expected.score, expected.pv, expected.nodes))
+
+    def test_single_worker_is_deterministic(self):
+        engine = self.position(seed=3)
+        runs = set()
+        for _ in range(3):
+            searcher = self.parallel(1)
+            move = searcher.search(engine.copy(), max_depth=4)
+            runs.add((move, searcher.score, tuple(searcher.pv), searcher.nodes))
+        self.assertEqual(len(runs), 1)
+
+    def test_workers_agree_on_the_score(self):
+        engine = self.position()
+        single = self.parallel(1)
+        single.search(engine.copy(), max_depth=3)
+        searcher = self.parallel(2)
+        move = searcher.search(engine.copy(), max_depth=3)
+        self.assertIn(move, engine.legal_moves())
+        self.assertEqual(searcher.score, single.score)
+        self.assertEqual(searcher.depth, 3)
+        self.assertEqual(searcher.pv[0], move)
+
+    def test_workers_respect_the_time_limit(self):
+        engine = self.position(seed=5, plies=30)
+        searcher = self.parallel(2)
+        searcher.search(engine.copy(), max_depth=1)
+        start = time.perf_counter()
+        move = searcher.search(engine.copy(), time_limit=0.3)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertIn(move, engine.legal_moves())
+        # the workers were released from the cut-off iteration
+        searcher.search(engine.copy(), max_depth=2)
+        self.assertEqual(searcher.depth, 2)
+
+    def test_player_with_workers_plays_and_closes(self):
+        random.seed(2)
+        game = Game(False, False, white_computer=functools.partial(search.AlphaBetaPlayer, max_depth=2, workers=2),
+                    autostart=False)
+        player = game.white_player
+        self.addCleanup(player.close)
+        while game.current_player is not player:
+            game.current_player.take_turn()
+        player.take_turn()
+        self.assertIsInstance(player.searcher, search.ParallelSearch)
+        self.assertGreater(player.nodes, 0)
+        player.close()
+        self.assertIsNone(player.searcher.executor)
+
+    def test_measure_speedup_reports_every_worker_count(self):
+        rows = search.measure_speedup(self.position(), [1, 2], 2)
+        self.assertEqual([row[0] for row in rows], [1, 2])
+        self.assertEqual(rows[0][3], 1.0)
+        self.assertTrue(all(row[1] > 0 and row[2] > 0 for row in rows))
+
+class EvaluationFeatureTests(unittest.TestCase):
+    def engine_with(self, white=(), black=()):
+        engine = bitboard.Bitboard()
+        for color, names in ((bitboard.WHITE, white), (bitboard.BLACK, black)):
+            for name in names:
+                engine.set(bitboard.SPACE_INDEX[name], color)
+        return engine
+
+    def scanned(self, engine, color):
+        # the features as a board scan finds them
+        return bitboard.Bitboard.from_state(engine.snapshot()).color_features(color)
+
+    def test_hand_counted_position(self):
+        engine = self.engine_with(white=("A1", "D1", "G1", "A4", "A7"), black=("B4", "D7"))
+
+        white = engine.color_features(bitboard.WHITE)
+        self.assertEqual((white.mills, white.open_twos, white.blocked, white.mobility, white.double_mills),
+                         (2, 0, 3, 2, 1))
+        black = engine.color_features(bitboard.BLACK)
+        self.assertEqual((black.mills, black.open_twos, black.blocked, black.mobility, black.double_mills),
+                         (0, 0, 0, 5, 0))
+
+    def test_open_two_is_closed_by_the_opponent(self):
+        engine = self.engine_with(white=("A1", "D1"))
+        self.assertEqual(engine.feature(bitboard.OPEN_TWOS, bitboard.WHITE), 1)
+
+        engine.set(bitboard.SPACE_INDEX["G1"], bitboard.BLACK)
+        self.assertEqual(engine.feature(bitboard.OPEN_TWOS, bitboard.WHITE), 0)
+        engine.set(bitboard.SPACE_INDEX["G1"], bitboard.EMPTY)
+        self.assertEqual(engine.feature(bitboard.OPEN_TWOS, bitboard.WHITE), 1)
+
+    def test_incremental_features_match_a_scan(self):
+        for seed in range(40):
+            rng = random.Random(seed)
+            engine = bitboard.Bitboard()
+            history = []
+            while engine.state != bitboard.GAME_OVER and len(history) < 150:
+                engine.make_move(rng.choice(engine.legal_moves()))
+                history.append(engine.features)
+                for color in (bitboard.WHITE, bitboard.BLACK):
+                    self.assertEqual(engine.color_features(color), self.scanned(engine, color))
+                self.assertEqual(engine.milled, [0, bitboard.milled_mask(engine.white),
+                                                 bitboard.milled_mask(engine.black)])
+
+            # unmaking restores every earlier value
+            while engine.undo_stack:
+                self.assertEqual(engine.features, history.pop())
+                engine.unmake_move()
+            self.assertEqual(engine.features, 0)
+
+    def test_set_keeps_features_and_mills(self):
+        rng = random.Random(3)
+        engine = bitboard.Bitboard()
+        for _ in range(300):
+            engine.set(rng.randrange(bitboard.NUM_SPACES), rng.choice((bitboard.EMPTY, bitboard.WHITE, bitboard.BLACK)))
+            self.assertEqual(engine.features, bitboard.count_features(engine.white, engine.black))
+            self.assertEqual(engine.milled[bitboard.WHITE], bitboard.milled_mask(engine.white))
+
+    def test_evaluate_matches_a_board_scan(self):
+        def scanned_evaluate(engine):
+            side = engine.side
+            empty = engine.empty_spaces()
+            score = 0
+            for color, sign in ((side, 1), (bitboard.opponent(side), -1)):
+                pieces = engine.pieces_in_deck[color] + engine.pieces_on_board[color]
+                value = search.PIECE_WEIGHT * pieces + search.MILL_WEIGHT * engine.milled[color].bit_count()
+                if engine.pieces_on_board[color] > 3:
+                    for space in bitboard.iter_bits(engine.stones[color]):
+                        free = (bitboard.NEIGHBOR_MASKS[space] & empty).bit_count()
+                        value += search.MOBILITY_WEIGHT * free if free else -search.BLOCKED_WEIGHT
+                score += sign * value
+            return score + (search.PIECE_WEIGHT if engine.state == bitboard.REMOVE_PIECE else 0)
+
+        for seed in range(30):
+            rng = random.Random(seed)
+            engine = bitboard.Bitboard()
+            while engine.state != bitboard.GAME_OVER and len(engine.undo_stack) < 120:
+                engine.make_move(rng.choice(engine.legal_moves()))
+                self.assertEqual(search.evaluate(engine), scanned_evaluate(engine))
+
+    def test_game_reports_features(self):
+        random.seed(6)
+        game = Game(autostart=False)
+        game.engine.side = bitboard.WHITE
+        game.current_player, game.next_player = game.white_player, game.black_player
+        for name in ("A1", "A4", "D1", "B4"):
+            game.place_piece(name)
+
+        white = game.features(BoardSpace.WHITE_SPACE)
+        self.assertEqual((white.in_deck, white.on_board, white.open_twos), (7, 2, 1))
+        self.assertEqual(game.features(BoardSpace.BLACK_SPACE).mobility, 4)
+
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromModule( sys.modules[__name__] )
     unittest.TextTestRunner(verbosity=3).run( suite )
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Size-bounded transposition table for the search players.
+
+The table is a fixed array of slots indexed by Zobrist key, so its memory use
+is set once when it is created and never grows. Each slot holds at most one
+entry; when two positions land on the same slot the replacement policy
+decides which one is kept.
+"""
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Keep the deeper of the two entries, unless the stored one is left over from
+# an earlier search. Deep results are expensive to recompute.
+REPLACE_DEPTH = "depth"
+# Always keep the newest entry. Cheap, and favours the positions the search
+# is looking at right now.
+REPLACE_ALWAYS = "always"
+
+# Approximate bytes held per slot: the slot pointer, the entry tuple, its
+# 64-bit key and the action tuple it keeps alive.
+ENTRY_SIZE = 200
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class TranspositionTable:
+    """Entries are ``(key, depth, score, flag, move, generation)`` tuples.
+
+    ``max_bytes`` caps the memory the table may hold and ``replacement`` is
+    REPLACE_DEPTH or REPLACE_ALWAYS. Call ``new_search`` before each search
+    so that the depth policy can age out entries from earlier moves.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, replacement: str = REPLACE_DEPTH):
+        if replacement not in (REPLACE_DEPTH, REPLACE_ALWAYS):
+            raise ValueError(f"unknown replacement policy {replacement!r}")
+
+        self.size = max(1, max_bytes // ENTRY_SIZE)
+        self.replacement = replacement
+        self.slots = [None] * self.size
+        self.generation = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self.slots if entry is not None)
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key: int):
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move):
+        slot = key % self.size
+        old = self.slots[slot]
+
+        if (old is not None and self.replacement == REPLACE_DEPTH and old[0] != key
+                and old[5] == self.generation and old[1] > depth):
+            return
+
+        # keep the best move of a same-position entry when this result has none
+        if move is None and old is not None and old[0] == key:
+            move = old[4]
+
+        self.slots[slot] = (key, depth, score, flag, move, self.generation)
+        self.stores += 1
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0